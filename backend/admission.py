@@ -0,0 +1,351 @@
+"""
+Admission control for LLM generations.
+
+Limits how many requests run concurrently per model and parks the rest in
+a bounded queue. When the queue is full, callers are rejected up front
+(HTTP 429 + Retry-After) instead of all slowing down together until the
+frontend times out.
+
+The queue is served by weighted fair queuing between clients (a user id,
+or the IP for anonymous requests) rather than in arrival order, so one
+client firing dozens of questions cannot starve everyone else. Each
+ticket gets a virtual finish tag (start + 1/weight); the lowest tag goes
+next, which gives backlogged clients slots in proportion to their weight
+while each client's own requests stay in FIFO order. Per-client caps
+limit how many requests one client may have running and queued.
+
+Components:
+- Histogram: fixed-bucket histogram for queue depth and wait times
+- QueueFullError: raised by enqueue() when the queue (or the client's
+  share of it) is full
+- AdmissionController: per-model slots, fair queue, position/ETA tracking
+
+With several workers (prefork.py) each one has its own controller and
+queue, and the per-model limits are enforced across workers through
+shared_state.SharedSlots: a ticket is admitted only when it also gets a
+global slot. A release in another worker cannot wake this worker's
+queue, so queued tickets also re-check every shared_poll_interval.
+
+All methods must be called from the event loop thread.
+"""
+
+import asyncio
+import bisect
+import math
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative counts, Prometheus style)"""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last = +Inf
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value: float):
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sum += value
+        self._count += 1
+
+    def to_dict(self) -> Dict:
+        cumulative = []
+        running = 0
+        for bound, count in zip(self.buckets + [math.inf], self._counts):
+            running += count
+            cumulative.append({"le": "+Inf" if bound == math.inf else bound, "count": running})
+        return {
+            "count": self._count,
+            "sum": self._sum,
+            "avg": self._sum / self._count if self._count else 0.0,
+            "buckets": cumulative
+        }
+
+
+class QueueFullError(Exception):
+    """The admission queue is full; retry_after is a suggested delay in seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Fila cheia, tente novamente em {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A request's place in the admission queue"""
+
+    def __init__(self, model: str, client_id: str = "anonymous", weight: float = 1.0):
+        self.model = model
+        self.client_id = client_id
+        self.weight = weight
+        self.enqueued_at = time.time()
+        self.admitted_at: Optional[float] = None
+        self.released = False
+        # Virtual start/finish tags (weighted fair queuing) and arrival order
+        self.start_tag = 0.0
+        self.finish_tag = 0.0
+        self.seq = 0
+
+    def sort_key(self) -> Tuple[float, int]:
+        return self.finish_tag, self.seq
+
+
+class _ModelGate:
+    def __init__(self, limit: int, initial_service_time: float):
+        self.limit = limit
+        self.active = 0
+        self.queue: List[Ticket] = []
+        self.avg_service_time = initial_service_time
+        self.changed = asyncio.Event()
+        # Weighted fair queuing state
+        self.virtual_time = 0.0
+        self.last_finish: Dict[str, float] = {}
+
+    def notify(self):
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class AdmissionController:
+    """
+    Per-model concurrency limits with a bounded, weighted fair queue.
+
+    Args:
+        default_limit: Concurrent requests allowed per model
+        model_limits: Per-model overrides of default_limit
+        max_queue: Maximum number of queued requests (all models together)
+        initial_service_time: Service time guess (s) before any request finished
+        max_inflight_per_client: Running requests allowed per client (0 = no cap)
+        max_queued_per_client: Queued requests allowed per client (0 = no cap)
+        slots: Cross-worker slot table (None = this process only)
+        shared_poll_interval: Seconds between re-checks of the shared slots
+            while queued
+    """
+
+    WAIT_BUCKETS = [0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300]
+    DEPTH_BUCKETS = [0, 1, 2, 5, 10, 20, 50]
+
+    # Weight of the newest sample in the service time moving average
+    SERVICE_TIME_ALPHA = 0.2
+
+    def __init__(
+        self,
+        default_limit: int = 2,
+        model_limits: Optional[Dict[str, int]] = None,
+        max_queue: int = 20,
+        initial_service_time: float = 30.0,
+        max_inflight_per_client: int = 0,
+        max_queued_per_client: int = 0,
+        slots=None,
+        shared_poll_interval: float = 0.25
+    ):
+        self.default_limit = default_limit
+        self.model_limits = model_limits or {}
+        self.max_queue = max_queue
+        self.initial_service_time = initial_service_time
+        self.max_inflight_per_client = max_inflight_per_client
+        self.max_queued_per_client = max_queued_per_client
+        self.slots = slots
+        self.shared_poll_interval = shared_poll_interval
+        self._gates: Dict[str, _ModelGate] = {}
+        self._client_active: Dict[str, int] = {}
+        self._seq = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._rejected_client_quota = 0
+        self._wait_histogram = Histogram(self.WAIT_BUCKETS)
+        self._depth_histogram = Histogram(self.DEPTH_BUCKETS)
+
+    def _gate(self, model: str) -> _ModelGate:
+        gate = self._gates.get(model)
+        if gate is None:
+            limit = self.model_limits.get(model, self.default_limit)
+            gate = _ModelGate(limit, self.initial_service_time)
+            self._gates[model] = gate
+        return gate
+
+    def queued_total(self) -> int:
+        return sum(len(gate.queue) for gate in self._gates.values())
+
+    def _queued_for_client(self, client_id: str) -> int:
+        return sum(
+            1 for gate in self._gates.values() for ticket in gate.queue
+            if ticket.client_id == client_id
+        )
+
+    def _can_run(self, ticket: Ticket) -> bool:
+        """Whether the ticket's client is below its in-flight cap"""
+        if not self.max_inflight_per_client:
+            return True
+        return self._client_active.get(ticket.client_id, 0) < self.max_inflight_per_client
+
+    def _take_shared_slot(self, model: str, gate: _ModelGate) -> bool:
+        """Take a slot in the cross-worker table (always succeeds without one)"""
+        return self.slots is None or self.slots.try_acquire(model, gate.limit)
+
+    def _admit(self, gate: _ModelGate, ticket: Ticket):
+        gate.active += 1
+        gate.virtual_time = max(gate.virtual_time, ticket.start_tag)
+        self._client_active[ticket.client_id] = self._client_active.get(ticket.client_id, 0) + 1
+        ticket.admitted_at = time.time()
+        self._admitted += 1
+        self._wait_histogram.observe(ticket.admitted_at - ticket.enqueued_at)
+
+    def _dispatch(self, gate: _ModelGate):
+        """Admit queued tickets, lowest finish tag first, while slots are free"""
+        while gate.active < gate.limit:
+            runnable = [ticket for ticket in gate.queue if self._can_run(ticket)]
+            if not runnable:
+                break
+            ticket = min(runnable, key=Ticket.sort_key)
+            if not self._take_shared_slot(ticket.model, gate):
+                break  # Other workers hold the remaining slots
+            gate.queue.remove(ticket)
+            self._admit(gate, ticket)
+
+        # Clients whose last tag is behind the virtual clock carry no state
+        gate.last_finish = {
+            client: finish for client, finish in gate.last_finish.items()
+            if finish > gate.virtual_time
+        }
+
+    def _estimate_wait(self, gate: _ModelGate, position: int) -> float:
+        """Seconds until the request at `position` (1-based) gets a slot"""
+        if position <= 0:
+            return 0.0
+        rounds = math.ceil(position / max(1, gate.limit))
+        return rounds * gate.avg_service_time
+
+    def _reject(self, gate: _ModelGate, position: int) -> QueueFullError:
+        self._rejected += 1
+        retry_after = self._estimate_wait(gate, position)
+        return QueueFullError(max(1, int(math.ceil(retry_after))))
+
+    def enqueue(self, model: str, client_id: str = "anonymous", weight: float = 1.0) -> Ticket:
+        """
+        Admit immediately if a slot is free (and the client is below its
+        in-flight cap), otherwise add to the fair queue.
+        Raises QueueFullError when the queue is already at max_queue, or the
+        client already has max_queued_per_client requests waiting.
+        """
+        gate = self._gate(model)
+        ticket = Ticket(model, client_id, max(weight, 0.01))
+        self._depth_histogram.observe(self.queued_total())
+
+        self._seq += 1
+        ticket.seq = self._seq
+        ticket.start_tag = max(gate.virtual_time, gate.last_finish.get(client_id, 0.0))
+        ticket.finish_tag = ticket.start_tag + 1.0 / ticket.weight
+
+        if gate.active < gate.limit and self._can_run(ticket) and not any(
+            self._can_run(queued) for queued in gate.queue
+        ) and self._take_shared_slot(model, gate):
+            gate.last_finish[client_id] = ticket.finish_tag
+            self._admit(gate, ticket)
+            return ticket
+
+        if self.queued_total() >= self.max_queue:
+            raise self._reject(gate, len(gate.queue) + 1)
+
+        if self.max_queued_per_client and self._queued_for_client(client_id) >= self.max_queued_per_client:
+            self._rejected_client_quota += 1
+            raise self._reject(gate, self.max_queued_per_client + 1)
+
+        gate.last_finish[client_id] = ticket.finish_tag
+        gate.queue.append(ticket)
+        return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based queue position (in service order), or 0 once admitted"""
+        if ticket.admitted_at is not None:
+            return 0
+        gate = self._gate(ticket.model)
+        if ticket not in gate.queue:
+            return 0
+        key = ticket.sort_key()
+        return 1 + sum(1 for queued in gate.queue if queued.sort_key() < key)
+
+    async def wait(self, ticket: Ticket) -> AsyncIterator[Tuple[int, float]]:
+        """
+        Wait for a slot, yielding (position, estimated_wait_seconds) every
+        time the ticket's queue position changes. Returns once admitted.
+        """
+        gate = self._gate(ticket.model)
+        last_position = None
+        while ticket.admitted_at is None:
+            changed = gate.changed
+            position = self.position(ticket)
+            if position != last_position:
+                last_position = position
+                yield position, self._estimate_wait(gate, position)
+            if self.slots is None:
+                await changed.wait()
+                continue
+            try:
+                await asyncio.wait_for(changed.wait(), self.shared_poll_interval)
+            except asyncio.TimeoutError:
+                # A slot may have been freed by another worker
+                active = gate.active
+                self._dispatch(gate)
+                if gate.active != active:
+                    gate.notify()
+
+    def release(self, ticket: Ticket):
+        """Free the ticket's slot (or leave the queue). Safe to call twice."""
+        if ticket.released:
+            return
+        ticket.released = True
+        gate = self._gate(ticket.model)
+
+        if ticket.admitted_at is None:
+            try:
+                gate.queue.remove(ticket)
+            except ValueError:
+                pass
+        else:
+            gate.active = max(0, gate.active - 1)
+            if self.slots is not None:
+                self.slots.release(ticket.model)
+            remaining = self._client_active.get(ticket.client_id, 0) - 1
+            if remaining > 0:
+                self._client_active[ticket.client_id] = remaining
+            else:
+                self._client_active.pop(ticket.client_id, None)
+            service_time = time.time() - ticket.admitted_at
+            gate.avg_service_time += self.SERVICE_TIME_ALPHA * (service_time - gate.avg_service_time)
+
+        # The client's in-flight cap spans all models, so any gate may move
+        for other in self._gates.values():
+            self._dispatch(other)
+            other.notify()
+
+    def get_stats(self) -> Dict:
+        waiting_clients = {
+            ticket.client_id for gate in self._gates.values() for ticket in gate.queue
+        }
+        return {
+            "max_queue": self.max_queue,
+            "queued": self.queued_total(),
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "rejected_client_quota": self._rejected_client_quota,
+            "clients": {
+                "active": len(self._client_active),
+                "waiting": len(waiting_clients),
+                "max_inflight_per_client": self.max_inflight_per_client,
+                "max_queued_per_client": self.max_queued_per_client
+            },
+            "models": {
+                model: {
+                    "limit": gate.limit,
+                    "active": gate.active,
+                    "queued": len(gate.queue),
+                    "avg_service_time": round(gate.avg_service_time, 2),
+                    **({"active_all_workers": self.slots.active(model)} if self.slots is not None else {})
+                }
+                for model, gate in self._gates.items()
+            },
+            "queue_depth_histogram": self._depth_histogram.to_dict(),
+            "wait_time_histogram": self._wait_histogram.to_dict()
+        }
@@ -1,10 +1,9 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain_community.llms import Ollama
+from fastapi.responses import StreamingResponse, JSONResponse, Response, PlainTextResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, PrivateAttr
 from langchain.prompts import PromptTemplate
 from config import (
     DB_DIR,
@@ -14,23 +13,151 @@ from config import (
     get_book_display_name,
     CONTEXT_VALIDATION_THRESHOLD,
     REJECTION_MESSAGE,
-    ENABLE_MULTI_SEARCH
+    ENABLE_MULTI_SEARCH,
+    ENABLE_RETRIEVAL_CACHE,
+    RETRIEVAL_CACHE_MAX_ENTRIES,
+    RETRIEVAL_CACHE_TTL_SECONDS,
+    INDEX_VERSION_CHECK_INTERVAL,
+    ENABLE_ANSWER_CACHE,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ANSWER_CACHE_TEMPERATURE_BAND,
+    ENABLE_CACHE_WARMUP,
+    WARMUP_TOP_N,
+    WARMUP_INTERVAL_SECONDS,
+    WARMUP_INITIAL_DELAY_SECONDS,
+    WARMUP_CONCURRENCY,
+    WARMUP_GENERATE_ANSWERS,
+    WARMUP_ADMISSION_WEIGHT,
+    OLLAMA_HOST,
+    OLLAMA_TIMEOUT,
+    OLLAMA_MAX_CONNECTIONS,
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+    ADMISSION_DEFAULT_CONCURRENCY,
+    ADMISSION_MODEL_CONCURRENCY,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_INITIAL_SERVICE_TIME,
+    ADMISSION_AUTHENTICATED_WEIGHT,
+    ADMISSION_ANONYMOUS_WEIGHT,
+    ADMISSION_MAX_INFLIGHT_PER_CLIENT,
+    ADMISSION_MAX_QUEUED_PER_CLIENT,
+    ADMISSION_TRUST_PROXY_HEADERS,
+    ADMISSION_TRUSTED_PROXIES,
+    ENABLE_LOAD_SHEDDING,
+    LOAD_SHEDDING_LEVELS,
+    LOAD_SHEDDING_QUEUE_THRESHOLDS,
+    LOAD_SHEDDING_LATENCY_THRESHOLDS,
+    LOAD_SHEDDING_LATENCY_WINDOW,
+    LOAD_SHEDDING_COOLDOWN_SECONDS,
+    ENABLE_MODEL_ROUTING,
+    MODEL_ROUTES,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_PRELOAD_MODELS,
+    OLLAMA_WARMUP_PROMPT,
+    OLLAMA_PRELOAD_REQUIRED,
+    RETRIEVAL_WARMUP_QUERY,
+    STARTUP_RETRY_AFTER_SECONDS,
+    ENABLE_CONVERSATION_MEMORY,
+    CONVERSATION_SUMMARY_MAX_TOKENS,
+    CONVERSATION_LAST_EXCHANGE_MAX_TOKENS,
+    CONVERSATION_SUMMARY_MODEL,
+    CONVERSATION_SUMMARY_ADMISSION_WEIGHT,
+    CONVERSATION_MEMORY_CACHE_ENTRIES,
+    ENABLE_FOLLOWUP_RETRIEVAL,
+    FOLLOWUP_MIN_SCORE,
+    FOLLOWUP_QUERY_BLEND,
+    FOLLOWUP_PAGE_WINDOW,
+    FOLLOWUP_MAX_TURNS,
+    FOLLOWUP_MAX_CONVERSATIONS,
+    FOLLOWUP_TTL_SECONDS,
+    TIMING_STATS_WINDOW,
+    ENABLE_TRACING,
+    TRACE_FILE,
+    TRACE_MAX_BYTES,
+    TRACE_BACKUP_COUNT,
+    TRACE_QUEUE_SIZE,
+    PROFILE_RING_SIZE,
+    ENABLE_SAMPLING_PROFILER,
+    SAMPLING_PROFILER_HZ,
+    SAMPLING_PROFILER_BUCKET_SECONDS,
+    SAMPLING_PROFILER_RETENTION_SECONDS,
+    TRACEMALLOC_AT_STARTUP,
+    TRACEMALLOC_FRAMES,
+    MEMORY_SNAPSHOTS_MAX,
+    SLOW_REQUEST_THRESHOLD_SECONDS,
+    SLOW_LOG_FILE,
+    SLOW_LOG_MAX_BYTES,
+    SLOW_LOG_BACKUP_COUNT,
+    LOG_LEVEL,
+    LOG_FILE,
+    LOG_TO_CONSOLE,
+    LOG_DEBUG_SAMPLE_RATE,
+    LOG_QUEUE_SIZE,
+    LOG_MAX_BYTES,
+    LOG_BACKUP_COUNT,
+    REQUEST_LOG_BATCH_SIZE,
+    REQUEST_LOG_FLUSH_SECONDS,
+    REQUEST_LOG_QUEUE_SIZE,
+    RECENT_TASKS_MAX,
+    STATUS_HISTORY_MAX,
+    API_HOST,
+    API_PORT,
+    WORKERS,
+    WORKER_TORCH_THREADS,
+    WORKER_RESTART_DELAY_SECONDS,
+    ADMISSION_SHARED_POLL_SECONDS,
+    SHARED_CACHE_BATCH_SIZE,
+    SHARED_CACHE_FLUSH_SECONDS,
+    SHARED_CACHE_QUEUE_SIZE
 )
 from priority_retriever import prioritized_search
-from context_validator import ContextValidator
 from multi_search import MultiSearchEngine
+from cache import IndexVersion, RetrievalCache, SemanticAnswerCache, get_chunk_id
+from warmup import CacheWarmer
+from coalescing import SingleFlight, make_flight_key
+from ollama_client import AsyncOllamaClient
+from admission import AdmissionController, QueueFullError
+from load_shedding import LoadShedder
+from model_router import ModelRouter
+from readiness import ReadinessTracker
+from prompts import SYSTEM_PROMPT, TURN_TEMPLATE, SUMMARY_TEMPLATE, stable_history_window
+from conversation_memory import ConversationMemory
+from followup_retrieval import FollowUpRetriever
+from timing import TimingStats, RequestTimer, start_request_timer, current_timer
+import metrics
+from metrics import QUERY_OUTCOMES, TOKENS, InstrumentedEmbeddings, MetricsMiddleware
+import tracing
+from tracing import TracingMiddleware, SpanExporter
+from profiling import ProfileStore, format_stats, profiled, profiled_function, start_session
+from sampling_profiler import SamplingProfiler
+import memory_diagnostics
+from memory_diagnostics import TracemallocSnapshots
+import slow_log
+from slow_log import SlowRequestLog, question_hash
+import structured_log
+from batch_writer import BatchWriter
+from shared_state import SharedSlots, SharedCacheStore
 import database
 import auth
-import torch
 import os
+import sys
 import json
+import re
 import asyncio
 import time
 from typing import List, Optional, Dict
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
 from datetime import datetime
-from collections import deque
+from collections import OrderedDict
 import threading
+import uuid
+import hashlib
+import secrets
+import ipaddress
+
+logger = structured_log.get_logger("api")
 
 app = FastAPI(
     title="Assistente Espírita API",
@@ -45,71 +172,102 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)  # outermost: its root span covers the whole request
 
 # ============================================================================
 # SISTEMA DE MONITORAMENTO GLOBAL
 # ============================================================================
 
 class ServerStatus:
-    """Thread-safe status monitoring system"""
+    """
+    Thread-safe status monitoring system.
+
+    Active tasks and the last `recent_max` finished ones are kept in
+    memory (dicts: O(1) lookup by task_id). Every task is also handed to
+    `writer` (a BatchWriter into the SQLite requests table) when it starts
+    and when it finishes, so older tasks, tasks of other workers and
+    history across restarts are read from SQL.
+    """
     
-    def __init__(self):
+    def __init__(self, writer: Optional[BatchWriter] = None, recent_max: int = 1000):
         self._lock = threading.Lock()
         self._active_requests = 0
         self._total_requests = 0
         self._last_request_time = None
-        self._request_history = deque(maxlen=100)  # Last 100 requests
+        self._recent_tasks: "OrderedDict[str, Dict]" = OrderedDict()  # finished, oldest first
+        self._recent_max = recent_max
         self._current_tasks = {}  # task_id -> task_info
-        self._task_counter = 0
+        self._writer = writer
         
     def start_request(self, question: str, mode: str = "normal") -> str:
         """Register new request and return task_id"""
+        # Unique across restarts and workers (records outlive the process)
+        task_id = f"task_{uuid.uuid4().hex[:16]}"
+        now = datetime.now()
+        task_info = {
+            "task_id": task_id,
+            "question": question[:100],  # Truncate (kept in memory only)
+            "question_hash": question_hash(question),
+            "mode": mode,
+            "worker_pid": os.getpid(),
+            "status": "processing",
+            "started_at": now.isoformat(),
+            "stage": "initialized",
+            "progress": 0
+        }
         with self._lock:
-            self._task_counter += 1
-            task_id = f"task_{self._task_counter}"
-            
             self._active_requests += 1
             self._total_requests += 1
-            self._last_request_time = datetime.now()
-            
-            task_info = {
-                "task_id": task_id,
-                "question": question[:100],  # Truncate
-                "mode": mode,
-                "status": "processing",
-                "started_at": datetime.now().isoformat(),
-                "stage": "initialized",
-                "progress": 0
-            }
-            
+            self._last_request_time = now
             self._current_tasks[task_id] = task_info
-            
-            return task_id
+            record = dict(task_info)
+        self._persist(record)
+        return task_id
     
     def update_task(self, task_id: str, stage: str, progress: int):
-        """Update task progress"""
+        """Update task progress (in memory only: stages change too often to write)"""
         with self._lock:
             if task_id in self._current_tasks:
                 self._current_tasks[task_id]["stage"] = stage
                 self._current_tasks[task_id]["progress"] = progress
     
+    def annotate_task(self, task_id: str, **fields):
+        """Attach extra fields to a task (e.g. coalesced=True)"""
+        with self._lock:
+            if task_id in self._current_tasks:
+                self._current_tasks[task_id].update(fields)
+    
     def complete_request(self, task_id: str, success: bool = True, error: str = None):
         """Mark request as complete"""
+        record = None
         with self._lock:
-            if task_id in self._current_tasks:
-                task = self._current_tasks[task_id]
+            task = self._current_tasks.pop(task_id, None)
+            if task is not None:
+                completed_at = datetime.now()
                 task["status"] = "completed" if success else "failed"
-                task["completed_at"] = datetime.now().isoformat()
+                task["completed_at"] = completed_at.isoformat()
+                task["duration_seconds"] = round(
+                    (completed_at - datetime.fromisoformat(task["started_at"])).total_seconds(), 3
+                )
                 task["progress"] = 100 if success else task.get("progress", 0)
                 
                 if error:
                     task["error"] = error
                 
-                # Move to history
-                self._request_history.append(task)
-                del self._current_tasks[task_id]
+                # Move to the recent tasks
+                self._recent_tasks[task_id] = task
+                while len(self._recent_tasks) > self._recent_max:
+                    self._recent_tasks.popitem(last=False)
+                record = dict(task)
             
             self._active_requests = max(0, self._active_requests - 1)
+        if record is not None:
+            self._persist(record)
+    
+    def _persist(self, record: Dict):
+        if self._writer is not None:
+            self._writer.submit(record)
     
     def get_status(self) -> Dict:
         """Get current server status (thread-safe, non-blocking)"""
@@ -124,37 +282,139 @@ class ServerStatus:
             }
     
     def get_task_status(self, task_id: str) -> Optional[Dict]:
-        """Get status of specific task"""
+        """Status of a task of this process (None: look it up in SQL)"""
         with self._lock:
-            # Check active tasks
-            if task_id in self._current_tasks:
-                return self._current_tasks[task_id]
-            
-            # Check history
-            for task in self._request_history:
-                if task["task_id"] == task_id:
-                    return task
-            
-            return None
+            return self._current_tasks.get(task_id) or self._recent_tasks.get(task_id)
     
     def get_history(self, limit: int = 10) -> List[Dict]:
-        """Get recent request history"""
+        """Recent finished requests of this process"""
         with self._lock:
-            return list(self._request_history)[-limit:]
-
-# Global status tracker
-status_tracker = ServerStatus()
+            return list(self._recent_tasks.values())[-limit:]
+
+# Global status tracker (task records written to SQLite in batches)
+request_writer = BatchWriter(
+    database.save_requests,
+    name="request-writer",
+    batch_size=REQUEST_LOG_BATCH_SIZE,
+    flush_interval=REQUEST_LOG_FLUSH_SECONDS,
+    max_queue=REQUEST_LOG_QUEUE_SIZE
+)
+status_tracker = ServerStatus(request_writer, RECENT_TASKS_MAX)
 startup_time = time.time()
 
+# Multi-worker mode (prefork.py): index of this worker, None in a single process
+worker_index: Optional[int] = None
+shared_cache_writer = BatchWriter(
+    database.save_shared_cache,
+    name="shared-cache-writer",
+    batch_size=SHARED_CACHE_BATCH_SIZE,
+    flush_interval=SHARED_CACHE_FLUSH_SECONDS,
+    max_queue=SHARED_CACHE_QUEUE_SIZE
+)
+shared_cache: Optional[SharedCacheStore] = None  # L2 of the caches, shared by the workers
+
 # Global variables
 vectorstore = None
+embeddings = None
+device_info = {"device": "cpu", "cuda_available": False, "gpu": "CPU"}  # Filled once torch loads
 context_validator = None
 multi_search_engine = None
+followup_retriever = None
+retrieval_cache = None
+answer_cache = None
+cache_warmer = None
+single_flight = SingleFlight()
+ollama_client = AsyncOllamaClient(
+    host=OLLAMA_HOST,
+    timeout=OLLAMA_TIMEOUT,
+    max_connections=OLLAMA_MAX_CONNECTIONS,
+    max_keepalive_connections=OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+    keep_alive=OLLAMA_KEEP_ALIVE
+)
+admission_controller = AdmissionController(
+    default_limit=ADMISSION_DEFAULT_CONCURRENCY,
+    model_limits=ADMISSION_MODEL_CONCURRENCY,
+    max_queue=ADMISSION_MAX_QUEUE,
+    initial_service_time=ADMISSION_INITIAL_SERVICE_TIME,
+    max_inflight_per_client=ADMISSION_MAX_INFLIGHT_PER_CLIENT,
+    max_queued_per_client=ADMISSION_MAX_QUEUED_PER_CLIENT,
+    shared_poll_interval=ADMISSION_SHARED_POLL_SECONDS
+)
+load_shedder = LoadShedder(
+    levels=LOAD_SHEDDING_LEVELS,
+    queue_thresholds=LOAD_SHEDDING_QUEUE_THRESHOLDS,
+    latency_thresholds=LOAD_SHEDDING_LATENCY_THRESHOLDS,
+    latency_window=LOAD_SHEDDING_LATENCY_WINDOW,
+    cooldown_seconds=LOAD_SHEDDING_COOLDOWN_SECONDS,
+    enabled=ENABLE_LOAD_SHEDDING
+)
+model_router = ModelRouter(MODEL_ROUTES, default_num_ctx=CONTEXT_WINDOW, enabled=ENABLE_MODEL_ROUTING)
+readiness = ReadinessTracker()
+preload_task = None
+conversation_memory = None  # Created once the SQLite database is up
+ANONYMOUS_SESSION_HEADER = "X-Anonymous-Session"  # Owner of an anonymous client's conversation memory and follow-up state
+timing_stats = TimingStats(TIMING_STATS_WINDOW)
+profile_store = ProfileStore(PROFILE_RING_SIZE)
+sampling_profiler = SamplingProfiler(
+    hz=SAMPLING_PROFILER_HZ,
+    bucket_seconds=SAMPLING_PROFILER_BUCKET_SECONDS,
+    retention_seconds=SAMPLING_PROFILER_RETENTION_SECONDS
+)
+
+def _cache_counts(field: str) -> Dict:
+    stats = get_cache_stats()
+    counts = {(name,): stats[name][field] for name in ("retrieval", "answer") if name in stats}
+    if "followup" in stats:
+        followup = stats["followup"]
+        counts[("followup",)] = followup["reused"] if field == "hits" else followup["attempts"] - followup["reused"]
+    return counts
+
+# Read from the components' own stats at scrape time (no hot-path cost)
+metrics.registry.callback(
+    "chatbot_cache_hits_total", "Cache hits by cache (retrieval, answer, followup)", "counter",
+    lambda: _cache_counts("hits"), ["cache"]
+)
+metrics.registry.callback(
+    "chatbot_cache_misses_total", "Cache misses by cache (retrieval, answer, followup)", "counter",
+    lambda: _cache_counts("misses"), ["cache"]
+)
+metrics.registry.callback(
+    "chatbot_queue_depth", "Requests waiting for a generation slot, by model", "gauge",
+    lambda: {(model,): gate["queued"] for model, gate in admission_controller.get_stats()["models"].items()},
+    ["model"]
+)
+metrics.registry.callback(
+    "chatbot_generations_active", "Generations running, by model", "gauge",
+    lambda: {(model,): gate["active"] for model, gate in admission_controller.get_stats()["models"].items()},
+    ["model"]
+)
+metrics.registry.callback(
+    "chatbot_admission_rejected_total", "Requests refused with HTTP 429 (queue or per-client quota full)", "counter",
+    lambda: admission_controller.get_stats()["rejected"]
+)
+metrics.registry.callback(
+    "chatbot_degradation_level", "Current load-shedding level (0 = normal)", "gauge",
+    lambda: load_shedder.get_stats()["level"]
+)
+metrics.registry.callback(
+    "chatbot_process_resident_memory_bytes", "Resident set size of this process", "gauge",
+    lambda: memory_diagnostics.process_memory()["rss_bytes"]
+)
+metrics.registry.callback(
+    "chatbot_requests_active", "Questions being processed", "gauge",
+    lambda: status_tracker.get_status()["active_requests"]
+)
+
 executor = ThreadPoolExecutor(max_workers=3)
 
-# LLM cache — reuse across requests with same model/temperature
-_llm_cache = {}  # (model_name, temperature) -> (llm, prompt_template)
-_llm_cache_lock = threading.Lock()
+# Per-turn prompt (static instructions go in the system prompt, see prompts.py);
+# generation itself goes through ollama_client
+turn_prompt = PromptTemplate(
+    template=TURN_TEMPLATE,
+    input_variables=["conversation_context", "context", "question"]
+)
+memory_snapshots = TracemallocSnapshots(MEMORY_SNAPSHOTS_MAX)
+slow_request_log = SlowRequestLog(SLOW_REQUEST_THRESHOLD_SECONDS, SLOW_LOG_FILE, SLOW_LOG_MAX_BYTES, SLOW_LOG_BACKUP_COUNT)
 
 # ============================================================================
 # MODELS
@@ -166,11 +426,14 @@ class Message(BaseModel):
 
 class QueryRequest(BaseModel):
     question: str
-    model_name: str = "qwen2.5:7b"
+    model_name: str = "auto"  # "auto" = server picks the model by question complexity
     temperature: float = 0.3
     top_k: int = 3
     fetch_k: int = 15
-    conversation_history: Optional[List[Message]] = None
+    conversation_history: Optional[List[Message]] = None  # Not needed for logged-in users with chat_id
+    chat_id: Optional[str] = None  # Server-side history (logged in) and rolling conversation memory
+    use_cache: bool = True  # Set to False to bypass the semantic answer cache
+    _memory_owner: Optional[str] = PrivateAttr(default=None)  # Set by the server, never by the client
 
 class Source(BaseModel):
     content: str
@@ -186,6 +449,9 @@ class QueryResponse(BaseModel):
     answer: str
     sources: list[Source]
     processing_time: float
+    cached: bool = False
+    degradation_level: int = 0
+    timing: Dict = {}  # Per-stage seconds, TTFT and token counts (see timing.py)
 
 class ServerStatusResponse(BaseModel):
     """Lightweight status response - ALWAYS returns quickly"""
@@ -197,6 +463,8 @@ class ServerStatusResponse(BaseModel):
     vectorstore_loaded: bool
     uptime_seconds: float
     timestamp: str
+    degradation_level: int = 0
+    ready: bool = False
 
 class DetailedStatusResponse(BaseModel):
     """Detailed status with current tasks"""
@@ -211,6 +479,17 @@ class DetailedStatusResponse(BaseModel):
     vectorstore_loaded: bool
     uptime_seconds: float
     timestamp: str
+    caches: Dict = {}
+    coalescing: Dict = {}
+    llm: Dict = {}
+    admission: Dict = {}
+    load_shedding: Dict = {}
+    routing: Dict = {}
+    conversation_memory: Dict = {}
+    tracing: Dict = {}
+    logging: Dict = {}
+    request_log: Dict = {}
+    workers: Dict = {}
 
 class TaskStatusResponse(BaseModel):
     """Status of specific task"""
@@ -246,62 +525,302 @@ class SaveConversationRequest(BaseModel):
 
 @app.on_event("startup")
 async def startup_event():
-    """Load vectorstore on startup"""
-    global vectorstore, context_validator, multi_search_engine, startup_time
-    
+    """Start serving right away; load models in the background"""
+    global startup_time, preload_task, conversation_memory, shared_cache
+
     startup_time = time.time()
 
+    # Everything that must be hot before /ready reports ready
+    for component in ["database", "torch", "embeddings", "vectorstore", "context_validator", "retrieval_warmup"]:
+        readiness.register(component)
+    for model in OLLAMA_PRELOAD_MODELS:
+        readiness.register(f"model:{model}", required=OLLAMA_PRELOAD_REQUIRED)
+
     print("=" * 60)
     print("🚀 Iniciando Assistente Espírita API v1.3.0")
     print("   (Auth + Chat Persistence + Status Tracking)")
     print("=" * 60)
 
+    structured_log.configure(
+        LOG_LEVEL,
+        LOG_FILE,
+        console=LOG_TO_CONSOLE,
+        debug_sample_rate=LOG_DEBUG_SAMPLE_RATE,
+        queue_size=LOG_QUEUE_SIZE,
+        max_bytes=LOG_MAX_BYTES,
+        backup_count=LOG_BACKUP_COUNT
+    )
+    print(f"📝 Logs estruturados ({LOG_LEVEL}) em: {LOG_FILE}")
+
+    if ENABLE_TRACING:
+        tracing.configure(SpanExporter(
+            TRACE_FILE,
+            max_bytes=TRACE_MAX_BYTES,
+            backup_count=TRACE_BACKUP_COUNT,
+            max_queue=TRACE_QUEUE_SIZE
+        ))
+        print(f"🧭 Tracing ativo: spans em {TRACE_FILE}")
+
+    if TRACEMALLOC_AT_STARTUP:
+        memory_snapshots.start(TRACEMALLOC_FRAMES)
+        print(f"🧠 tracemalloc ativo desde a inicialização ({TRACEMALLOC_FRAMES} quadro(s))")
+
+    if ENABLE_SAMPLING_PROFILER:
+        sampling_profiler.start()
+        print(f"🔬 Profiler de amostragem ativo ({SAMPLING_PROFILER_HZ:g} Hz)")
+
     # Initialize SQLite database
+    readiness.start("database")
     database.init_db()
+    if worker_index is None:
+        # Multi-worker mode does this in the supervisor, before any worker starts
+        report_unfinished_requests(database.fail_unfinished_requests())
+    request_writer.start()
+    if worker_index is not None:
+        shared_cache_writer.start()
+        shared_cache = SharedCacheStore(shared_cache_writer)
+    readiness.ready("database")
     print("✅ Banco de dados SQLite inicializado!")
-    
-    if not os.path.exists(DB_DIR):
-        print(f"❌ Banco de dados não encontrado em: {DB_DIR}")
-        print(f"⚠️  Execute: python process_books.py")
-        return
-    
-    print(f"📚 Carregando banco de dados vetorial de: {DB_DIR}")
-    
-    device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    if ENABLE_CONVERSATION_MEMORY:
+        conversation_memory = ConversationMemory(
+            load=database.get_conversation_memory,
+            save=database.save_conversation_memory,
+            summarize=summarize_conversation,
+            is_busy=lambda: admission_controller.queued_total() > 0 or load_shedder.get_stats()["level"] > 0,
+            max_summary_tokens=CONVERSATION_SUMMARY_MAX_TOKENS,
+            max_exchange_tokens=CONVERSATION_LAST_EXCHANGE_MAX_TOKENS,
+            max_entries=CONVERSATION_MEMORY_CACHE_ENTRIES,
+            read_through=worker_index is not None
+        )
+        print(f"✅ Memória de conversa ativa (resumo até {CONVERSATION_SUMMARY_MAX_TOKENS} tokens)")
+
+    # Heavy imports, models and warm-up load in the background:
+    # /health answers right away, /ready (and /query) once everything is hot
+    preload_task = asyncio.create_task(load_backend())
+    print("=" * 60)
+    print(f"🌐 API aceitando conexões em: http://localhost:{API_PORT} (modelos carregando em segundo plano)")
+    print(f"📖 Documentação em: http://localhost:{API_PORT}/docs")
+    print(f"🔍 Status: http://localhost:{API_PORT}/status")
+    print(f"📊 Status detalhado: http://localhost:{API_PORT}/status/detailed")
+    print(f"✅ Prontidão: http://localhost:{API_PORT}/ready")
+    print("=" * 60)
+
+async def run_startup_step(component: str, loader, *args):
+    """Run a blocking startup step in a worker thread, tracking readiness and time"""
+    readiness.start(component)
+    try:
+        result = await run_in_threadpool(loader, *args)
+    except Exception as e:
+        readiness.fail(component, str(e))
+        print(f"❌ Falha ao carregar {component}: {e}")
+        raise
+    readiness.ready(component)
+    print(f"⏱️  {component}: {readiness.elapsed(component):.2f}s")
+    return result
+
+def load_device_info() -> Dict:
+    import torch  # Imported lazily: takes seconds and isn't needed to answer /health
+
+    cuda_available = torch.cuda.is_available()
+    device = "cuda" if cuda_available else "cpu"
     print(f"📊 Dispositivo: {device}")
-    
-    if torch.cuda.is_available():
+    if cuda_available:
         print(f"🎮 GPU: {torch.cuda.get_device_name(0)}")
         print(f"💾 VRAM: {torch.cuda.get_device_properties(0).total_memory / 1024**3:.1f} GB")
-    
-    embeddings = HuggingFaceEmbeddings(
+    return {
+        "device": device,
+        "cuda_available": cuda_available,
+        "gpu": torch.cuda.get_device_name(0) if cuda_available else "CPU"
+    }
+
+def load_embeddings(device: str):
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    return InstrumentedEmbeddings(HuggingFaceEmbeddings(
         model_name=EMBEDDING_MODEL,
         model_kwargs={'device': device}
-    )
-    
-    vectorstore = Chroma(
+    ))
+
+def load_vectorstore(embedding_function):
+    from langchain_community.vectorstores import Chroma
+
+    return Chroma(
         persist_directory=DB_DIR,
-        embedding_function=embeddings
+        embedding_function=embedding_function
     )
 
-    print("✅ Banco de dados carregado com sucesso!")
+def load_context_validator(embedding_function):
+    from context_validator import ContextValidator
+
+    return ContextValidator(embedding_function)
+
+def report_unfinished_requests(count: int):
+    if count:
+        print(f"⚠️  {count} requisição(ões) interrompida(s) pelo último desligamento marcada(s) como falha")
+
+def preload_for_workers(workers: int):
+    """
+    Supervisor side of multi-worker mode, before forking: shared admission
+    slots, and torch + the embedding model loaded once for all workers.
+    Nothing here may start threads or run inference (see prefork.py).
+    """
+    global device_info, embeddings
+
+    admission_controller.slots = SharedSlots(workers)
+    # Connections opened and closed here, none inherited by the workers
+    database.init_db()
+    report_unfinished_requests(database.fail_unfinished_requests())
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")  # Rust tokenizer threads don't survive a fork
+    os.environ.setdefault("PYTORCH_NVML_BASED_CUDA_CHECK", "1")  # is_available() without initializing CUDA
+
+    if not os.path.exists(DB_DIR):
+        return  # load_backend reports it in each worker
+    import torch
+
+    if torch.cuda.is_available():
+        # A CUDA context can't be inherited: each worker loads its own model on the GPU
+        print("🎮 CUDA disponível: cada worker carrega o modelo de embeddings na GPU")
+        return
 
-    # Initialize context validator
-    print("🔍 Inicializando validador de contexto...")
-    context_validator = ContextValidator(embeddings)
-    print("✅ Validador de contexto pronto!")
+    torch.set_num_threads(1)  # No OpenMP pool before the fork; workers set their own count
+    started = time.time()
+    device_info = load_device_info()
+    embeddings = load_embeddings(device_info["device"])
+    print(f"⏱️  Modelo de embeddings pré-carregado para {workers} workers em {time.time() - started:.2f}s")
+
+def init_worker(index: int):
+    """Runs in each forked worker, before its event loop starts"""
+    global worker_index
+    worker_index = index
+    if admission_controller.slots is not None:
+        admission_controller.slots.worker = index
+    if "torch" in sys.modules:
+        threads = WORKER_TORCH_THREADS or max(1, (os.cpu_count() or 1) // WORKERS)
+        sys.modules["torch"].set_num_threads(threads)
+
+def release_worker(index: int):
+    """Supervisor side: free the admission slots held by a worker that exited"""
+    if admission_controller.slots is not None:
+        admission_controller.slots.clear_worker(index)
+
+async def load_backend():
+    """Background startup: models, vectorstore, caches, then warm-up"""
+    global vectorstore, embeddings, context_validator, multi_search_engine
+    global retrieval_cache, answer_cache, cache_warmer, device_info, followup_retriever
+
+    if not os.path.exists(DB_DIR):
+        print(f"❌ Banco de dados não encontrado em: {DB_DIR}")
+        print(f"⚠️  Execute: python process_books.py")
+        readiness.fail("vectorstore", f"Banco de dados não encontrado em: {DB_DIR}")
+        return
+
+    print(f"📚 Carregando banco de dados vetorial de: {DB_DIR}")
+    try:
+        if embeddings is None:
+            device_info = await run_startup_step("torch", load_device_info)
+            embeddings = await run_startup_step("embeddings", load_embeddings, device_info["device"])
+        else:
+            # Loaded by the supervisor before forking (preload_for_workers)
+            for component in ("torch", "embeddings"):
+                readiness.start(component)
+                readiness.ready(component)
+        vectorstore = await run_startup_step("vectorstore", load_vectorstore, embeddings)
+        print("✅ Banco de dados carregado com sucesso!")
+
+        # Initialize context validator
+        print("🔍 Inicializando validador de contexto...")
+        context_validator = await run_startup_step("context_validator", load_context_validator, embeddings)
+        print("✅ Validador de contexto pronto!")
+    except Exception:
+        return
+
+    # Initialize retrieval cache
+    if ENABLE_RETRIEVAL_CACHE:
+        retrieval_cache = RetrievalCache(
+            vectorstore,
+            max_entries=RETRIEVAL_CACHE_MAX_ENTRIES,
+            ttl_seconds=RETRIEVAL_CACHE_TTL_SECONDS,
+            version_check_interval=INDEX_VERSION_CHECK_INTERVAL,
+            shared=shared_cache
+        )
+        print(f"✅ Cache de buscas ativo (índice versão {retrieval_cache.get_stats()['index_version']})")
+
+    # Initialize semantic answer cache
+    if ENABLE_ANSWER_CACHE:
+        answer_cache = SemanticAnswerCache(
+            max_entries=ANSWER_CACHE_MAX_ENTRIES,
+            ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+            similarity_threshold=ANSWER_CACHE_SIMILARITY_THRESHOLD,
+            temperature_band=ANSWER_CACHE_TEMPERATURE_BAND,
+            shared=shared_cache,
+            # Answers come from retrieved chunks: drop them when the index is rebuilt
+            index_version=(
+                retrieval_cache.index_version if retrieval_cache is not None
+                else IndexVersion(vectorstore, INDEX_VERSION_CHECK_INTERVAL)
+            )
+        )
+        print(f"✅ Cache semântico de respostas ativo (limiar {ANSWER_CACHE_SIMILARITY_THRESHOLD})")
 
     # Initialize multi-search engine
     print("🔍 Inicializando motor de múltiplas buscas...")
-    multi_search_engine = MultiSearchEngine(vectorstore)
+    multi_search_engine = MultiSearchEngine(vectorstore, retrieval_cache=retrieval_cache)
     print("✅ Motor de múltiplas buscas pronto!")
+
+    # Follow-ups within a conversation reuse the previous turn's neighbourhood
+    if ENABLE_FOLLOWUP_RETRIEVAL:
+        followup_retriever = FollowUpRetriever(
+            vectorstore,
+            embeddings,
+            min_score=FOLLOWUP_MIN_SCORE,
+            query_blend=FOLLOWUP_QUERY_BLEND,
+            page_window=FOLLOWUP_PAGE_WINDOW,
+            max_turns=FOLLOWUP_MAX_TURNS,
+            max_conversations=FOLLOWUP_MAX_CONVERSATIONS,
+            ttl_seconds=FOLLOWUP_TTL_SECONDS
+        )
+        print(f"✅ Reaproveitamento de buscas em follow-ups ativo (score mínimo {FOLLOWUP_MIN_SCORE})")
+
+    # Schedule cache warm-up (runs in the background, only while idle)
+    if ENABLE_CACHE_WARMUP and (retrieval_cache is not None or answer_cache is not None):
+        cache_warmer = CacheWarmer(
+            load_questions=load_warmup_questions,
+            warm_question=warm_question,
+            is_busy=lambda: status_tracker.get_status()["active_requests"] > 0,
+            executor=executor,
+            concurrency=WARMUP_CONCURRENCY
+        )
+        cache_warmer.start(WARMUP_INTERVAL_SECONDS, initial_delay=WARMUP_INITIAL_DELAY_SECONDS)
+        print(f"🔥 Aquecimento de cache agendado (top {WARMUP_TOP_N} perguntas)")
+
+    # Preload Ollama models and warm up retrieval
+    print(f"🔥 Pré-carregando modelos: {', '.join(OLLAMA_PRELOAD_MODELS)} (keep-alive {OLLAMA_KEEP_ALIVE})")
+    await warm_up_backend()
+
     print("=" * 60)
-    print("🌐 API pronta em: http://localhost:8000")
-    print("📖 Documentação em: http://localhost:8000/docs")
-    print("🔍 Status: http://localhost:8000/status")
-    print("📊 Status detalhado: http://localhost:8000/status/detailed")
+    print(f"⏱️  Inicialização em {time.time() - startup_time:.2f}s:")
+    for name, component in readiness.to_dict()["components"].items():
+        seconds = f"{component['seconds']:.2f}s" if component["seconds"] is not None else "-"
+        print(f"   {name:<28} {component['state']:<8} {seconds}")
     print("=" * 60)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background jobs"""
+    if cache_warmer is not None:
+        cache_warmer.stop()
+    if preload_task is not None and not preload_task.done():
+        preload_task.cancel()
+    await ollama_client.close()
+    sampling_profiler.stop()
+    request_writer.shutdown()
+    shared_cache_writer.shutdown()
+    exporter = tracing.get_exporter()
+    if exporter is not None:
+        tracing.configure(None)
+        exporter.shutdown()
+    structured_log.shutdown()
+
 # ============================================================================
 # STATUS ENDPOINTS (NON-BLOCKING)
 # ============================================================================
@@ -318,11 +837,13 @@ async def root():
         online=True,
         status=current_status["status"],
         active_requests=current_status["active_requests"],
-        cuda_available=torch.cuda.is_available(),
-        gpu=torch.cuda.get_device_name(0) if torch.cuda.is_available() else "CPU",
+        cuda_available=device_info["cuda_available"],
+        gpu=device_info["gpu"],
         vectorstore_loaded=vectorstore is not None,
         uptime_seconds=current_status["uptime_seconds"],
-        timestamp=datetime.now().isoformat()
+        timestamp=datetime.now().isoformat(),
+        degradation_level=load_shedder.update(admission_controller.queued_total()),
+        ready=readiness.is_ready()
     )
 
 @app.get("/status", response_model=ServerStatusResponse)
@@ -348,13 +869,34 @@ async def detailed_status():
         total_requests=current_status["total_requests"],
         last_request=current_status["last_request"],
         current_tasks=current_status["current_tasks"],
-        cuda_available=torch.cuda.is_available(),
-        gpu=torch.cuda.get_device_name(0) if torch.cuda.is_available() else "CPU",
+        cuda_available=device_info["cuda_available"],
+        gpu=device_info["gpu"],
         vectorstore_loaded=vectorstore is not None,
         uptime_seconds=current_status["uptime_seconds"],
-        timestamp=datetime.now().isoformat()
+        timestamp=datetime.now().isoformat(),
+        caches=get_cache_stats(),
+        coalescing=single_flight.get_stats(),
+        llm=ollama_client.get_stats(),
+        admission=admission_controller.get_stats(),
+        load_shedding=load_shedder.get_stats(),
+        routing=model_router.get_stats(),
+        conversation_memory=conversation_memory.get_stats() if conversation_memory is not None else {},
+        tracing=tracing.get_exporter().get_stats() if tracing.get_exporter() is not None else {},
+        logging=structured_log.get_stats(),
+        request_log=request_writer.get_stats(),
+        workers=get_worker_stats()
     )
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text exposition format"""
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/status/timing")
+async def timing_status():
+    """Rolling p50/p95/p99 per stage (seconds) and token counts over recent requests"""
+    return timing_stats.get_stats()
+
 @app.get("/status/task/{task_id}", response_model=TaskStatusResponse)
 async def get_task_status(task_id: str):
     """
@@ -362,6 +904,9 @@ async def get_task_status(task_id: str):
     Useful for tracking long-running queries
     """
     task_info = status_tracker.get_task_status(task_id)
+    if task_info is None:
+        # Older, from before a restart, or handled by another worker
+        task_info = await run_in_threadpool(database.get_request, task_id)
     
     return TaskStatusResponse(
         found=task_info is not None,
@@ -369,11 +914,13 @@ async def get_task_status(task_id: str):
     )
 
 @app.get("/status/history")
-async def get_request_history(limit: int = 10):
+async def get_request_history(request: Request, limit: int = 10):
     """
-    Get recent request history
+    Get recent request history (from SQLite: all workers, across restarts).
+    Public up to STATUS_HISTORY_MAX records; admins can read further back.
     """
-    history = status_tracker.get_history(limit)
+    max_limit = RECENT_TASKS_MAX if auth.is_admin(auth.get_optional_user(request)) else STATUS_HISTORY_MAX
+    history = await run_in_threadpool(database.get_recent_requests, min(limit, max_limit))
     
     return {
         "history": history,
@@ -383,7 +930,7 @@ async def get_request_history(limit: int = 10):
 @app.get("/health")
 async def health_check():
     """
-    Ultra-lightweight health check
+    Ultra-lightweight health check (liveness)
     Returns immediately with minimal processing
     """
     return {
@@ -391,16 +938,278 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/ready")
+async def ready_check():
+    """
+    Readiness: 200 once models, embeddings and the vectorstore are hot,
+    503 until then (per-component state in the body)
+    """
+    report = readiness.to_dict()
+    report["timestamp"] = datetime.now().isoformat()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
+def get_cache_stats() -> Dict:
+    """Collect hit-rate metrics from all active caches"""
+    stats = {}
+    if retrieval_cache is not None:
+        stats["retrieval"] = retrieval_cache.get_stats()
+    if answer_cache is not None:
+        stats["answer"] = answer_cache.get_stats()
+    if cache_warmer is not None:
+        stats["warmup"] = cache_warmer.get_stats()
+    if followup_retriever is not None:
+        stats["followup"] = followup_retriever.get_stats()
+    if shared_cache is not None:
+        stats["shared"] = shared_cache.get_stats()
+    return stats
+
+def get_worker_stats() -> Dict:
+    """Which worker answered, in multi-worker mode"""
+    if worker_index is None:
+        return {}
+    return {"index": worker_index, "pid": os.getpid(), "workers": WORKERS}
+
+@profiled_function("answer_cache_embedding")
+def get_answer_cache_context(request: QueryRequest, sources) -> Optional[Dict]:
+    """
+    Build the semantic answer cache lookup arguments for a request.
+    Returns None when the cache doesn't apply (disabled, opted out, or
+    the answer depends on conversation history or memory).
+    """
+    if answer_cache is None or embeddings is None or not request.use_cache:
+        return None
+    if request.conversation_history or uses_conversation_memory(request):
+        return None
+    return {
+        "embedding": embeddings.embed_query(request.question),
+        "model_name": request.model_name,
+        "temperature": request.temperature,
+        "source_ids": [get_chunk_id(doc) for doc in sources]
+    }
+
+@profiled_function("retrieval")
+def search_sources(question: str, top_k: int, fetch_k: int, multi_search: bool = ENABLE_MULTI_SEARCH,
+                   chat_id: Optional[str] = None, owner: Optional[str] = None):
+    """
+    Run the adaptive multi-search (or the legacy single search) and tag
+    every source with its book priority. Within a conversation (chat_id and
+    its owner), follow-ups are first ranked among the previous turn's candidates.
+
+    Returns (sources, search_metadata); search_metadata is None for the
+    legacy single search and has followup_reuse=True for the fast path.
+    """
+    use_followup = chat_id is not None and owner is not None and followup_retriever is not None
+    reused = followup_retriever.search(chat_id, owner, question, top_k, fetch_k) if use_followup else None
+    if reused is not None:
+        sources, search_metadata = reused
+    elif multi_search and multi_search_engine:
+        sources, search_metadata = multi_search_engine.multi_search(
+            question,
+            k=top_k,
+            fetch_k=fetch_k,
+            max_searches=5
+        )
+    else:
+        sources = prioritized_search(
+            vectorstore,
+            question,
+            k=top_k,
+            fetch_k=fetch_k,
+            cache=retrieval_cache
+        )
+        search_metadata = None
+
+    if use_followup:
+        followup_retriever.record(chat_id, owner, question, sources)
+
+    for source in sources:
+        source_path = source.metadata.get('source', '')
+        source.metadata['priority'] = get_book_priority(source_path)
+
+    return sources, search_metadata
+
+def build_sources_context(sources) -> str:
+    """Format retrieved sources as the CONTEXTO block of the prompt"""
+    return "\n\n---\n\n".join([
+        f"[Trecho {i+1} - {get_book_display_name(doc.metadata.get('source', 'Desconhecido'))}]\n{doc.page_content}"
+        for i, doc in enumerate(sources)
+    ])
+
+def apply_model_routing(request: QueryRequest, record_stats: bool = True):
+    """
+    Resolve model_name="auto" to a model by question complexity.
+    Returns (effective_request, route); see model_router.py.
+    """
+    route = model_router.route(request.question, request.model_name, record_stats)
+    if route["complexity_level"] is not None:
+        logger.debug("Modelo escolhido pela complexidade", extra={
+            "complexity_level": route["complexity_level"], "model": route["model"]
+        })
+    if route["model"] != request.model_name:
+        request = request.model_copy(update={"model_name": route["model"]})
+    return request, route
+
+def apply_load_shedding(request: QueryRequest, route: dict):
+    """
+    Adapt the request to the current load (see load_shedding.py).
+    Returns (effective_request, route, plan); the request is untouched at level 0.
+    When the plan swaps the model, the route follows it (num_ctx the fallback
+    model is preloaded with, its num_predict, and its name for latency stats).
+    """
+    history = request.conversation_history or []
+    plan = load_shedder.plan(
+        admission_controller.queued_total(),
+        request.model_name,
+        request.top_k,
+        request.fetch_k,
+        len(history),
+        ENABLE_MULTI_SEARCH
+    )
+    if not plan["changes"]:
+        return request, route, plan
+
+    logger.warning("Requisição em modo degradado", extra={"degradation_level": plan["level"], "changes": plan["changes"]})
+    degraded = request.model_copy(update={
+        "model_name": plan["model_name"],
+        "top_k": plan["top_k"],
+        "fetch_k": plan["fetch_k"],
+        "conversation_history": history[-plan["max_history"]:] if plan["max_history"] else None
+    })
+    if degraded.model_name != request.model_name:
+        route = model_router.route_for_model(degraded.model_name)
+    return degraded, route, plan
+
+def ensure_ready():
+    """HTTP 503 (with Retry-After while still starting) until /ready is green"""
+    if readiness.is_ready():
+        return
+    if readiness.has_failed():
+        raise HTTPException(
+            status_code=503,
+            detail="Banco de dados não carregado."
+        )
+    raise HTTPException(
+        status_code=503,
+        detail="Servidor iniciando: carregando modelos. Tente novamente em instantes.",
+        headers={"Retry-After": str(STARTUP_RETRY_AFTER_SECONDS)}
+    )
+
+_trusted_proxy_networks = [ipaddress.ip_network(p, strict=False) for p in ADMISSION_TRUSTED_PROXIES]
+
+def is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_proxy_networks)
+
+def get_client_identity(http_request: Request):
+    """
+    Who the request is scheduled as: (client_id, weight).
+    Logged-in users by user id, anonymous requests by IP.
+    """
+    user = auth.get_optional_user(http_request)
+    if user:
+        return "user:" + str(user["id"]), ADMISSION_AUTHENTICATED_WEIGHT
+
+    ip = http_request.client.host if http_request.client else "unknown"
+    if ADMISSION_TRUST_PROXY_HEADERS and is_trusted_proxy(ip):
+        # Walk back from our proxy: the first hop it didn't add itself is the client
+        # (anything further left was written by the client and can be spoofed)
+        for hop in reversed(http_request.headers.get("X-Forwarded-For", "").split(",")):
+            hop = hop.strip()
+            if hop:
+                ip = hop
+                if not is_trusted_proxy(hop):
+                    break
+    return f"ip:{ip}", ADMISSION_ANONYMOUS_WEIGHT
+
+def admit_or_reject(model_name: str, http_request: Request):
+    """Take a place in the admission queue, or fail fast with HTTP 429"""
+    client_id, weight = get_client_identity(http_request)
+    try:
+        return admission_controller.enqueue(model_name, client_id, weight)
+    except QueueFullError as e:
+        logger.warning("Fila cheia - requisição recusada", extra={
+            "model": model_name, "client_id": client_id, "retry_after": e.retry_after
+        })
+        QUERY_OUTCOMES.inc(endpoint=http_request.url.path, outcome="queue_full")
+        raise HTTPException(
+            status_code=429,
+            detail="Servidor ocupado. Tente novamente em instantes.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+def record_generation_stats(timer: RequestTimer, llm_stats: Dict, model: str):
+    """Token counts and Ollama's generation speed from the final chunk"""
+    if not llm_stats:
+        return
+    TOKENS.inc(llm_stats["prompt_tokens"], model=model, kind="prompt")
+    TOKENS.inc(llm_stats["output_tokens"], model=model, kind="generated")
+    timer.set("prompt_tokens", llm_stats["prompt_tokens"])
+    timer.set("output_tokens", llm_stats["output_tokens"])
+    if llm_stats.get("eval_seconds"):
+        timer.set("tokens_per_second", llm_stats["output_tokens"] / llm_stats["eval_seconds"])
+
+def maybe_start_profile(http_request: Request, user: Optional[Dict], label: str):
+    """cProfile session for admin requests sent with X-Profile: 1"""
+    if http_request.headers.get("X-Profile") != "1" or not auth.is_admin(user):
+        return None
+    return start_session(label)
+
+def finish_profile(session):
+    if session is None:
+        return
+    profile = session.finish()
+    if profile is not None:
+        profile_store.add(profile)
+        logger.info("Perfil salvo", extra={
+            "profile_id": profile["profile_id"], "profiled_seconds": profile["profiled_seconds"]
+        })
+
+def finish_timing(timer: RequestTimer) -> Dict:
+    """Final breakdown of a request, added to the rolling percentiles"""
+    timing = timer.to_dict()
+    timing_stats.record(timing)
+    metrics.observe_timing(timing)
+    return timing
+
+async def log_if_slow(endpoint: str, request: QueryRequest, timing: Dict, sources, search_metadata: Optional[Dict],
+                      route: Dict, cached: bool, degradation: Dict, task_id: Optional[str] = None):
+    """Keep the details of requests above SLOW_REQUEST_THRESHOLD_SECONDS (see slow_log.py)"""
+    if not slow_request_log.is_slow(timing):
+        return
+    entry = slow_log.build_entry(
+        endpoint,
+        request.question,
+        request.model_name,
+        request.top_k,
+        request.fetch_k,
+        timing,
+        sources,
+        search_metadata,
+        route,
+        cached,
+        degradation["level"],
+        task_id,
+        tracing.current_trace_id()
+    )
+    await run_in_threadpool(slow_request_log.record, entry)
+
+def split_for_replay(text: str) -> List[str]:
+    """Split a cached answer into word-sized tokens for stream replay"""
+    return re.findall(r'\S+\s*|\s+', text)
+
 def build_context_with_history(conversation_history: List[Message], max_history: int = 5) -> str:
-    """Build conversation context from history"""
+    """Build conversation context from history (prefix-stable window, see prompts.py)"""
     if not conversation_history or len(conversation_history) == 0:
         return ""
     
-    recent_history = conversation_history[-max_history:] if len(conversation_history) > max_history else conversation_history
+    recent_history = stable_history_window(conversation_history, max_history)
     
     context_parts = []
     for msg in recent_history:
@@ -411,113 +1220,226 @@ def build_context_with_history(conversation_history: List[Message], max_history:
     
     return "\n".join(context_parts)
 
-def create_llm_and_prompt(model_name: str, temperature: float):
-    """Create LLM and prompt template, with caching for repeated calls."""
-    cache_key = (model_name, temperature)
-    with _llm_cache_lock:
-        if cache_key in _llm_cache:
-            return _llm_cache[cache_key], True  # (llm, prompt), cached=True
-
-    template = """Você é um assistente especializado em Espiritismo e Doutrina Espírita.
-
-REGRA FUNDAMENTAL - VALIDAÇÃO DE CONTEXTO:
-Você é ESPECIALISTA em Espiritismo e SOMENTE responde perguntas relacionadas a:
-- Espiritismo, Doutrina Espírita, Codificação Espírita
-- Allan Kardec e suas obras (Livro dos Espíritos, Livro dos Médiuns, Evangelho, Gênese, Céu e Inferno)
-- Conceitos espíritas: reencarnação, mediunidade, perispírito, evolução espiritual, etc.
-- Vida após a morte, mundo espiritual, comunicação com espíritos
-- Moral, caridade, amor ao próximo segundo o Espiritismo
-- Qualquer tópico presente nas obras da Codificação
-
-Se a pergunta NÃO for sobre Espiritismo, responda APENAS:
-"Desculpe, sou um assistente especializado em Espiritismo e Doutrina Espírita. Só posso responder perguntas sobre os ensinamentos de Allan Kardec e a Codificação Espírita. Por favor, faça uma pergunta relacionada ao Espiritismo."
-
-IMPORTANTE: Perguntas válidas sobre Espiritismo incluem questões gerais como "O que é espiritismo?", "Quem foi Allan Kardec?", "Explique a reencarnação", etc. Responda a TODAS as perguntas sobre Espiritismo, mesmo as mais básicas.
-
-INSTRUÇÕES IMPORTANTES (apenas para perguntas VÁLIDAS sobre Espiritismo):
-1. Responda SEMPRE em português brasileiro correto e fluente
-2. DÊ PRIORIDADE às informações de "O Livro dos Espíritos" quando disponível
-3. Depois, priorize as outras obras fundamentais
-4. SEMPRE cite os livros de onde extraiu as informações
-5. Faça correlações entre diferentes trechos quando relevante
-6. Reflita sobre as implicações dos ensinamentos apresentados
-7. Mantenha coerência com o contexto da conversa anterior
-
-PROCESSO DE RACIOCÍNIO (siga este método antes de responder):
-Antes de formular sua resposta, analise mentalmente:
-
-a) ANÁLISE DA PERGUNTA:
-   - Quais conceitos espíritas estão sendo questionados?
-   - A pergunta requer explicação simples ou síntese de múltiplas ideias?
-   - Há algum equívoco comum que devo esclarecer?
-
-b) ANÁLISE DAS FONTES:
-   - Quais trechos são mais relevantes e autoritativos?
-   - Há prioridade de "O Livro dos Espíritos" disponível?
-   - Os trechos se complementam ou apresentam perspectivas diferentes?
-
-c) SÍNTESE E CONEXÕES:
-   - Como conectar as informações de forma coerente?
-   - Que correlações posso fazer entre diferentes passagens?
-   - Como relacionar com o histórico da conversa (se houver)?
-
-d) VERIFICAÇÃO:
-   - Minha resposta está fiel à Codificação?
-   - Estou citando as fontes corretamente?
-   - A explicação está clara e acessível?
-
-{conversation_context}
-
-CONTEXTO DOS LIVROS ESPÍRITAS:
-{context}
-
-PERGUNTA DO CONSULENTE: {question}
-
-RESPOSTA (em português correto, reflexiva, citando fontes - aplique o raciocínio acima mentalmente):"""
-
-    prompt = PromptTemplate(
-        template=template,
-        input_variables=["conversation_context", "context", "question"]
+def attach_memory_owner(request: QueryRequest, user: Optional[Dict], http_request: Request) -> Optional[str]:
+    """
+    Scope the chat's rolling memory and follow-up retrieval state to its
+    owner: the logged-in user, or the anonymous session this server issued
+    to the client (chat_id alone comes from the client and could be anyone's).
+    Returns a new anonymous session token to send back when the client had none.
+    """
+    if (conversation_memory is None and followup_retriever is None) or not request.chat_id:
+        return None
+    if user is not None:
+        request._memory_owner = f"user:{user['id']}"
+        return None
+    session = http_request.headers.get(ANONYMOUS_SESSION_HEADER, "")
+    new_session = None
+    if len(session) < 16:
+        session = new_session = secrets.token_urlsafe(24)
+    request._memory_owner = "anon:" + hashlib.sha256(session.encode("utf-8")).hexdigest()[:32]
+    return new_session
+
+def uses_conversation_memory(request: QueryRequest) -> bool:
+    """Whether the prompt history comes from the chat's rolling memory"""
+    return conversation_memory is not None and conversation_memory.has_memory(request.chat_id, request._memory_owner)
+
+def build_conversation_context(request: QueryRequest) -> str:
+    """
+    HISTÓRICO block of the prompt: the chat's rolling summary + last
+    exchange when it has memory, else the raw history sent by the client.
+    """
+    if uses_conversation_memory(request):
+        history_text = conversation_memory.context(request.chat_id, request._memory_owner)
+    else:
+        history_text = build_context_with_history(request.conversation_history)
+    if not history_text:
+        return ""
+    return f"\nHISTÓRICO DA CONVERSA:\n{history_text}\n"
+
+def remember_exchange(request: QueryRequest, answer: str):
+    """Update the chat's memory in the background once an answer is complete"""
+    if conversation_memory is not None and request.chat_id and request._memory_owner and answer:
+        conversation_memory.schedule_update(request.chat_id, request._memory_owner, request.question, answer)
+
+def load_server_history(request: QueryRequest, user: Optional[Dict]) -> QueryRequest:
+    """
+    Logged-in clients send only chat_id: load the history window from the
+    messages table (skipped when the chat's rolling memory covers it).
+
+    The window is the prefix-stable one (prompts.py): 5 to 9 messages instead
+    of the last 5, so up to 4 more messages are resent. They sit in a prefix
+    Ollama already has cached on most turns, which costs less than
+    re-evaluating a sliding 5-message history every turn; under load,
+    load shedding trims the history to its own max_history.
+    """
+    if user is None or not request.chat_id or request.conversation_history or uses_conversation_memory(request):
+        return request
+    total = database.count_messages(user["id"], request.chat_id)
+    if total == 0:
+        return request
+    # Same window build_context_with_history uses, so only it is read
+    start = stable_history_window(range(total), 5)[0]
+    messages = database.get_messages(user["id"], request.chat_id, offset=start)
+    return request.model_copy(update={"conversation_history": [Message(**m) for m in messages]})
+
+def persist_exchange(user: Optional[Dict], request: QueryRequest, answer: str, sources: List[Dict]):
+    """Append the turn to a logged-in user's conversation (no re-upload by the client)"""
+    if user is None or not request.chat_id or not answer:
+        return
+    try:
+        conv_id = database.append_messages(user["id"], request.chat_id, [
+            {"role": "user", "content": request.question},
+            {"role": "assistant", "content": answer, "sources": sources}
+        ], title=request.question[:50])
+        if conv_id is None:
+            logger.warning("Conversa pertence a outro usuário - turno não salvo", extra={"chat_id": request.chat_id})
+    except Exception:
+        logger.exception("Erro ao salvar turno da conversa", extra={"chat_id": request.chat_id})
+
+async def generate_in_background(client_id: str, weight: float, model: str, prompt: str, temperature: float,
+                                 num_ctx: int, num_predict: Optional[int], system: Optional[str] = None) -> str:
+    """
+    Generation for background work (summaries, cache warm-up): takes a slot
+    like any generation, at a low weight so live questions go first.
+    Returns "" without generating when the queue is full.
+    """
+    try:
+        ticket = admission_controller.enqueue(model, client_id, weight)
+    except QueueFullError:
+        return ""
+    try:
+        async for _ in admission_controller.wait(ticket):
+            pass
+        return await ollama_client.generate(model, prompt, temperature, num_ctx, num_predict, system=system)
+    finally:
+        admission_controller.release(ticket)
+
+async def summarize_conversation(summary: str, question: str, answer: str, max_tokens: int) -> str:
+    """Fold one exchange into the rolling summary with a small model"""
+    prompt = SUMMARY_TEMPLATE.format(
+        summary=summary or "(início da conversa)",
+        question=question,
+        answer=answer,
+        max_words=int(max_tokens * 0.6)
     )
-    
-    llm = Ollama(
-        model=model_name,
-        temperature=temperature,
-        num_ctx=CONTEXT_WINDOW,
+    # With the queue full the memory falls back to the extractive summary
+    return await generate_in_background(
+        "background:summary", CONVERSATION_SUMMARY_ADMISSION_WEIGHT,
+        CONVERSATION_SUMMARY_MODEL, prompt, 0.1, MODEL_ROUTES[1]["num_ctx"], max_tokens
     )
 
-    result = (llm, prompt)
-    with _llm_cache_lock:
-        _llm_cache[cache_key] = result
-    return result, False  # cached=False (first time)
+# ============================================================================
+# MODEL PRELOAD & WARM-UP
+# ============================================================================
+
+def preload_num_ctx(model: str) -> int:
+    """Context size requests use for a model (Ollama reloads on a different num_ctx)"""
+    return model_router.route_for_model(model, record_stats=False)["num_ctx"]
+
+def warm_up_retrieval():
+    """Run one embedding and one vector query so the first question doesn't pay for it"""
+    embeddings.embed_query(RETRIEVAL_WARMUP_QUERY)
+    vectorstore.similarity_search(RETRIEVAL_WARMUP_QUERY, k=1)
+
+async def warm_up_backend():
+    """Warm up retrieval, then load every preload model into Ollama"""
+    readiness.start("retrieval_warmup")
+    try:
+        await run_in_threadpool(warm_up_retrieval)
+        readiness.ready("retrieval_warmup")
+        print("✅ Embeddings e índice vetorial aquecidos")
+    except Exception as e:
+        readiness.fail("retrieval_warmup", str(e))
+        print(f"❌ Erro no aquecimento da busca: {e}")
+
+    for model in OLLAMA_PRELOAD_MODELS:
+        component = f"model:{model}"
+        readiness.start(component)
+        try:
+            timings = await ollama_client.preload(model, preload_num_ctx(model), OLLAMA_WARMUP_PROMPT, SYSTEM_PROMPT)
+            readiness.ready(component, f"carregado em {timings['load_seconds']}s")
+            print(f"✅ Modelo {model} carregado em {timings['load_seconds']:.1f}s "
+                  f"(aquecimento {timings.get('warmup_seconds', 0):.1f}s)")
+        except Exception as e:
+            readiness.fail(component, str(e))
+            print(f"❌ Falha ao pré-carregar {model}: {e}")
+
+    if readiness.is_ready():
+        print("🟢 Backend pronto (/ready)")
+    else:
+        print("🔴 Backend não ficou pronto - veja /ready")
+
+# ============================================================================
+# CACHE WARM-UP
+# ============================================================================
+
+def load_warmup_questions() -> List[str]:
+    """Top-N frequent / well-rated questions from the SQLite logs"""
+    return [row["question"] for row in database.get_warmup_questions(WARMUP_TOP_N)]
+
+async def warm_question(question: str):
+    """Warm the retrieval cache (and optionally the answer cache) for one question"""
+    request, route = apply_model_routing(QueryRequest(question=question), record_stats=False)
+    sources, _ = await run_in_threadpool(search_sources, request.question, request.top_k, request.fetch_k)
+
+    if not WARMUP_GENERATE_ANSWERS:
+        return
+
+    cache_context = await run_in_threadpool(get_answer_cache_context, request, sources)
+    if cache_context is None or await run_in_threadpool(answer_cache.lookup, **cache_context, record_stats=False):
+        return
+
+    formatted_prompt = turn_prompt.format(
+        conversation_context="",
+        context=build_sources_context(sources),
+        question=request.question
+    )
+    # Same model options as a live answer (a different num_ctx makes Ollama reload the model)
+    answer = await generate_in_background(
+        "background:warmup", WARMUP_ADMISSION_WEIGHT, request.model_name, formatted_prompt,
+        request.temperature, route["num_ctx"], route["num_predict"], system=SYSTEM_PROMPT
+    )
+    if answer:
+        await run_in_threadpool(answer_cache.store, **cache_context, question=request.question, answer=answer)
 
 # ============================================================================
 # QUERY ENDPOINT (WITH STATUS TRACKING)
 # ============================================================================
 
 @app.post("/query", response_model=QueryResponse)
-async def query(request: QueryRequest):
+async def query(request: QueryRequest, http_request: Request, response: Response):
     """
     Process a question and return answer with sources
     Now with status tracking
     """
     
-    if vectorstore is None:
-        raise HTTPException(
-            status_code=503,
-            detail="Banco de dados não carregado."
-        )
+    ensure_ready()
+    user = auth.get_optional_user(http_request)
+    new_session = attach_memory_owner(request, user, http_request)
+    if new_session:
+        response.headers[ANONYMOUS_SESSION_HEADER] = new_session
+
+    timer = start_request_timer()
+    profile = maybe_start_profile(http_request, user, f"/query: {request.question[:80]}")
+    if profile is not None:
+        response.headers["X-Profile-ID"] = profile.profile_id
 
     # Validate context of the question
     if context_validator is not None:
-        is_valid, confidence, reason = context_validator.validate_question(
-            request.question,
-            threshold=CONTEXT_VALIDATION_THRESHOLD
-        )
+        with timer.stage("validation"), profiled("validation"):
+            is_valid, confidence, reason = context_validator.validate_question(
+                request.question,
+                threshold=CONTEXT_VALIDATION_THRESHOLD
+            )
 
         if not is_valid:
             # Question out of context - return rejection message
-            print(f"❌ Pergunta fora de contexto: {request.question[:50]}... (score: {confidence:.2f})")
+            finish_profile(profile)
+            logger.info("Pergunta fora de contexto", extra={
+                "question_hash": question_hash(request.question), "score": round(confidence, 3)
+            })
+            QUERY_OUTCOMES.inc(endpoint="/query", outcome="off_topic")
+            await run_in_threadpool(persist_exchange, user, request, REJECTION_MESSAGE, [])
 
             return QueryResponse(
                 task_id="rejected",
@@ -526,79 +1448,103 @@ async def query(request: QueryRequest):
                 processing_time=0.0
             )
 
-        print(f"✅ Pergunta validada (score: {confidence:.2f})")
+        logger.debug("Pergunta validada", extra={"score": round(confidence, 3)})
+
+    # History from the messages table when the client only sent chat_id
+    request = await run_in_threadpool(load_server_history, request, user)
+
+    # Pick the model by complexity, then adapt to the current load
+    request, route = apply_model_routing(request)
+    request, route, degradation = apply_load_shedding(request, route)
+
+    # Admission control (HTTP 429 when the queue is full)
+    ticket = admit_or_reject(request.model_name, http_request)
 
     # Register request
     task_id = status_tracker.start_request(request.question, mode="normal")
+    status_tracker.annotate_task(task_id, degradation_level=degradation["level"], trace_id=tracing.current_trace_id())
     start_time = time.time()
     
     try:
-        print(f"\n{'='*60}")
-        print(f"🔍 [{task_id}] Nova pergunta: {request.question[:100]}...")
+        logger.info("Nova pergunta", extra={
+            "task_id": task_id, "model": request.model_name, "question_hash": question_hash(request.question)
+        })
         
-        # Update: Creating LLM (skipped if cached)
-        (llm, prompt_template), was_cached = create_llm_and_prompt(
-            request.model_name,
-            request.temperature
-        )
-        if not was_cached:
-            status_tracker.update_task(task_id, "creating_llm", 10)
+        # Wait for a free generation slot for this model
+        with timer.stage("queue_wait"):
+            async for position, estimated_wait in admission_controller.wait(ticket):
+                status_tracker.update_task(task_id, "queued", 0)
+                logger.debug("Na fila", extra={
+                    "task_id": task_id, "position": position, "estimated_wait": round(estimated_wait, 1)
+                })
         
         # Update: Searching books (multi-search or single search based on feature flag)
         status_tracker.update_task(task_id, "multi_searching", 30)
 
-        if ENABLE_MULTI_SEARCH and multi_search_engine:
-            print(f"🔍 Iniciando multi-search adaptativo...")
-            sources, search_metadata = multi_search_engine.multi_search(
-                request.question,
-                k=request.top_k,
-                fetch_k=request.fetch_k,
-                max_searches=5
-            )
-            print(f"✅ Multi-search: {search_metadata['num_searches']} buscas, "
-                  f"{search_metadata['unique_documents']} docs únicos")
-        else:
-            # Legacy single search (fallback)
-            print(f"📖 Usando busca única (legacy)...")
-            sources = prioritized_search(
-                vectorstore,
+        with timer.stage("retrieval"):
+            sources, search_metadata = await run_in_threadpool(
+                search_sources,
                 request.question,
-                k=request.top_k,
-                fetch_k=request.fetch_k
+                request.top_k,
+                request.fetch_k,
+                degradation["multi_search"],
+                request.chat_id,
+                request._memory_owner
             )
-            search_metadata = None
-            print(f"✅ Encontradas {len(sources)} fontes relevantes")
-        
-        # Add priority metadata
-        for source in sources:
-            source_path = source.metadata.get('source', '')
-            source.metadata['priority'] = get_book_priority(source_path)
+        logger.debug("Busca concluída", extra={
+            "task_id": task_id,
+            "sources": len(sources),
+            "followup_reuse": bool(search_metadata and search_metadata.get("followup_reuse")),
+            "num_searches": search_metadata["num_searches"] if search_metadata else 1
+        })
         
         # Update: Building context
         status_tracker.update_task(task_id, "building_context", 50)
         
-        context = "\n\n---\n\n".join([
-            f"[Trecho {i+1} - {get_book_display_name(doc.metadata.get('source', 'Desconhecido'))}]\n{doc.page_content}"
-            for i, doc in enumerate(sources)
-        ])
-        
-        conversation_context = ""
-        if request.conversation_history and len(request.conversation_history) > 0:
-            history_text = build_context_with_history(request.conversation_history)
-            if history_text:
-                conversation_context = f"\nHISTÓRICO DA CONVERSA:\n{history_text}\n"
-        
-        formatted_prompt = prompt_template.format(
-            conversation_context=conversation_context,
-            context=context,
-            question=request.question
-        )
+        with timer.stage("prompt_build"), profiled("prompt_build"):
+            context = build_sources_context(sources)
+            
+            conversation_context = build_conversation_context(request)
+            
+            formatted_prompt = turn_prompt.format(
+                conversation_context=conversation_context,
+                context=context,
+                question=request.question
+            )
         
-        # Update: Generating answer
-        status_tracker.update_task(task_id, "generating_answer", 70)
-        print(f"🤖 Gerando resposta com {request.model_name}...")
+        # Check semantic answer cache before generating
+        with timer.stage("answer_cache"):
+            cache_context = await run_in_threadpool(get_answer_cache_context, request, sources)
+            cache_hit = await run_in_threadpool(answer_cache.lookup, **cache_context) if cache_context else None
         
-        answer = llm.invoke(formatted_prompt)
+        if cache_hit:
+            logger.debug("Resposta do cache semântico", extra={"similarity": round(cache_hit["similarity"], 3)})
+            answer = cache_hit["answer"]
+        else:
+            # Update: Generating answer
+            status_tracker.update_task(task_id, "generating_answer", 70)
+            
+            answer_parts = []
+            llm_stats = {}
+            generation_started = time.perf_counter()
+            async for fragment in ollama_client.stream(
+                request.model_name,
+                formatted_prompt,
+                request.temperature,
+                route["num_ctx"],
+                route["num_predict"],
+                llm_stats,
+                system=SYSTEM_PROMPT
+            ):
+                if not answer_parts:
+                    timer.add("ttft", time.perf_counter() - generation_started)
+                answer_parts.append(fragment)
+            timer.add("generation", time.perf_counter() - generation_started)
+            record_generation_stats(timer, llm_stats, request.model_name)
+            answer = "".join(answer_parts)
+            
+            if cache_context and answer:
+                answer_cache.store(**cache_context, question=request.question, answer=answer)
         
         # Update: Formatting response
         status_tracker.update_task(task_id, "formatting_response", 90)
@@ -629,49 +1575,229 @@ async def query(request: QueryRequest):
             ))
         
         processing_time = time.time() - start_time
+        load_shedder.record_latency(processing_time)
+        model_router.record_latency(route["name"], processing_time)
+        timing = finish_timing(timer)
+        status_tracker.annotate_task(task_id, timing=timing)
+        await log_if_slow("/query", request, timing, sources, search_metadata, route, cache_hit is not None, degradation, task_id)
         
-        print(f"✅ Resposta gerada com sucesso em {processing_time:.2f}s!")
-        print(f"{'='*60}\n")
+        logger.info("Resposta gerada", extra={
+            "task_id": task_id, "processing_time": round(processing_time, 3), "cached": cache_hit is not None
+        })
         
         # Mark as complete
         status_tracker.complete_request(task_id, success=True)
+        QUERY_OUTCOMES.inc(endpoint="/query", outcome="cached" if cache_hit else "answered")
+        remember_exchange(request, answer)
+        await run_in_threadpool(persist_exchange, user, request, answer, [s.model_dump() for s in formatted_sources])
         
         return QueryResponse(
             task_id=task_id,
             answer=answer,
             sources=formatted_sources,
-            processing_time=processing_time
+            processing_time=processing_time,
+            cached=cache_hit is not None,
+            degradation_level=degradation["level"],
+            timing=timing
         )
         
     except Exception as e:
-        print(f"❌ Erro ao processar pergunta: {str(e)}")
+        logger.exception("Erro ao processar pergunta", extra={"task_id": task_id})
         status_tracker.complete_request(task_id, success=False, error=str(e))
+        QUERY_OUTCOMES.inc(endpoint="/query", outcome="error")
         raise HTTPException(status_code=500, detail=f"Erro ao processar: {str(e)}")
+    finally:
+        admission_controller.release(ticket)
+        finish_profile(profile)
 
 # ============================================================================
 # STREAMING ENDPOINT (WITH STATUS)
 # ============================================================================
 
+async def produce_stream_events(request: QueryRequest, flight, ticket=None, degradation=None, route=None):
+    """
+    Run the full answer pipeline for a streaming request and publish its
+    SSE events to the flight. Shared by every coalesced subscriber.
+    """
+    start_time = time.time()
+    # Inherited from the endpoint that started the flight (validation is already in it)
+    timer = current_timer() or start_request_timer()
+    degradation = degradation or {"level": 0, "label": "normal", "changes": [], "multi_search": ENABLE_MULTI_SEARCH}
+    route = route or {"name": "client", "complexity_level": None, "num_ctx": CONTEXT_WINDOW, "num_predict": None}
+    try:
+        # Degradation level this answer is produced at (0 = normal)
+        flight.publish({'type': 'degradation', 'level': degradation['level'], 'label': degradation['label'], 'changes': degradation['changes']})
+        flight.publish({'type': 'route', 'model': request.model_name, 'complexity_level': route['complexity_level']})
+
+        # STAGE 0: Waiting for a generation slot (queue events with position/ETA)
+        if ticket is not None:
+            with timer.stage("queue_wait"):
+                async for position, estimated_wait in admission_controller.wait(ticket):
+                    flight.publish({'type': 'queue', 'position': position, 'estimated_wait': round(estimated_wait, 1)})
+
+        # STAGE 2: Searching books (30%)
+        flight.publish({'type': 'status', 'stage': 'searching_books', 'progress': 30, 'description': 'Buscando nos livros espíritas'})
+
+        with timer.stage("retrieval"):
+            sources, search_metadata = await run_in_threadpool(
+                search_sources,
+                request.question,
+                request.top_k,
+                request.fetch_k,
+                degradation['multi_search'],
+                request.chat_id,
+                request._memory_owner
+            )
+        if search_metadata and search_metadata.get('followup_reuse'):
+            flight.publish({'type': 'search_info', 'num_searches': 0, 'complexity_level': None, 'followup_reuse': True})
+        elif search_metadata:
+            # Send search info to frontend
+            flight.publish({'type': 'search_info', 'num_searches': search_metadata['num_searches'], 'complexity_level': search_metadata['complexity_analysis']['complexity_level']})
+
+        # STAGE 3: Building context (50%)
+        flight.publish({'type': 'status', 'stage': 'building_context', 'progress': 50, 'description': 'Construindo contexto'})
+
+        with timer.stage("prompt_build"), profiled("prompt_build"):
+            context = build_sources_context(sources)
+
+            conversation_context = build_conversation_context(request)
+
+            formatted_prompt = turn_prompt.format(
+                conversation_context=conversation_context,
+                context=context,
+                question=request.question
+            )
+
+        # Check semantic answer cache before generating
+        with timer.stage("answer_cache"):
+            cache_context = await run_in_threadpool(get_answer_cache_context, request, sources)
+            cache_hit = await run_in_threadpool(answer_cache.lookup, **cache_context) if cache_context else None
+
+        if cache_hit:
+            # Replay the cached answer through the same token events
+            flight.publish({'type': 'cache', 'hit': True, 'similarity': round(cache_hit['similarity'], 4)})
+            for piece in split_for_replay(cache_hit['answer']):
+                flight.publish({'type': 'token', 'content': piece})
+        else:
+            # STAGE 4: Generating answer (70%)
+            flight.publish({'type': 'status', 'stage': 'generating_answer', 'progress': 70, 'description': 'Gerando resposta'})
+
+            answer_parts = []
+            llm_stats = {}
+            generation_started = time.perf_counter()
+            # Async client: cancelling this task closes the HTTP stream and
+            # aborts the generation in Ollama
+            async for chunk in ollama_client.stream(
+                request.model_name,
+                formatted_prompt,
+                request.temperature,
+                route['num_ctx'],
+                route['num_predict'],
+                llm_stats,
+                system=SYSTEM_PROMPT
+            ):
+                if not answer_parts:
+                    timer.add("ttft", time.perf_counter() - generation_started)
+                answer_parts.append(chunk)
+                # Send each character individually for true letter-by-letter streaming
+                for char in chunk:
+                    flight.publish({'type': 'token', 'content': char})
+                    # Small delay for natural reading pace (adjust as needed)
+                    # 0.005s = 5ms per character = ~200 chars/second = natural reading speed
+                    await asyncio.sleep(0.005)
+
+            # Wall time including the reading-pace delay; tokens_per_second is Ollama's own
+            timer.add("generation", time.perf_counter() - generation_started)
+            record_generation_stats(timer, llm_stats, request.model_name)
+
+            answer = "".join(answer_parts)
+            if cache_context and answer:
+                answer_cache.store(**cache_context, question=request.question, answer=answer)
+
+        # Send sources
+        formatted_sources = []
+        for source in sources:
+            source_path = source.metadata.get('source', 'Desconhecido')
+            priority = source.metadata.get('priority', 10)
+
+            if priority >= 100:
+                priority_label = "PRIORIDADE MÁXIMA"
+            elif priority >= 70:
+                priority_label = "OBRA FUNDAMENTAL"
+            elif priority >= 40:
+                priority_label = "COMPLEMENTAR"
+            else:
+                priority_label = "OUTRAS OBRAS"
+
+            formatted_sources.append({
+                "content": source.page_content[:500],
+                "full_content": source.page_content,
+                "source": os.path.basename(source_path),
+                "page": source.metadata.get('page', 0),
+                "priority": priority,
+                "priority_label": priority_label,
+                "display_name": get_book_display_name(source_path)
+            })
+
+        flight.publish({'type': 'sources', 'sources': formatted_sources})
+
+        # COMPLETE (100%)
+        flight.publish({'type': 'status', 'stage': 'complete', 'progress': 100, 'description': 'Concluído'})
+        timing = finish_timing(timer)
+        flight.publish({'type': 'timing', 'timing': timing})
+        flight.publish({'type': 'done'})
+        elapsed = time.time() - start_time
+        load_shedder.record_latency(elapsed)
+        model_router.record_latency(route['name'], elapsed)
+        # Once per generation (coalesced subscribers share it; trace_id links them)
+        await log_if_slow("/query_stream", request, timing, sources, search_metadata, route, cache_hit is not None, degradation)
+
+    except asyncio.CancelledError:
+        logger.info("Geração cancelada: todos os clientes desconectaram")
+        raise
+    except Exception as e:
+        logger.exception("Erro no streaming")
+        flight.publish({'type': 'error', 'content': str(e)})
+    finally:
+        if ticket is not None:
+            admission_controller.release(ticket)
+
 @app.post("/query_stream")
-async def query_stream(request: QueryRequest):
+async def query_stream(request: QueryRequest, http_request: Request):
     """Process a question and stream the response with status tracking"""
 
-    if vectorstore is None:
-        raise HTTPException(
-            status_code=503,
-            detail="Banco de dados não carregado."
-        )
+    ensure_ready()
+    user = auth.get_optional_user(http_request)
+
+    timer = start_request_timer()
+    profile = maybe_start_profile(http_request, user, f"/query_stream: {request.question[:80]}")
+    stream_headers = {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # Disable nginx buffering
+        "Connection": "keep-alive",
+    }
+    if profile is not None:
+        stream_headers["X-Profile-ID"] = profile.profile_id
+    new_session = attach_memory_owner(request, user, http_request)
+    if new_session:
+        stream_headers[ANONYMOUS_SESSION_HEADER] = new_session
 
     # Validate context of the question
     if context_validator is not None:
-        is_valid, confidence, reason = context_validator.validate_question(
-            request.question,
-            threshold=CONTEXT_VALIDATION_THRESHOLD
-        )
+        with timer.stage("validation"), profiled("validation"):
+            is_valid, confidence, reason = context_validator.validate_question(
+                request.question,
+                threshold=CONTEXT_VALIDATION_THRESHOLD
+            )
 
         if not is_valid:
             # Return rejection via streaming
-            print(f"❌ Pergunta fora de contexto: {request.question[:50]}... (score: {confidence:.2f})")
+            finish_profile(profile)
+            logger.info("Pergunta fora de contexto", extra={
+                "question_hash": question_hash(request.question), "score": round(confidence, 3)
+            })
+            QUERY_OUTCOMES.inc(endpoint="/query_stream", outcome="off_topic")
+            await run_in_threadpool(persist_exchange, user, request, REJECTION_MESSAGE, [])
 
             async def generate_rejection():
                 yield f"data: {json.dumps({'type': 'task_id', 'task_id': 'rejected'})}\n\n"
@@ -682,141 +1808,133 @@ async def query_stream(request: QueryRequest):
             return StreamingResponse(
                 generate_rejection(),
                 media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "X-Accel-Buffering": "no",  # Disable nginx buffering
-                    "Connection": "keep-alive",
-                }
+                headers=stream_headers
             )
 
-        print(f"✅ Pergunta validada (score: {confidence:.2f})")
+        logger.debug("Pergunta validada", extra={"score": round(confidence, 3)})
 
-    task_id = status_tracker.start_request(request.question, mode="streaming")
-    
-    async def generate():
-        try:
-            # Send task_id first
-            yield f"data: {json.dumps({'type': 'task_id', 'task_id': task_id})}\n\n"
+    # History from the messages table when the client only sent chat_id
+    request = await run_in_threadpool(load_server_history, request, user)
 
-            # STAGE 1: Creating LLM (10%) — skipped if cached
-            (llm, prompt_template), was_cached = create_llm_and_prompt(
-                request.model_name,
-                request.temperature
-            )
-
-            if not was_cached:
-                status_tracker.update_task(task_id, "creating_llm", 10)
-                yield f"data: {json.dumps({'type': 'status', 'stage': 'creating_llm', 'progress': 10, 'description': 'Criando modelo LLM'})}\n\n"
-
-            # STAGE 2: Searching books (30%)
-            status_tracker.update_task(task_id, "multi_searching", 30)
-            yield f"data: {json.dumps({'type': 'status', 'stage': 'searching_books', 'progress': 30, 'description': 'Buscando nos livros espíritas'})}\n\n"
+    # Pick the model by complexity, then adapt to the current load
+    request, route = apply_model_routing(request)
+    request, route, degradation = apply_load_shedding(request, route)
 
-            if ENABLE_MULTI_SEARCH and multi_search_engine:
-                sources, search_metadata = multi_search_engine.multi_search(
-                    request.question,
-                    k=request.top_k,
-                    fetch_k=request.fetch_k,
-                    max_searches=5
-                )
-                # Yield search info to frontend
-                yield f"data: {json.dumps({'type': 'search_info', 'num_searches': search_metadata['num_searches'], 'complexity_level': search_metadata['complexity_analysis']['complexity_level']})}\n\n"
-            else:
-                # Legacy single search
-                sources = prioritized_search(
-                    vectorstore,
-                    request.question,
-                    k=request.top_k,
-                    fetch_k=request.fetch_k
-                )
-                search_metadata = None
-            
-            for source in sources:
-                source_path = source.metadata.get('source', '')
-                source.metadata['priority'] = get_book_priority(source_path)
-
-            # STAGE 3: Building context (50%)
-            status_tracker.update_task(task_id, "building_context", 50)
-            yield f"data: {json.dumps({'type': 'status', 'stage': 'building_context', 'progress': 50, 'description': 'Construindo contexto'})}\n\n"
-
-            context = "\n\n---\n\n".join([
-                f"[Trecho {i+1} - {get_book_display_name(doc.metadata.get('source', 'Desconhecido'))}]\n{doc.page_content}"
-                for i, doc in enumerate(sources)
-            ])
-            
-            conversation_context = ""
-            if request.conversation_history and len(request.conversation_history) > 0:
-                history_text = build_context_with_history(request.conversation_history)
-                if history_text:
-                    conversation_context = f"\nHISTÓRICO DA CONVERSA:\n{history_text}\n"
-            
-            formatted_prompt = prompt_template.format(
-                conversation_context=conversation_context,
-                context=context,
-                question=request.question
-            )
-
-            # STAGE 4: Generating answer (70%)
-            status_tracker.update_task(task_id, "generating_answer", 70)
-            yield f"data: {json.dumps({'type': 'status', 'stage': 'generating_answer', 'progress': 70, 'description': 'Gerando resposta'})}\n\n"
+    # Identical in-flight questions share a single generation
+    flight_key = make_flight_key(
+        request.question,
+        request.model_name,
+        request.temperature,
+        [msg.model_dump() for msg in request.conversation_history or []],
+        use_cache=request.use_cache,
+        memory=[request._memory_owner, request.chat_id] if uses_conversation_memory(request) else None
+    )
 
-            # Stream character by character for smooth letter-by-letter display
-            import time
+    # Only a new generation needs a slot (HTTP 429 when the queue is full)
+    ticket = None
+    if not single_flight.is_in_flight(flight_key):
+        ticket = admit_or_reject(request.model_name, http_request)
 
-            for chunk in llm.stream(formatted_prompt):
-                # Send each character individually for true letter-by-letter streaming
-                for char in chunk:
-                    yield f"data: {json.dumps({'type': 'token', 'content': char})}\n\n"
-                    # Small delay for natural reading pace (adjust as needed)
-                    # 0.005s = 5ms per character = ~200 chars/second = natural reading speed
-                    time.sleep(0.005)
+    # Everything else is set up once the body starts: a client that goes away
+    # before that never runs generate(), and release_if_not_started() frees the slot
+    started = False
 
-            # Send sources
-            formatted_sources = []
-            for source in sources:
-                source_path = source.metadata.get('source', 'Desconhecido')
-                priority = source.metadata.get('priority', 10)
-                
-                if priority >= 100:
-                    priority_label = "PRIORIDADE MÁXIMA"
-                elif priority >= 70:
-                    priority_label = "OBRA FUNDAMENTAL"
-                elif priority >= 40:
-                    priority_label = "COMPLEMENTAR"
-                else:
-                    priority_label = "OUTRAS OBRAS"
-                
-                formatted_sources.append({
-                    "content": source.page_content[:500],
-                    "full_content": source.page_content,
-                    "source": os.path.basename(source_path),
-                    "page": source.metadata.get('page', 0),
-                    "priority": priority,
-                    "priority_label": priority_label,
-                    "display_name": get_book_display_name(source_path)
-                })
-            
-            yield f"data: {json.dumps({'type': 'sources', 'sources': formatted_sources})}\n\n"
-
-            # COMPLETE (100%)
-            yield f"data: {json.dumps({'type': 'status', 'stage': 'complete', 'progress': 100, 'description': 'Concluído'})}\n\n"
-            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+    async def generate():
+        nonlocal started, ticket
+        started = True
+        task_id = status_tracker.start_request(request.question, mode="streaming")
+        logger.info("Nova pergunta", extra={
+            "task_id": task_id, "model": request.model_name, "question_hash": question_hash(request.question)
+        })
+        completed = False
+        owns_ticket = False
+        try:
+            if ticket is None and not single_flight.is_in_flight(flight_key):
+                # The flight seen at request time ended before the body started: this
+                # request will lead a new generation, so it needs a slot like any other
+                try:
+                    ticket = admit_or_reject(request.model_name, http_request)
+                except HTTPException as e:
+                    status_tracker.complete_request(task_id, success=False, error="Fila cheia")
+                    completed = True
+                    yield f"data: {json.dumps({'type': 'task_id', 'task_id': task_id})}\n\n"
+                    yield f"data: {json.dumps({'type': 'error', 'content': e.detail})}\n\n"
+                    return
+            owns_ticket = ticket is not None
+            # No await between the check above and the join: nothing can finish or start the flight
+            flight, is_leader = single_flight.join(
+                flight_key,
+                lambda f: produce_stream_events(request, f, ticket, degradation, route)
+            )
+            # The leader's producer releases the ticket; a flight started since admission doesn't need it
+            owns_ticket = owns_ticket and not is_leader
+            status_tracker.annotate_task(
+                task_id,
+                coalesced=not is_leader,
+                degradation_level=degradation["level"],
+                trace_id=tracing.current_trace_id()
+            )
+            if not is_leader:
+                logger.info("Pergunta idêntica em andamento - acompanhando geração existente", extra={"task_id": task_id})
 
-            status_tracker.complete_request(task_id, success=True)
-            
-        except Exception as e:
-            print(f"❌ Erro no streaming: {str(e)}")
-            status_tracker.complete_request(task_id, success=False, error=str(e))
-            yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+            # Send task_id first
+            yield f"data: {json.dumps({'type': 'task_id', 'task_id': task_id})}\n\n"
+            yield f"data: {json.dumps({'type': 'coalescing', 'coalesced': not is_leader})}\n\n"
+
+            error = None
+            cached = False
+            answer_parts = []
+            sources = []
+            async with aclosing(single_flight.subscribe(flight)) as events:
+                async for event in events:
+                    if event['type'] == 'token':
+                        answer_parts.append(event['content'])
+                    elif event['type'] == 'sources':
+                        sources = event['sources']
+                    elif event['type'] == 'done':
+                        # Saved before 'done' so the client's next request sees the turn
+                        await run_in_threadpool(persist_exchange, user, request, "".join(answer_parts), sources)
+                    elif event['type'] == 'timing':
+                        status_tracker.annotate_task(task_id, timing=event['timing'])
+                    elif event['type'] == 'status':
+                        status_tracker.update_task(task_id, event['stage'], event['progress'])
+                    elif event['type'] == 'queue':
+                        status_tracker.update_task(task_id, "queued", 0)
+                    elif event['type'] == 'cache':
+                        cached = True
+                    elif event['type'] == 'error':
+                        error = event['content']
+                    yield f"data: {json.dumps(event)}\n\n"
+
+            status_tracker.complete_request(task_id, success=error is None, error=error)
+            completed = True
+            outcome = "error" if error is not None else "cached" if cached else "answered"
+            QUERY_OUTCOMES.inc(endpoint="/query_stream", outcome=outcome)
+            if error is None:
+                # Per subscriber: a coalesced flight can serve several chats
+                remember_exchange(request, "".join(answer_parts))
+        finally:
+            if owns_ticket:
+                admission_controller.release(ticket)
+            if not completed:
+                # Client went away mid-stream
+                status_tracker.complete_request(task_id, success=False, error="Cliente desconectado")
+                QUERY_OUTCOMES.inc(endpoint="/query_stream", outcome="disconnected")
+            finish_profile(profile)
+
+    async def release_if_not_started():
+        if started:
+            return
+        if ticket is not None:
+            admission_controller.release(ticket)
+        QUERY_OUTCOMES.inc(endpoint="/query_stream", outcome="disconnected")
+        finish_profile(profile)
 
     return StreamingResponse(
         generate(),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",  # Disable nginx buffering
-            "Connection": "keep-alive",
-        }
+        headers=stream_headers,
+        background=BackgroundTask(release_if_not_started)
     )
 
 # ============================================================================
@@ -909,6 +2027,11 @@ async def delete_conv(chat_id: str, request: Request):
     deleted = database.delete_conversation(user["id"], chat_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Conversa não encontrada.")
+    database.delete_conversation_memory(chat_id, f"user:{user['id']}")
+    if conversation_memory is not None:
+        conversation_memory.forget(chat_id, f"user:{user['id']}")
+    if followup_retriever is not None:
+        followup_retriever.forget(chat_id, f"user:{user['id']}")
     return {"success": True}
 
 # ============================================================================
@@ -982,6 +2105,177 @@ async def admin_feedback_export(request: Request):
     all_feedback = database.get_feedback(limit=10000)
     return {"feedbacks": all_feedback, "total": len(all_feedback)}
 
+def component_memory() -> Dict:
+    """Estimated MB held by each component (shared models/index not double counted)"""
+    wrapped = getattr(embeddings, "wrapped", embeddings)
+    model = getattr(wrapped, "client", None)
+    shared = [vectorstore, embeddings, wrapped, model, ollama_client]
+
+    def size(obj):
+        return memory_diagnostics.to_mb(memory_diagnostics.deep_sizeof(obj, exclude=shared)) if obj is not None else None
+
+    components = {"embedding_model": {"model": EMBEDDING_MODEL, "parameters_mb": memory_diagnostics.to_mb(memory_diagnostics.torch_module_bytes(model))}}
+
+    index = {"disk_mb": memory_diagnostics.to_mb(memory_diagnostics.directory_bytes(DB_DIR)) if os.path.exists(DB_DIR) else None}
+    if vectorstore is not None:
+        vectors = vectorstore._collection.count()
+        dimension = model.get_sentence_embedding_dimension() if hasattr(model, "get_sentence_embedding_dimension") else 768
+        index["vectors"] = vectors
+        # float32 vectors + ~16 HNSW links of 4 bytes each per level-0 node
+        index["hnsw_estimate_mb"] = memory_diagnostics.to_mb(vectors * (dimension * 4 + 16 * 2 * 4))
+    components["vector_index"] = index
+
+    components["caches_mb"] = {
+        "retrieval": size(retrieval_cache),
+        "answer": size(answer_cache),
+        "followup": size(followup_retriever),
+        "conversation_memory": size(conversation_memory),
+        "context_validator_examples": size(context_validator)
+    }
+    components["diagnostics_mb"] = {
+        "timing_stats": size(timing_stats),
+        "request_profiles": size(profile_store),
+        "sampling_profiler": size(sampling_profiler),
+        "status_history": size(status_tracker)
+    }
+    return components
+
+def memory_report() -> Dict:
+    return {
+        "process": memory_diagnostics.process_memory(),
+        "python": memory_diagnostics.python_heap(),
+        "components": component_memory(),
+        "tracemalloc": memory_snapshots.get_stats()
+    }
+
+@app.get("/admin/memory")
+async def admin_memory(request: Request):
+    """RSS, Python heap, tracemalloc state and per-component size estimates"""
+    auth.require_admin(request)
+    return await run_in_threadpool(memory_report)
+
+@app.post("/admin/memory/tracemalloc/start")
+async def admin_tracemalloc_start(request: Request, frames: int = TRACEMALLOC_FRAMES):
+    """Start tracing allocations (snapshots only see allocations made after this)"""
+    auth.require_admin(request)
+    started = memory_snapshots.start(frames)
+    return {"started": started, **memory_snapshots.get_stats()}
+
+@app.post("/admin/memory/tracemalloc/stop")
+async def admin_tracemalloc_stop(request: Request):
+    auth.require_admin(request)
+    memory_snapshots.stop()
+    return memory_snapshots.get_stats()
+
+@app.post("/admin/memory/snapshots")
+async def admin_take_snapshot(request: Request, label: str = "", limit: int = 25):
+    """Take a tracemalloc snapshot and return its top allocation sites"""
+    auth.require_admin(request)
+    try:
+        entry = await run_in_threadpool(memory_snapshots.take, label)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    top = await run_in_threadpool(memory_snapshots.top, entry["snapshot_id"], limit)
+    return {**memory_snapshots.describe(entry), "top": top}
+
+@app.get("/admin/memory/snapshots/{snapshot_id}")
+async def admin_snapshot_top(request: Request, snapshot_id: str, limit: int = 25, group_by: str = "lineno"):
+    """Top allocation sites of a snapshot (group_by: lineno, filename, traceback)"""
+    auth.require_admin(request)
+    try:
+        top = await run_in_threadpool(memory_snapshots.top, snapshot_id, limit, group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if top is None:
+        raise HTTPException(status_code=404, detail="Snapshot não encontrado.")
+    return {"snapshot_id": snapshot_id, "top": top}
+
+@app.get("/admin/memory/diff")
+async def admin_snapshot_diff(request: Request, old: str, new: str, limit: int = 25, group_by: str = "lineno"):
+    """Allocation sites that grew the most between two snapshots"""
+    auth.require_admin(request)
+    try:
+        diff = await run_in_threadpool(memory_snapshots.diff, old, new, limit, group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if diff is None:
+        raise HTTPException(status_code=404, detail="Snapshot não encontrado.")
+    return {"old": old, "new": new, "diff": diff}
+
+@app.get("/admin/requests/analytics")
+async def admin_request_analytics(request: Request, hours: float = 24):
+    """Volume, failures and durations of past requests (SQLite: all workers, across restarts)"""
+    auth.require_admin(request)
+    if hours <= 0:
+        raise HTTPException(status_code=400, detail="hours deve ser positivo.")
+    analytics = await run_in_threadpool(database.get_request_analytics, hours)
+    return {**analytics, "writer": request_writer.get_stats()}
+
+@app.get("/admin/slow-requests")
+async def admin_slow_requests(request: Request, hours: float = 24, limit: int = 20, endpoint: Optional[str] = None):
+    """Slowest requests of the last `hours` (above SLOW_REQUEST_THRESHOLD_SECONDS), slowest first"""
+    auth.require_admin(request)
+    if hours <= 0 or limit <= 0:
+        raise HTTPException(status_code=400, detail="hours e limit devem ser positivos.")
+    requests = await run_in_threadpool(database.get_slow_requests, hours, min(limit, 500), endpoint)
+    return {**slow_request_log.get_stats(), "hours": hours, "requests": requests}
+
+@app.get("/admin/profile/flame", response_class=PlainTextResponse)
+async def admin_profile_flame(
+    request: Request,
+    seconds: float = 60,
+    include_idle: bool = False,
+    thread: Optional[str] = None
+):
+    """
+    Folded stacks sampled over the last `seconds` (flamegraph.pl, speedscope).
+    Threads that are only waiting are left out unless include_idle=true;
+    thread filters by root (MainThread, AnyIO worker thread...).
+    """
+    auth.require_admin(request)
+    if not ENABLE_SAMPLING_PROFILER:
+        raise HTTPException(status_code=404, detail="Profiler de amostragem desativado.")
+    return await run_in_threadpool(sampling_profiler.folded, seconds, include_idle, thread)
+
+@app.get("/admin/profile/sampler")
+async def admin_profile_sampler(request: Request):
+    """Sampler settings, sample count and its own CPU overhead"""
+    auth.require_admin(request)
+    return sampling_profiler.get_stats()
+
+@app.get("/admin/profiles")
+async def admin_profiles(request: Request):
+    """Recent request profiles (send X-Profile: 1 on /query or /query_stream)"""
+    auth.require_admin(request)
+    return {"profiles": profile_store.list(), "max_profiles": profile_store.max_profiles}
+
+@app.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse)
+async def admin_profile_report(request: Request, profile_id: str, sort: str = "cumulative", limit: int = 40):
+    """pstats text report of one profile (sort: cumulative, tottime, calls...)"""
+    auth.require_admin(request)
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado.")
+    try:
+        report = format_stats(profile["stats"], sort, limit)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Ordenação inválida: {sort}")
+    header = json.dumps(profile_store.summary(profile), ensure_ascii=False, indent=2)
+    return f"{header}\n\n{report}"
+
+@app.get("/admin/profiles/{profile_id}/pstats")
+async def admin_profile_download(request: Request, profile_id: str):
+    """Raw pstats file, for snakeviz or python -m pstats"""
+    auth.require_admin(request)
+    data = profile_store.dump(profile_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado.")
+    return Response(
+        data,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'}
+    )
+
 # ============================================================================
 # MAIN
 # ============================================================================
@@ -989,7 +2283,23 @@ async def admin_feedback_export(request: Request):
 if __name__ == "__main__":
     import uvicorn
     print("\n🚀 Iniciando servidor API v1.3.0 (Auth + Chat Persistence)...")
-    print("🔍 Rodando em: http://localhost:8000")
-    print("📖 Documentação: http://localhost:8000/docs")
-    print("📊 Status: http://localhost:8000/status\n")
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
\ No newline at end of file
+    print(f"🔍 Rodando em: http://localhost:{API_PORT}")
+    print(f"📖 Documentação: http://localhost:{API_PORT}/docs")
+    print(f"📊 Status: http://localhost:{API_PORT}/status\n")
+    if WORKERS > 1 and hasattr(os, "fork"):
+        from prefork import PreforkServer
+
+        PreforkServer(
+            app,
+            host=API_HOST,
+            port=API_PORT,
+            workers=WORKERS,
+            preload=preload_for_workers,
+            post_fork=init_worker,
+            on_worker_exit=release_worker,
+            restart_delay=WORKER_RESTART_DELAY_SECONDS
+        ).run()
+    else:
+        if WORKERS > 1:
+            print("⚠️  Múltiplos workers exigem fork (Linux/macOS); usando 1 processo")
+        uvicorn.run(app, host=API_HOST, port=API_PORT, log_level="info")
\ No newline at end of file
@@ -5,9 +5,10 @@ Authentication module - register, login, session management.
 import re
 import bcrypt
 from typing import Optional, Dict, Tuple
-from fastapi import Request
+from fastapi import HTTPException, Request
 
 import database
+from config import ADMIN_EMAILS
 
 
 def _validate_email(email: str) -> bool:
@@ -92,3 +93,19 @@ def get_optional_user(request: Request) -> Optional[Dict]:
         return None
     token = auth_header[7:]
     return get_current_user(token)
+
+
+def is_admin(user: Optional[Dict]) -> bool:
+    """Only emails listed in ADMIN_EMAILS (none listed = nobody: registration is open)"""
+    if not user:
+        return False
+    return user["email"].lower() in ADMIN_EMAILS
+
+
+def require_admin(request: Request) -> Dict:
+    user = get_optional_user(request)
+    if not user:
+        raise HTTPException(status_code=401, detail="Não autenticado.")
+    if not is_admin(user):
+        raise HTTPException(status_code=403, detail="Acesso restrito a administradores.")
+    return user
@@ -0,0 +1,114 @@
+"""
+Batched background writer.
+
+Request handlers hand records to submit(), which only puts them on a
+bounded queue (never blocks; when the queue is full the record is dropped
+and counted). A writer thread collects up to batch_size records, or
+whatever arrived within flush_interval, and passes them to write_batch in
+one call, so N finished requests cost one SQLite transaction instead of N.
+"""
+
+import queue
+import threading
+from typing import Callable, Dict, List, Optional
+
+from structured_log import get_logger
+
+logger = get_logger("batch_writer")
+
+_STOP = object()
+
+
+class BatchWriter:
+    """
+    Args:
+        write_batch: Called in the writer thread with a list of records
+        name: Thread name (and label in the logs)
+        batch_size: Maximum records per write_batch call
+        flush_interval: Seconds a record may wait for a batch to fill
+        max_queue: Records waiting to be written before new ones are dropped
+    """
+
+    def __init__(
+        self,
+        write_batch: Callable[[List], None],
+        name: str = "batch-writer",
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000
+    ):
+        self.write_batch = write_batch
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._idle = threading.Condition()
+        self._pending = 0  # submitted and not yet written (or failed)
+        self._stats = {"written": 0, "batches": 0, "dropped": 0, "errors": 0}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def submit(self, record) -> bool:
+        with self._idle:
+            self._pending += 1
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            with self._idle:
+                self._pending -= 1
+            self._stats["dropped"] += 1
+            return False
+
+    def _done(self, count: int):
+        with self._idle:
+            self._pending -= count
+            self._idle.notify_all()
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            stop = any(record is _STOP for record in batch)
+            records = [record for record in batch if record is not _STOP]
+            if records:
+                try:
+                    self.write_batch(records)
+                    self._stats["written"] += len(records)
+                    self._stats["batches"] += 1
+                except Exception as e:
+                    self._stats["errors"] += 1
+                    logger.error("Falha ao gravar lote", extra={"writer": self.name, "records": len(records), "error": str(e)})
+                self._done(len(records))
+            if stop:
+                return
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything submitted so far is written (False on timeout)"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def shutdown(self, timeout: float = 5.0):
+        """Write what's queued and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def get_stats(self) -> Dict:
+        return {
+            **self._stats,
+            "queued": self._queue.qsize(),
+            "running": self._thread is not None and self._thread.is_alive()
+        }
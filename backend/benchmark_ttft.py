@@ -0,0 +1,158 @@
+"""
+Time-to-first-token benchmark: turn 1 vs later turns of a conversation.
+
+Runs the same scripted conversation against Ollama with two prompt layouts:
+- legacy: instructions inside the prompt, sliding "last 5 messages" history
+- stable: instructions as system prompt, prefix-stable history (prompts.py)
+
+For each turn it prints the time to first token and how many prompt tokens
+Ollama actually had to evaluate (tokens reused from its prompt cache are
+not counted), to check how much of each prompt the stable layout gets
+from the cache. The retrieved context changes every turn, as in the
+server, so only the instructions and the history can be reused.
+
+Usage:
+    python benchmark_ttft.py --model llama3.2:3b --turns 5
+"""
+
+import argparse
+import time
+from typing import Dict, List, Optional
+
+from ollama import Client
+
+from config import OLLAMA_HOST, OLLAMA_KEEP_ALIVE
+from prompts import SYSTEM_PROMPT, TURN_TEMPLATE, stable_history_window
+
+QUESTIONS = [
+    "O que é o perispírito?",
+    "E qual a função dele na reencarnação?",
+    "Como isso se relaciona com a mediunidade?",
+    "O que o Livro dos Médiuns diz sobre isso?",
+    "Pode resumir o que conversamos até agora?",
+    "E como a prece atua nesse contexto?",
+    "Quais livros devo ler para aprofundar?",
+]
+
+
+# Stand-in for the retrieved chunks, so the benchmark doesn't need the vectorstore.
+# Different for every question, as retrieval is in the server
+def sample_context(question: str) -> str:
+    return "\n\n---\n\n".join(
+        f"[Trecho {i + 1} - O Livro dos Espíritos] {question}\n" + (
+            "O perispírito é o envoltório semimaterial do Espírito. Nos encarnados, serve de laço "
+            "entre o Espírito e a matéria; nos errantes, constitui o corpo fluídico do Espírito. "
+        ) * 6
+        for i in range(3)
+    )
+
+
+def format_history(messages: List[Dict]) -> str:
+    lines = []
+    for msg in messages:
+        prefix = "Consulente" if msg["role"] == "user" else "Assistente"
+        lines.append(f"{prefix}: {msg['content']}")
+    if not lines:
+        return ""
+    return "\nHISTÓRICO DA CONVERSA:\n" + "\n".join(lines) + "\n"
+
+
+def build_request(layout: str, history: List[Dict], question: str):
+    """Returns (system, prompt) for the given layout"""
+    if layout == "legacy":
+        window = history[-5:]
+        prompt = SYSTEM_PROMPT + "\n\n" + TURN_TEMPLATE.format(
+            conversation_context=format_history(window), context=sample_context(question), question=question
+        )
+        return None, prompt
+
+    window = stable_history_window(history, 5)
+    prompt = TURN_TEMPLATE.format(
+        conversation_context=format_history(window), context=sample_context(question), question=question
+    )
+    return SYSTEM_PROMPT, prompt
+
+
+def run_turn(client: Client, model: str, system: Optional[str], prompt: str,
+             num_ctx: int, num_predict: int) -> Dict:
+    started = time.perf_counter()
+    ttft = None
+    answer = []
+    final = {}
+    for chunk in client.generate(
+        model=model,
+        prompt=prompt,
+        system=system,
+        stream=True,
+        options={"temperature": 0.3, "num_ctx": num_ctx, "num_predict": num_predict},
+        keep_alive=OLLAMA_KEEP_ALIVE
+    ):
+        if ttft is None and chunk.get("response"):
+            ttft = time.perf_counter() - started
+        answer.append(chunk.get("response", ""))
+        if chunk.get("done"):
+            final = chunk
+    return {
+        "ttft": ttft or 0.0,
+        "prompt_tokens": final.get("prompt_eval_count") or 0,
+        "prompt_eval_seconds": (final.get("prompt_eval_duration") or 0) / 1e9,
+        "answer": "".join(answer)
+    }
+
+
+def run_conversation(client: Client, model: str, layout: str, turns: int,
+                     num_ctx: int, num_predict: int) -> List[Dict]:
+    history: List[Dict] = []
+    results = []
+    for turn, question in enumerate(QUESTIONS[:turns], 1):
+        system, prompt = build_request(layout, history, question)
+        result = run_turn(client, model, system, prompt, num_ctx, num_predict)
+        result["turn"] = turn
+        results.append(result)
+        history.append({"role": "user", "content": question})
+        history.append({"role": "assistant", "content": result["answer"]})
+        print(f"   [{layout}] turno {turn}: TTFT {result['ttft']:.2f}s, "
+              f"{result['prompt_tokens']} tokens de prompt avaliados")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de TTFT por turno de conversa")
+    parser.add_argument("--model", default="llama3.2:3b")
+    parser.add_argument("--host", default=OLLAMA_HOST)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--num-ctx", type=int, default=4096)
+    parser.add_argument("--num-predict", type=int, default=150)
+    parser.add_argument("--layout", choices=["legacy", "stable", "both"], default="both")
+    args = parser.parse_args()
+
+    client = Client(host=args.host)
+    layouts = ["legacy", "stable"] if args.layout == "both" else [args.layout]
+    turns = min(args.turns, len(QUESTIONS))
+
+    print(f"🔥 Carregando {args.model}...")
+    client.generate(model=args.model, prompt="", options={"num_ctx": args.num_ctx},
+                    keep_alive=OLLAMA_KEEP_ALIVE)
+
+    all_results = {}
+    for layout in layouts:
+        print(f"\n💬 Conversa com layout '{layout}' ({turns} turnos)")
+        all_results[layout] = run_conversation(
+            client, args.model, layout, turns, args.num_ctx, args.num_predict
+        )
+
+    print(f"\n{'=' * 64}")
+    print(f"{'Layout':<8} {'Turno':>5} {'TTFT (s)':>10} {'Tokens avaliados':>18} {'Prefill (s)':>12}")
+    print("-" * 64)
+    for layout, results in all_results.items():
+        for r in results:
+            print(f"{layout:<8} {r['turn']:>5} {r['ttft']:>10.2f} {r['prompt_tokens']:>18} "
+                  f"{r['prompt_eval_seconds']:>12.2f}")
+    print("=" * 64)
+    for layout, results in all_results.items():
+        first, last = results[0], results[-1]
+        print(f"{layout}: turno 1 = {first['ttft']:.2f}s, turno {last['turn']} = {last['ttft']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Throughput benchmark: 1 worker vs N workers.
+
+Starts api_server.py once per worker count (WORKERS=n), waits until it
+is ready, keeps `--concurrency` requests in flight for `--duration`
+seconds and prints requests/s, p50/p95 latency and the speed-up over
+the single-worker run.
+
+Targets:
+- query: POST /query with cache disabled (needs Ollama and the vectorstore;
+  the admission limits are global, so this shows how far the CPU side of
+  the pipeline scales before the LLM becomes the bottleneck)
+- login: POST /auth/login (bcrypt on the event loop; needs nothing but
+  SQLite, so it runs anywhere and isolates the per-process CPU limit)
+
+Usage:
+    python benchmark_workers.py --workers 1 2 4 --target login
+    python benchmark_workers.py --workers 1 2 --target query --concurrency 8 --duration 60
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List
+
+import httpx
+
+QUESTIONS = [
+    "O que é o perispírito?",
+    "Qual a função da prece?",
+    "O que diz o Livro dos Médiuns sobre a mediunidade de cura?",
+    "Como os Espíritos se comunicam?",
+    "O que é a reencarnação segundo a Doutrina Espírita?",
+]
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, WORKERS=str(workers), API_PORT=str(port), LOG_TO_CONSOLE="false")
+    return subprocess.Popen(
+        [sys.executable, "api_server.py"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+
+def stop_server(process: subprocess.Popen):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def wait_until_up(client: httpx.AsyncClient, path: str, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if (await client.get(path)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"Servidor não ficou pronto em {timeout:.0f}s ({path})")
+
+
+async def run_load(base_url: str, target: str, concurrency: int, duration: float, ready_timeout: float) -> Dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        await wait_until_up(client, "/ready" if target == "query" else "/", ready_timeout)
+
+        if target == "login":
+            credentials = {"email": f"bench-{uuid.uuid4().hex[:8]}@example.com", "password": "benchmark123"}
+            await client.post("/auth/register", json={**credentials, "display_name": "Benchmark"})
+
+        def request(i: int):
+            if target == "login":
+                return client.post("/auth/login", json=credentials)
+            return client.post("/query", json={"question": QUESTIONS[i % len(QUESTIONS)], "use_cache": False})
+
+        latencies: List[float] = []
+        errors = 0
+        stop_at = time.time() + duration
+
+        async def user(worker: int):
+            nonlocal errors
+            i = worker
+            while time.time() < stop_at:
+                started = time.perf_counter()
+                response = await request(i)
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+                i += concurrency
+
+        started = time.time()
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+        elapsed = time.time() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p95": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de vazão com 1 a N workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--target", choices=["query", "login"], default="query")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    results = {}
+    for workers in args.workers:
+        print(f"⏳ {workers} worker(s)...")
+        process = start_server(workers, args.port)
+        try:
+            results[workers] = asyncio.run(run_load(
+                f"http://127.0.0.1:{args.port}", args.target, args.concurrency, args.duration, args.ready_timeout
+            ))
+        finally:
+            stop_server(process)
+
+    baseline = results[args.workers[0]]["rps"] or 1.0
+    print(f"\nAlvo: {args.target} | concorrência {args.concurrency} | {args.duration:g}s por rodada")
+    print(f"{'workers':>8} {'req/s':>8} {'p50 (s)':>8} {'p95 (s)':>8} {'erros':>6} {'ganho':>6}")
+    for workers, r in results.items():
+        print(f"{workers:>8} {r['rps']:>8.1f} {r['p50']:>8.3f} {r['p95']:>8.3f} {r['errors']:>6} "
+              f"{r['rps'] / baseline:>5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
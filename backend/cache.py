@@ -0,0 +1,426 @@
+"""
+In-memory caches for the retrieval pipeline.
+
+Components:
+- LRUCache: thread-safe LRU + TTL cache with hit/miss statistics
+- IndexVersion: rate-limited reader of the vector index version
+- RetrievalCache: caches (normalized query, k, fetch_k, filters) -> ranked
+  documents and invalidates itself when the vector index version changes
+- SemanticAnswerCache: caches generated answers and serves near-duplicate
+  questions (cosine similarity) asked with the same model and sources;
+  also dropped when the index version changes
+
+With several workers both caches take an optional `shared` store
+(shared_state.SharedCacheStore) consulted on a local miss and written
+through on put, so a worker can serve what another one computed.
+"""
+
+import os
+import json
+import re
+import time
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query string for use as a cache key"""
+    q = " ".join(query.lower().split())
+    return re.sub(r'[\s?!.]+$', '', q)
+
+
+def get_chunk_id(doc) -> str:
+    """Chroma ID of a document, or a content fingerprint when missing"""
+    doc_id = getattr(doc, "id", None)
+    if doc_id:
+        return doc_id
+    fingerprint = f"{doc.metadata.get('source', '')}:{doc.metadata.get('page', 0)}:{doc.page_content[:200]}"
+    return hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations
+            }
+
+
+def get_index_version(vectorstore) -> str:
+    """
+    Cheap fingerprint of the vector index contents.
+
+    Combines the collection size with the modification time of the
+    Chroma persist directory, so re-running process_books.py changes it.
+    """
+    count = vectorstore._collection.count()
+    persist_dir = getattr(vectorstore, "_persist_directory", None)
+    mtime = 0.0
+    if persist_dir and os.path.isdir(persist_dir):
+        sqlite_file = os.path.join(persist_dir, "chroma.sqlite3")
+        target = sqlite_file if os.path.exists(sqlite_file) else persist_dir
+        mtime = os.path.getmtime(target)
+    return f"{count}:{mtime:.0f}"
+
+
+class IndexVersion:
+    """
+    Current index version, re-read at most every check_interval seconds.
+
+    One instance can be shared by several caches; each keeps the version it
+    last saw and compares it with current() to decide when to invalidate.
+    """
+
+    def __init__(self, vectorstore, check_interval: float = 30):
+        self.vectorstore = vectorstore
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._value = self._read()
+        self._last_check = time.time()
+
+    def _read(self) -> Optional[str]:
+        try:
+            return get_index_version(self.vectorstore)
+        except Exception:
+            return None
+
+    def current(self) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            if now - self._last_check >= self.check_interval:
+                self._last_check = now
+                self._value = self._read()
+            return self._value
+
+
+class RetrievalCache:
+    """
+    Caches ranked documents per (normalized query, k, fetch_k, filters).
+
+    A hit skips the query embedding and the similarity search. Documents
+    are stored as plain snapshots (content, metadata, id) because Chroma's
+    similarity search returns them without IDs, so they couldn't be re-read
+    by ID; every hit returns fresh copies, so callers may tag metadata.
+    The whole cache is dropped when the index version changes (shared
+    entries are keyed by index version, so stale ones are never read again).
+    """
+
+    def __init__(
+        self,
+        vectorstore,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600,
+        version_check_interval: float = 30,
+        shared=None
+    ):
+        self.vectorstore = vectorstore
+        self.shared = shared
+        self.index_version = IndexVersion(vectorstore, version_check_interval)
+        self._cache = LRUCache(max_entries, ttl_seconds)
+        self._version_lock = threading.Lock()
+        self._index_version = self.index_version.current()
+        self._invalidations = 0
+
+    def _check_index_version(self):
+        """Invalidate the cache if the index changed (rate-limited)"""
+        current = self.index_version.current()
+        with self._version_lock:
+            if current != self._index_version:
+                self._index_version = current
+                self._invalidations += 1
+                self._cache.clear()
+
+    @staticmethod
+    def make_key(query: str, k: int, fetch_k: int, filters: Optional[Dict] = None) -> Tuple:
+        filters_key = json.dumps(filters, sort_keys=True) if filters else ""
+        return (normalize_query(query), k, fetch_k, filters_key)
+
+    def _shared_key(self, key: Tuple) -> str:
+        return json.dumps([self._index_version, *key], ensure_ascii=False)
+
+    @staticmethod
+    def _snapshot(doc) -> Dict:
+        return {
+            "id": getattr(doc, "id", None),
+            "page_content": doc.page_content,
+            "metadata": dict(doc.metadata or {})
+        }
+
+    def get(self, query: str, k: int, fetch_k: int, filters: Optional[Dict] = None):
+        """Return cached documents in ranked order, or None on a miss"""
+        self._check_index_version()
+        key = self.make_key(query, k, fetch_k, filters)
+        entries = self._cache.get(key)
+        if entries is None and self.shared is not None:
+            values = self.shared.get("retrieval", self._shared_key(key))
+            if values:
+                entries = values[0]
+                self._cache.put(key, entries)
+        if entries is None:
+            return None
+
+        from langchain.schema import Document
+
+        return [
+            Document(page_content=entry["page_content"], metadata=dict(entry["metadata"]), id=entry["id"])
+            for entry in entries
+        ]
+
+    def put(self, query: str, k: int, fetch_k: int, documents: List, filters: Optional[Dict] = None):
+        """Store a search result (snapshots: later changes to the documents don't leak in)"""
+        entries = [self._snapshot(doc) for doc in documents]
+        key = self.make_key(query, k, fetch_k, filters)
+        self._cache.put(key, entries)
+        if self.shared is not None:
+            self.shared.put("retrieval", self._shared_key(key), entries, self._cache.ttl_seconds)
+
+    def clear(self):
+        self._cache.clear()
+
+    def get_stats(self) -> Dict:
+        stats = self._cache.get_stats()
+        stats["index_version"] = self._index_version
+        stats["invalidations"] = self._invalidations
+        return stats
+
+
+class SemanticAnswerCache:
+    """
+    Caches answers by question embedding, model, temperature band and sources.
+
+    A lookup is a hit when a stored question has cosine similarity above the
+    threshold AND was answered by the same model, in the same temperature
+    band, from the same set of retrieved chunks - so the cached answer was
+    generated from exactly the context the new question would get.
+
+    With an index_version (IndexVersion), all local entries are dropped when
+    the index changes, and shared entries are keyed by index version, so an
+    answer built from a previous index is never served.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 500,
+        ttl_seconds: float = 86400,
+        similarity_threshold: float = 0.92,
+        temperature_band: float = 0.2,
+        shared=None,
+        index_version: Optional[IndexVersion] = None
+    ):
+        self.max_entries = max_entries
+        self.shared = shared
+        self.index_version = index_version
+        self._seen_version = index_version.current() if index_version is not None else None
+        self._invalidations = 0
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.temperature_band = temperature_band
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # entry_id -> entry dict
+        self._buckets = {}  # (model, band, source_ids) -> set of entry_ids
+        self._next_id = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _bucket_key(self, model_name: str, temperature: float, source_ids: List[str]) -> Tuple:
+        band = int(temperature / self.temperature_band + 1e-9) if self.temperature_band else temperature
+        return (model_name, band, tuple(sorted(source_ids)))
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def _check_index_version(self) -> Optional[str]:
+        """Drop every local entry if the index changed; returns the current version"""
+        if self.index_version is None:
+            return None
+        current = self.index_version.current()
+        with self._lock:
+            if current != self._seen_version:
+                self._seen_version = current
+                self._invalidations += 1
+                self._entries.clear()
+                self._buckets.clear()
+        return current
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        bucket = self._buckets.get(entry["bucket"])
+        if bucket is not None:
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[entry["bucket"]]
+
+    def lookup(self, embedding, model_name: str, temperature: float,
+               source_ids: List[str], record_stats: bool = True) -> Optional[Dict]:
+        """
+        Return {"answer", "similarity", "question"} for the best hit, or None.
+        record_stats=False keeps internal lookups (e.g. warm-up) out of the hit rate.
+        """
+        version = self._check_index_version()
+        bucket_key = self._bucket_key(model_name, temperature, source_ids)
+        query_vec = self._normalize(embedding)
+        now = time.time()
+
+        with self._lock:
+            best_id, best_score = None, -1.0
+            for entry_id in list(self._buckets.get(bucket_key, ())):
+                entry = self._entries[entry_id]
+                if entry["expires_at"] < now:
+                    self._remove(entry_id)
+                    continue
+                score = float(np.dot(query_vec, entry["embedding"]))
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is not None and best_score >= self.similarity_threshold:
+                self._entries.move_to_end(best_id)
+                if record_stats:
+                    self._hits += 1
+                entry = self._entries[best_id]
+                return {
+                    "answer": entry["answer"],
+                    "similarity": best_score,
+                    "question": entry["question"]
+                }
+
+        hit = self._lookup_shared(bucket_key, query_vec, version) if self.shared is not None else None
+        if record_stats:
+            with self._lock:
+                if hit:
+                    self._hits += 1
+                else:
+                    self._misses += 1
+        return hit
+
+    @staticmethod
+    def _shared_key(bucket_key: Tuple, version: Optional[str]) -> str:
+        return json.dumps([version, *bucket_key], ensure_ascii=False)
+
+    def _lookup_shared(self, bucket_key: Tuple, query_vec: np.ndarray, version: Optional[str]) -> Optional[Dict]:
+        """Best answer stored by any worker for this bucket; a hit is copied locally"""
+        best, best_score = None, -1.0
+        for value in self.shared.get("answer", self._shared_key(bucket_key, version)):
+            score = float(np.dot(query_vec, self._normalize(value["embedding"])))
+            if score > best_score:
+                best, best_score = value, score
+        if best is None or best_score < self.similarity_threshold:
+            return None
+        self._insert(bucket_key, best["embedding"], best["question"], best["answer"])
+        return {"answer": best["answer"], "similarity": best_score, "question": best["question"]}
+
+    def store(self, embedding, model_name: str, temperature: float,
+              source_ids: List[str], question: str, answer: str):
+        version = self._check_index_version()
+        bucket_key = self._bucket_key(model_name, temperature, source_ids)
+        self._insert(bucket_key, embedding, question, answer)
+        if self.shared is not None:
+            vector = [round(float(x), 6) for x in self._normalize(embedding)]
+            self.shared.put(
+                "answer", self._shared_key(bucket_key, version),
+                {"embedding": vector, "question": question, "answer": answer},
+                self.ttl_seconds
+            )
+
+    def _insert(self, bucket_key: Tuple, embedding, question: str, answer: str):
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                "embedding": self._normalize(embedding),
+                "bucket": bucket_key,
+                "question": question,
+                "answer": answer,
+                "expires_at": time.time() + self.ttl_seconds
+            }
+            self._buckets.setdefault(bucket_key, set()).add(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity_threshold": self.similarity_threshold,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "index_version": self._seen_version,
+                "invalidations": self._invalidations
+            }
@@ -0,0 +1,139 @@
+"""
+Single-flight request coalescing for identical in-flight questions.
+
+When several identical questions (same normalized text, model, temperature
+and history) arrive while one is still being answered, only one generation
+runs. Its events are buffered so that every subscriber - including ones
+that join late - first replays the buffered prefix and then follows the
+live stream.
+
+The generation runs as its own asyncio task, detached from any single
+client: if the first caller disconnects, the others keep receiving tokens.
+The task is cancelled only when every subscriber has gone away.
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from cache import normalize_query
+
+
+def make_flight_key(question: str, model_name: str, temperature: float,
+                    history: Optional[List[Dict]] = None, **extra) -> str:
+    """Hash of everything that determines the generated answer"""
+    history_items = [(m.get("role"), m.get("content")) for m in (history or [])]
+    payload = json.dumps(
+        [normalize_query(question), model_name, round(temperature, 3), history_items, extra],
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Flight:
+    """One in-flight generation and its buffered events"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.events: List[Dict] = []
+        self.done = False
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._updated = asyncio.Event()
+
+    def publish(self, event: Dict):
+        self.events.append(event)
+        self._notify()
+
+    def finish(self):
+        self.done = True
+        self._notify()
+
+    def _notify(self):
+        # Wake current waiters and arm a fresh event for the next update
+        updated, self._updated = self._updated, asyncio.Event()
+        updated.set()
+
+    async def iter_events(self) -> AsyncIterator[Dict]:
+        """Replay the buffered prefix, then follow live events until done"""
+        index = 0
+        while True:
+            updated = self._updated
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+            if self.done:
+                return
+            await updated.wait()
+
+
+class SingleFlight:
+    """Registry of in-flight generations keyed by make_flight_key()"""
+
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+        self._stats = {
+            "leaders": 0,
+            "followers": 0,
+            "cancelled": 0
+        }
+
+    def join(self, key: str, producer: Callable[[Flight], Awaitable[None]]) -> Tuple[Flight, bool]:
+        """
+        Join the flight for key, starting it with producer if there is none.
+
+        Returns (flight, is_leader). The producer receives the Flight and must
+        publish() its events; finish() is called automatically when it returns.
+        Must be called from the event loop thread.
+        """
+        flight = self._flights.get(key)
+        if flight is not None and not flight.done:
+            self._stats["followers"] += 1
+            return flight, False
+
+        flight = Flight(key)
+        self._flights[key] = flight
+        self._stats["leaders"] += 1
+        flight.task = asyncio.create_task(self._run(flight, producer))
+        return flight, True
+
+    async def _run(self, flight: Flight, producer: Callable[[Flight], Awaitable[None]]):
+        try:
+            await producer(flight)
+        except asyncio.CancelledError:
+            self._stats["cancelled"] += 1
+            raise
+        finally:
+            flight.finish()
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    async def subscribe(self, flight: Flight) -> AsyncIterator[Dict]:
+        """
+        Iterate over a flight's events. When the last subscriber leaves
+        before the flight is done, the generation task is cancelled.
+        """
+        flight.subscribers += 1
+        try:
+            async for event in flight.iter_events():
+                yield event
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done and flight.task is not None:
+                flight.task.cancel()
+
+    def is_in_flight(self, key: str) -> bool:
+        flight = self._flights.get(key)
+        return flight is not None and not flight.done
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def get_stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._flights)
+        total = stats["leaders"] + stats["followers"]
+        stats["coalesced_ratio"] = stats["followers"] / total if total else 0.0
+        return stats
@@ -205,4 +205,267 @@ ENABLE_MULTI_SEARCH = True  # Set to False to use legacy single search
 # ============================================================================
 
 SQLITE_DB_PATH = os.path.join(os.path.dirname(__file__), "app_data.db")
-SESSION_EXPIRY_HOURS = 24
\ No newline at end of file
+SESSION_EXPIRY_HOURS = 24
+
+# Emails com acesso às ferramentas de diagnóstico (profiling etc.), separados por vírgula.
+# Vazio = ninguém (o cadastro é aberto, então não basta estar autenticado)
+ADMIN_EMAILS = [e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()]
+
+# ============================================================================
+# CACHE SETTINGS
+# ============================================================================
+
+# Retrieval cache: (query normalizada, k, fetch_k, filtros) -> trechos ranqueados (texto + metadados)
+ENABLE_RETRIEVAL_CACHE = os.getenv("ENABLE_RETRIEVAL_CACHE", "true").lower() == "true"
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "2000"))
+RETRIEVAL_CACHE_TTL_SECONDS = int(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "86400"))
+# Intervalo mínimo entre verificações da versão do índice vetorial
+INDEX_VERSION_CHECK_INTERVAL = 30
+
+# Cache semântico de respostas: perguntas quase idênticas (similaridade de
+# cosseno >= limiar), mesmo modelo, mesma faixa de temperatura e mesmos trechos
+ENABLE_ANSWER_CACHE = os.getenv("ENABLE_ANSWER_CACHE", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.92"))
+ANSWER_CACHE_TEMPERATURE_BAND = 0.2  # Faixas: [0.0, 0.2), [0.2, 0.4), [0.4, 0.6) ...
+
+# Aquecimento de cache (perguntas frequentes e bem avaliadas)
+ENABLE_CACHE_WARMUP = os.getenv("ENABLE_CACHE_WARMUP", "true").lower() == "true"
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", "20"))
+WARMUP_INTERVAL_SECONDS = int(os.getenv("WARMUP_INTERVAL_SECONDS", "21600"))  # 6h (0 = só na inicialização)
+WARMUP_INITIAL_DELAY_SECONDS = 10
+WARMUP_CONCURRENCY = 1  # Nunca competir com tráfego real
+# Gerar respostas no aquecimento (caro: uma geração LLM por pergunta)
+WARMUP_GENERATE_ANSWERS = os.getenv("WARMUP_GENERATE_ANSWERS", "false").lower() == "true"
+WARMUP_ADMISSION_WEIGHT = float(os.getenv("WARMUP_ADMISSION_WEIGHT", "0.1"))  # Gerações do aquecimento na fila de admissão
+
+# ============================================================================
+# OLLAMA CLIENT SETTINGS
+# ============================================================================
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+OLLAMA_TIMEOUT = 600  # Segundos (mesmo limite do frontend)
+# Pool de conexões keep-alive compartilhado por todas as requisições
+OLLAMA_MAX_CONNECTIONS = 10
+OLLAMA_MAX_KEEPALIVE_CONNECTIONS = 5
+
+# ============================================================================
+# ADMISSION CONTROL
+# ============================================================================
+
+# Gerações simultâneas por modelo (demais requisições aguardam na fila)
+ADMISSION_DEFAULT_CONCURRENCY = int(os.getenv("ADMISSION_DEFAULT_CONCURRENCY", "2"))
+ADMISSION_MODEL_CONCURRENCY = {
+    # "qwen2.5:7b": 1,
+}
+# Tamanho máximo da fila (todas as requisições aguardando); acima disso: HTTP 429
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "20"))
+# Estimativa inicial do tempo de atendimento (s) até medir requisições reais
+ADMISSION_INITIAL_SERVICE_TIME = 30.0
+
+# Fila justa ponderada entre clientes (usuário logado ou IP para anônimos)
+# Peso maior = fatia maior das vagas quando há disputa
+ADMISSION_AUTHENTICATED_WEIGHT = float(os.getenv("ADMISSION_AUTHENTICATED_WEIGHT", "2.0"))
+ADMISSION_ANONYMOUS_WEIGHT = float(os.getenv("ADMISSION_ANONYMOUS_WEIGHT", "1.0"))
+# Limites por cliente (0 = sem limite): gerações em andamento e requisições na fila
+ADMISSION_MAX_INFLIGHT_PER_CLIENT = int(os.getenv("ADMISSION_MAX_INFLIGHT_PER_CLIENT", "2"))
+ADMISSION_MAX_QUEUED_PER_CLIENT = int(os.getenv("ADMISSION_MAX_QUEUED_PER_CLIENT", "5"))
+# Atrás de proxy (ngrok): identificar anônimos pelo X-Forwarded-For. Desligado por
+# padrão (o cabeçalho é forjável); ligado, só vale quando a conexão vem de um dos
+# proxies confiáveis (IPs ou redes, separados por vírgula; o agente ngrok roda local)
+ADMISSION_TRUST_PROXY_HEADERS = os.getenv("ADMISSION_TRUST_PROXY_HEADERS", "false").lower() == "true"
+ADMISSION_TRUSTED_PROXIES = [
+    p.strip() for p in os.getenv("ADMISSION_TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if p.strip()
+]
+
+# ============================================================================
+# LOAD SHEDDING (MODO DEGRADADO)
+# ============================================================================
+
+# Sob carga, responder mais rápido com menos contexto em vez de estourar o timeout
+ENABLE_LOAD_SHEDDING = os.getenv("ENABLE_LOAD_SHEDDING", "true").lower() == "true"
+# Profundidade da fila que aciona os níveis 1, 2 e 3
+LOAD_SHEDDING_QUEUE_THRESHOLDS = [2, 5, 10]
+# Latência média recente (s) que aciona os níveis 1, 2 e 3
+LOAD_SHEDDING_LATENCY_THRESHOLDS = [45.0, 90.0, 180.0]
+LOAD_SHEDDING_LATENCY_WINDOW = 20  # Últimas N requisições na média
+LOAD_SHEDDING_COOLDOWN_SECONDS = 30  # Tempo calmo antes de voltar um nível
+# Modelo menor usado nos níveis mais altos
+LOAD_SHEDDING_FALLBACK_MODEL = os.getenv("LOAD_SHEDDING_FALLBACK_MODEL", "llama3.2:3b")
+# O que cada nível desliga/reduz (None = mantém o pedido do usuário)
+LOAD_SHEDDING_LEVELS = [
+    # Nível 1: sem busca múltipla, menos candidatos
+    {"multi_search": False, "top_k": None, "fetch_k": 10, "max_history": 4, "model": None},
+    # Nível 2: menos trechos e histórico curto
+    {"multi_search": False, "top_k": 2, "fetch_k": 6, "max_history": 2, "model": None},
+    # Nível 3: modelo menor, sem histórico
+    {"multi_search": False, "top_k": 2, "fetch_k": 4, "max_history": 0, "model": LOAD_SHEDDING_FALLBACK_MODEL},
+]
+
+# ============================================================================
+# MODEL ROUTING (POR COMPLEXIDADE)
+# ============================================================================
+
+# Com model_name="auto", o servidor escolhe o modelo pelo nível de complexidade
+# (QueryAnalyzer): perguntas simples vão para um modelo pequeno
+ENABLE_MODEL_ROUTING = os.getenv("ENABLE_MODEL_ROUTING", "true").lower() == "true"
+MODEL_ROUTES = {
+    # Nível 1: definições simples
+    1: {"model": os.getenv("MODEL_ROUTE_SIMPLE", "llama3.2:3b"), "num_predict": 512, "num_ctx": 4096},
+    # Nível 2: perguntas com mais de um conceito
+    # (mesmo num_ctx do nível 1: outro num_ctx faz o Ollama recarregar o modelo)
+    2: {"model": os.getenv("MODEL_ROUTE_MEDIUM", "llama3.2:3b"), "num_predict": 768, "num_ctx": 4096},
+    # Nível 3: comparativas / multi-conceito
+    3: {"model": os.getenv("MODEL_ROUTE_COMPLEX", "llama3.1:8b"), "num_predict": 1024, "num_ctx": CONTEXT_WINDOW},
+}
+
+# ============================================================================
+# MODEL PRELOAD & READINESS
+# ============================================================================
+
+# Tempo que o Ollama mantém o modelo na memória após cada requisição
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Modelos carregados na inicialização (separados por vírgula); padrão: modelos das rotas
+OLLAMA_PRELOAD_MODELS = [
+    m.strip() for m in os.getenv("OLLAMA_PRELOAD_MODELS", "").split(",") if m.strip()
+] or sorted({route["model"] for route in MODEL_ROUTES.values()})
+# Prompt da geração de aquecimento (1 token)
+OLLAMA_WARMUP_PROMPT = "Olá"
+# Se true, /ready só fica pronto quando todos os modelos carregarem sem erro
+OLLAMA_PRELOAD_REQUIRED = os.getenv("OLLAMA_PRELOAD_REQUIRED", "false").lower() == "true"
+# Consulta usada para aquecer embeddings e o índice vetorial
+RETRIEVAL_WARMUP_QUERY = "O que é o perispírito?"
+# Retry-After (s) das respostas 503 enquanto o servidor ainda está carregando
+STARTUP_RETRY_AFTER_SECONDS = 10
+
+# ============================================================================
+# CONVERSATION MEMORY (RESUMO CONTÍNUO)
+# ============================================================================
+
+# Com chat_id, o prompt leva um resumo da conversa + a última troca em vez
+# das últimas mensagens completas: o tamanho do prompt fica constante
+ENABLE_CONVERSATION_MEMORY = os.getenv("ENABLE_CONVERSATION_MEMORY", "true").lower() == "true"
+CONVERSATION_SUMMARY_MAX_TOKENS = 300  # Orçamento do resumo
+CONVERSATION_LAST_EXCHANGE_MAX_TOKENS = 400  # Orçamento da última pergunta + resposta
+# Modelo pequeno que reescreve o resumo em segundo plano
+CONVERSATION_SUMMARY_MODEL = os.getenv("CONVERSATION_SUMMARY_MODEL", MODEL_ROUTES[1]["model"])
+CONVERSATION_SUMMARY_ADMISSION_WEIGHT = float(os.getenv("CONVERSATION_SUMMARY_ADMISSION_WEIGHT", "0.25"))  # Resumos na fila de admissão (perguntas ao vivo: 1.0 ou mais)
+CONVERSATION_MEMORY_CACHE_ENTRIES = 1000  # Conversas mantidas em memória (LRU)
+# A memória pertence ao usuário logado ou a uma sessão anônima emitida pelo servidor
+# (cabeçalho X-Anonymous-Session); a de sessões anônimas expira sem uso
+ANONYMOUS_MEMORY_TTL_HOURS = int(os.getenv("ANONYMOUS_MEMORY_TTL_HOURS", "24"))
+
+# ============================================================================
+# FOLLOW-UP RETRIEVAL (REAPROVEITAMENTO NA CONVERSA)
+# ============================================================================
+
+# Perguntas de continuação buscam primeiro entre os trechos do turno anterior
+# (e páginas vizinhas); a busca completa só roda se os scores forem fracos
+ENABLE_FOLLOWUP_RETRIEVAL = os.getenv("ENABLE_FOLLOWUP_RETRIEVAL", "true").lower() == "true"
+FOLLOWUP_MIN_SCORE = float(os.getenv("FOLLOWUP_MIN_SCORE", "0.45"))  # Similaridade mínima do k-ésimo trecho
+FOLLOWUP_QUERY_BLEND = 0.5  # Peso do vetor da pergunta anterior
+FOLLOWUP_PAGE_WINDOW = 1  # Páginas vizinhas (para cada lado) incluídas como candidatas
+FOLLOWUP_MAX_TURNS = 2  # Turnos cujos candidatos são mantidos
+FOLLOWUP_MAX_CONVERSATIONS = 1000
+FOLLOWUP_TTL_SECONDS = 3600
+
+# ============================================================================
+# TIMING (LATÊNCIA POR ETAPA)
+# ============================================================================
+
+# Requisições recentes usadas nos percentis p50/p95/p99 de /status/timing
+TIMING_STATS_WINDOW = 1000
+
+# ============================================================================
+# TRACING (SPANS POR REQUISIÇÃO)
+# ============================================================================
+
+# Spans de cada requisição gravados em JSONL (formato OTLP/JSON) para análise offline.
+# O ID do trace vem do cabeçalho X-Request-ID (ou é gerado) e volta na resposta
+ENABLE_TRACING = os.getenv("ENABLE_TRACING", "true").lower() == "true"
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(os.path.dirname(__file__), "traces", "spans.jsonl"))
+TRACE_MAX_BYTES = 10 * 1024 * 1024  # Tamanho que dispara a rotação do arquivo
+TRACE_BACKUP_COUNT = 5  # Arquivos antigos mantidos (spans.jsonl.1 ... .5)
+TRACE_QUEUE_SIZE = 10000  # Spans aguardando gravação; acima disso são descartados
+
+# ============================================================================
+# PROFILING POR REQUISIÇÃO
+# ============================================================================
+
+# Requisições de admin com o cabeçalho "X-Profile: 1" são perfiladas (cProfile);
+# os últimos perfis ficam em /admin/profiles
+PROFILE_RING_SIZE = 20
+
+# ============================================================================
+# PROFILER DE AMOSTRAGEM CONTÍNUO
+# ============================================================================
+
+# Amostra as pilhas de todas as threads em segundo plano; flamegraph dos últimos
+# N segundos em /admin/profile/flame (formato "folded")
+ENABLE_SAMPLING_PROFILER = os.getenv("ENABLE_SAMPLING_PROFILER", "true").lower() == "true"
+SAMPLING_PROFILER_HZ = float(os.getenv("SAMPLING_PROFILER_HZ", "10"))  # ~0.1% de CPU com poucas threads
+SAMPLING_PROFILER_BUCKET_SECONDS = 10  # Resolução da janela de tempo
+SAMPLING_PROFILER_RETENTION_SECONDS = 900  # Quanto tempo para trás o flamegraph alcança
+
+# ============================================================================
+# DIAGNÓSTICO DE MEMÓRIA
+# ============================================================================
+
+# tracemalloc desde a inicialização (custa memória e CPU; também pode ser ligado
+# em /admin/memory/tracemalloc/start)
+TRACEMALLOC_AT_STARTUP = os.getenv("TRACEMALLOC_AT_STARTUP", "false").lower() == "true"
+TRACEMALLOC_FRAMES = 1  # Quadros por alocação (mais = sites mais precisos, mais overhead)
+MEMORY_SNAPSHOTS_MAX = 5  # Snapshots do tracemalloc mantidos para comparação
+
+# ============================================================================
+# LOG DE REQUISIÇÕES LENTAS
+# ============================================================================
+
+# Perguntas acima deste tempo total (s) vão para a tabela slow_requests e para o JSONL
+SLOW_REQUEST_THRESHOLD_SECONDS = float(os.getenv("SLOW_REQUEST_THRESHOLD_SECONDS", "30"))
+SLOW_LOG_FILE = os.getenv("SLOW_LOG_FILE", os.path.join(os.path.dirname(__file__), "logs", "slow_requests.jsonl"))
+SLOW_LOG_MAX_BYTES = 10 * 1024 * 1024  # Tamanho que dispara a rotação do arquivo
+SLOW_LOG_BACKUP_COUNT = 3  # Arquivos antigos mantidos (slow_requests.jsonl.1 ... .3)
+
+# ============================================================================
+# LOGS ESTRUTURADOS
+# ============================================================================
+
+# Linhas JSON (com request_id) gravadas por uma thread em segundo plano
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FILE = os.getenv("LOG_FILE", os.path.join(os.path.dirname(__file__), "logs", "app.jsonl"))
+LOG_TO_CONSOLE = os.getenv("LOG_TO_CONSOLE", "true").lower() == "true"
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))  # Fração das requisições com logs DEBUG
+LOG_QUEUE_SIZE = 10000  # Registros aguardando gravação; acima disso são descartados
+LOG_MAX_BYTES = 10 * 1024 * 1024  # Tamanho que dispara a rotação do arquivo
+LOG_BACKUP_COUNT = 5  # Arquivos antigos mantidos (app.jsonl.1 ... .5)
+
+# ============================================================================
+# REGISTRO DE REQUISIÇÕES (tabela requests)
+# ============================================================================
+
+# Tarefas gravadas no SQLite em lotes por uma thread em segundo plano
+REQUEST_LOG_BATCH_SIZE = 100  # Registros por transação
+REQUEST_LOG_FLUSH_SECONDS = 1.0  # Espera máxima para completar um lote
+REQUEST_LOG_QUEUE_SIZE = 10000  # Registros aguardando gravação; acima disso são descartados
+RECENT_TASKS_MAX = 1000  # Tarefas concluídas consultáveis em memória (as demais vêm do SQLite)
+REQUEST_LOG_RETENTION_DAYS = int(os.getenv("REQUEST_LOG_RETENTION_DAYS", "30"))  # Registros mais antigos são apagados
+STATUS_HISTORY_MAX = 100  # Limite de /status/history (administradores: até RECENT_TASKS_MAX)
+
+# ============================================================================
+# MÚLTIPLOS WORKERS
+# ============================================================================
+
+# Processos servindo a API (>1 usa o supervisor pre-fork de prefork.py; só em
+# Linux/macOS). Torch e o modelo de embeddings são carregados antes do fork e
+# compartilhados (copy-on-write); limites de admissão e caches valem para todos
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+WORKERS = int(os.getenv("WORKERS", "1"))
+WORKER_TORCH_THREADS = int(os.getenv("WORKER_TORCH_THREADS", "0"))  # Threads do torch por worker (0 = núcleos / workers)
+WORKER_RESTART_DELAY_SECONDS = 1.0  # Espera antes de recriar um worker que morreu
+ADMISSION_SHARED_POLL_SECONDS = 0.25  # Fila de um worker reverifica vagas liberadas por outro
+SHARED_CACHE_BATCH_SIZE = 100  # Entradas de cache compartilhado por transação
+SHARED_CACHE_FLUSH_SECONDS = 0.5  # Atraso máximo até outro worker ver uma entrada nova
+SHARED_CACHE_QUEUE_SIZE = 5000  # Entradas aguardando gravação; acima disso são descartadas
@@ -9,6 +9,7 @@ from langchain_community.embeddings import HuggingFaceEmbeddings
 from config import EMBEDDING_MODEL
 import numpy as np
 from typing import Tuple
+from tracing import current_span, traced
 
 
 class ContextValidator:
@@ -103,6 +104,7 @@ class ContextValidator:
         ]
         return float(np.mean(similarities))
 
+    @traced("ContextValidator.validate_question")
     def validate_question(
         self,
         question: str,
@@ -145,6 +147,8 @@ class ContextValidator:
 
         # Validar se é suficientemente mais similar a tópicos espíritas
         is_valid = score_diff >= threshold
+        current_span().set_attribute("validation.score", float(score_diff))
+        current_span().set_attribute("validation.is_valid", bool(is_valid))
 
         if is_valid:
             reason = (
@@ -0,0 +1,207 @@
+"""
+Rolling per-conversation memory.
+
+Instead of pasting the last raw messages into every prompt (a single
+previous answer can be thousands of tokens), each conversation keeps:
+- a compact rolling summary of everything before the last exchange
+- the last exchange (question + answer), truncated to a budget
+
+Both parts have a hard token budget, so the history part of the prompt
+stays flat however long the conversation gets. After each answer the new
+exchange replaces the previous one right away, and the previous one is
+folded into the summary in the background (by the LLM when the server is
+idle, by a cheap extractive fallback when it's busy or the LLM fails).
+
+State is keyed by (chat_id, owner) and persisted through load/save
+callables (SQLite in the API server), with a small in-process LRU in
+front. chat_id comes from the client, so it is never enough on its own:
+the owner (a user, or a server-issued anonymous session) scopes it, and
+a client sending someone else's chat_id just starts an empty memory.
+
+With several worker processes (WORKERS > 1) consecutive questions of a
+chat can land on different workers, so each one's LRU may hold a state
+another worker has since replaced: read_through makes every read go to
+the store, and the store only accepts a save whose turn count is not
+behind the stored one (a slow summary fold can't overwrite a newer
+exchange).
+"""
+
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from structured_log import get_logger
+
+logger = get_logger("conversation_memory")
+
+# Rough token estimate (no tokenizer for every model): ~4 characters per token
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    """Cut text to the token budget on a word boundary (keeping the start, or the end)"""
+    text = text.strip()
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    if keep_end:
+        cut = text[-(max_chars - 1):]
+        space = cut.find(" ")
+        return "…" + (cut[space + 1:] if 0 <= space < len(cut) // 2 else cut)
+    cut = text[:max_chars - 1]
+    space = cut.rfind(" ")
+    return (cut[:space] if space > len(cut) // 2 else cut) + "…"
+
+
+class ConversationMemory:
+    """
+    Summary + last exchange per (chat_id, owner).
+
+    Args:
+        load: (chat_id, owner) -> stored state (or None)
+        save: (chat_id, owner, state) -> persists the state
+        summarize: async (summary, question, answer, max_tokens) -> new summary
+        is_busy: Returns True while the LLM should be left to live requests
+        max_summary_tokens: Hard budget of the rolling summary
+        max_exchange_tokens: Hard budget of the last exchange (question + answer)
+        max_entries: Conversations kept in the in-process LRU
+        read_through: Always load from the store (other processes write to it too)
+    """
+
+    def __init__(
+        self,
+        load: Callable[[str, str], Optional[Dict]],
+        save: Callable[[str, str, Dict], None],
+        summarize: Optional[Callable[[str, str, str, int], Awaitable[str]]] = None,
+        is_busy: Callable[[], bool] = lambda: False,
+        max_summary_tokens: int = 300,
+        max_exchange_tokens: int = 400,
+        max_entries: int = 1000,
+        read_through: bool = False
+    ):
+        self.load = load
+        self.save = save
+        self.summarize = summarize
+        self.is_busy = is_busy
+        self.max_summary_tokens = max_summary_tokens
+        self.max_exchange_tokens = max_exchange_tokens
+        self.max_entries = max_entries
+        self.read_through = read_through
+        self._states: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._tasks = set()
+        self._stats = {
+            "exchanges": 0,
+            "llm_summaries": 0,
+            "fallback_summaries": 0,
+            "errors": 0
+        }
+
+    def _get_state(self, key: Tuple[str, str]) -> Optional[Dict]:
+        if key in self._states and not self.read_through:
+            self._states.move_to_end(key)
+            return self._states[key]
+        state = self.load(*key)
+        if state is not None:
+            self._put_state(key, state)
+        else:
+            self._states.pop(key, None)
+        return state
+
+    def _put_state(self, key: Tuple[str, str], state: Dict):
+        self._states[key] = state
+        self._states.move_to_end(key)
+        while len(self._states) > self.max_entries:
+            evicted, _ = self._states.popitem(last=False)
+            lock = self._locks.get(evicted)
+            if lock is not None and not lock.locked():
+                del self._locks[evicted]
+
+    def has_memory(self, chat_id: Optional[str], owner: Optional[str]) -> bool:
+        return bool(chat_id and owner) and self._get_state((chat_id, owner)) is not None
+
+    def context(self, chat_id: Optional[str], owner: Optional[str]) -> str:
+        """History block for the prompt (empty when the chat has no memory yet)"""
+        state = self._get_state((chat_id, owner)) if chat_id and owner else None
+        if state is None:
+            return ""
+
+        parts = []
+        if state.get("summary"):
+            parts.append("Resumo da conversa até aqui: " + truncate_to_tokens(state["summary"], self.max_summary_tokens))
+        if state.get("last_question"):
+            parts.append(f"Consulente: {state['last_question']}")
+            parts.append(f"Assistente: {state.get('last_answer', '')}")
+        return "\n".join(parts)
+
+    def _truncate_exchange(self, question: str, answer: str):
+        # The question is usually short; the answer gets the rest of the budget
+        question = truncate_to_tokens(question, self.max_exchange_tokens // 4)
+        answer = truncate_to_tokens(answer, self.max_exchange_tokens - estimate_tokens(question))
+        return question, answer
+
+    def _fallback_summary(self, summary: str, question: str) -> str:
+        """Cheap summary when the LLM is busy: one line per question, newest kept"""
+        line = "- " + truncate_to_tokens(question, 40)
+        combined = f"{summary}\n{line}" if summary else line
+        return truncate_to_tokens(combined, self.max_summary_tokens, keep_end=True)
+
+    async def _fold(self, summary: str, question: str, answer: str) -> str:
+        if self.summarize is not None and not self.is_busy():
+            try:
+                new_summary = await self.summarize(summary, question, answer, self.max_summary_tokens)
+                if new_summary and new_summary.strip():
+                    self._stats["llm_summaries"] += 1
+                    return truncate_to_tokens(new_summary, self.max_summary_tokens)
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.warning("Falha ao resumir conversa", extra={"error": str(e)})
+        self._stats["fallback_summaries"] += 1
+        return self._fallback_summary(summary, question)
+
+    async def update(self, chat_id: str, owner: str, question: str, answer: str):
+        """
+        Record a finished exchange. The new exchange is stored right away;
+        the previous one is then folded into the summary.
+        """
+        key = (chat_id, owner)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        loop = asyncio.get_running_loop()
+        async with lock:
+            state = dict(self._get_state(key) or {"summary": "", "turns": 0})
+            previous_question = state.get("last_question")
+            previous_answer = state.get("last_answer", "")
+
+            state["last_question"], state["last_answer"] = self._truncate_exchange(question, answer)
+            state["turns"] = state.get("turns", 0) + 1
+            self._put_state(key, state)
+            await loop.run_in_executor(None, self.save, chat_id, owner, dict(state))
+            self._stats["exchanges"] += 1
+
+            if previous_question:
+                state["summary"] = await self._fold(state.get("summary", ""), previous_question, previous_answer)
+                self._put_state(key, state)
+                await loop.run_in_executor(None, self.save, chat_id, owner, dict(state))
+
+    def schedule_update(self, chat_id: str, owner: str, question: str, answer: str):
+        """Run update() in the background (the answer is not held up by it)"""
+        task = asyncio.create_task(self.update(chat_id, owner, question, answer))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def forget(self, chat_id: str, owner: str):
+        """Drop a conversation from the in-process cache (e.g. after it's deleted)"""
+        self._states.pop((chat_id, owner), None)
+
+    def get_stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats["cached_conversations"] = len(self._states)
+        stats["pending_updates"] = len(self._tasks)
+        stats["max_summary_tokens"] = self.max_summary_tokens
+        stats["max_exchange_tokens"] = self.max_exchange_tokens
+        return stats
@@ -6,14 +6,28 @@ import sqlite3
 import uuid
 import json
 import threading
+import functools
+import time
 from datetime import datetime, timedelta
 from typing import Optional, Dict, List
 
-from config import SQLITE_DB_PATH, SESSION_EXPIRY_HOURS
+from config import SQLITE_DB_PATH, SESSION_EXPIRY_HOURS, ANONYMOUS_MEMORY_TTL_HOURS, REQUEST_LOG_RETENTION_DAYS
+from metrics import SQLITE_OPERATION_SECONDS
+from tracing import span
 
 _write_lock = threading.Lock()
 
 
+def _observed(func):
+    """Record the operation's latency (including the write lock wait) in /metrics and the trace"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(f"db.{func.__name__}", **{"db.system": "sqlite"}):
+            with SQLITE_OPERATION_SECONDS.time(operation=func.__name__):
+                return func(*args, **kwargs)
+    return wrapper
+
+
 def _get_connection() -> sqlite3.Connection:
     conn = sqlite3.connect(SQLITE_DB_PATH)
     conn.row_factory = sqlite3.Row
@@ -22,6 +36,7 @@ def _get_connection() -> sqlite3.Connection:
     return conn
 
 
+@_observed
 def init_db():
     with _write_lock:
         conn = _get_connection()
@@ -90,6 +105,72 @@ def init_db():
                 CREATE INDEX IF NOT EXISTS idx_feedback_rating ON feedback(rating);
                 CREATE INDEX IF NOT EXISTS idx_feedback_user ON feedback(user_id);
                 CREATE INDEX IF NOT EXISTS idx_feedback_created ON feedback(created_at);
+
+                CREATE TABLE IF NOT EXISTS requests (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    task_id TEXT UNIQUE NOT NULL,  -- unique index: lookups by task_id
+                    mode TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress INTEGER NOT NULL DEFAULT 0,
+                    question_hash TEXT,  -- never the question itself: records outlive the chat
+                    started_at TIMESTAMP NOT NULL,
+                    completed_at TIMESTAMP,
+                    duration_seconds REAL,
+                    error TEXT,
+                    trace_id TEXT,
+                    coalesced INTEGER NOT NULL DEFAULT 0,
+                    degradation_level INTEGER NOT NULL DEFAULT 0,
+                    details_json TEXT
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_requests_started ON requests(started_at);
+
+                CREATE TABLE IF NOT EXISTS slow_requests (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    endpoint TEXT NOT NULL,
+                    task_id TEXT,
+                    trace_id TEXT,
+                    question_hash TEXT NOT NULL,
+                    model TEXT,
+                    total_seconds REAL NOT NULL,
+                    top_k INTEGER,
+                    fetch_k INTEGER,
+                    complexity_level INTEGER,
+                    num_searches INTEGER,
+                    prompt_tokens INTEGER,
+                    output_tokens INTEGER,
+                    cached INTEGER NOT NULL DEFAULT 0,
+                    degradation_level INTEGER NOT NULL DEFAULT 0,
+                    details_json TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_slow_requests_created ON slow_requests(created_at);
+
+                CREATE TABLE IF NOT EXISTS shared_cache (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    namespace TEXT NOT NULL,
+                    cache_key TEXT NOT NULL,
+                    value_json TEXT NOT NULL,
+                    expires_at REAL NOT NULL  -- unix time
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_shared_cache_key ON shared_cache(namespace, cache_key);
+                CREATE INDEX IF NOT EXISTS idx_shared_cache_expires ON shared_cache(expires_at);
+
+                CREATE TABLE IF NOT EXISTS conversation_memory (
+                    chat_id TEXT NOT NULL,
+                    owner TEXT NOT NULL,  -- "user:<id>" or "anon:<session hash>"
+                    summary TEXT NOT NULL DEFAULT '',
+                    last_question TEXT,
+                    last_answer TEXT,
+                    turns INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (chat_id, owner)
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_conversation_memory_updated ON conversation_memory(updated_at);
             """)
             conn.commit()
         finally:
@@ -100,6 +181,7 @@ def init_db():
 # USER OPERATIONS
 # ============================================================================
 
+@_observed
 def create_user(email: str, password_hash: str, display_name: str = "Anônimo") -> int:
     with _write_lock:
         conn = _get_connection()
@@ -114,6 +196,7 @@ def create_user(email: str, password_hash: str, display_name: str = "Anônimo")
             conn.close()
 
 
+@_observed
 def get_user_by_email(email: str) -> Optional[Dict]:
     conn = _get_connection()
     try:
@@ -123,6 +206,7 @@ def get_user_by_email(email: str) -> Optional[Dict]:
         conn.close()
 
 
+@_observed
 def get_user_by_id(user_id: int) -> Optional[Dict]:
     conn = _get_connection()
     try:
@@ -136,6 +220,7 @@ def get_user_by_id(user_id: int) -> Optional[Dict]:
 # SESSION OPERATIONS
 # ============================================================================
 
+@_observed
 def create_session(user_id: int) -> str:
     token = str(uuid.uuid4())
     expires_at = datetime.now() + timedelta(hours=SESSION_EXPIRY_HOURS)
@@ -157,6 +242,7 @@ def create_session(user_id: int) -> str:
             conn.close()
 
 
+@_observed
 def validate_session(token: str) -> Optional[Dict]:
     conn = _get_connection()
     try:
@@ -182,6 +268,7 @@ def validate_session(token: str) -> Optional[Dict]:
         conn.close()
 
 
+@_observed
 def delete_session(token: str):
     with _write_lock:
         conn = _get_connection()
@@ -196,6 +283,7 @@ def delete_session(token: str):
 # CONVERSATION OPERATIONS
 # ============================================================================
 
+@_observed
 def save_conversation(user_id: int, chat_id: str, title: str, messages_list: List[Dict]) -> int:
     with _write_lock:
         conn = _get_connection()
@@ -223,29 +311,71 @@ def save_conversation(user_id: int, chat_id: str, title: str, messages_list: Lis
 
             # Insert all messages
             for msg in messages_list:
-                sources = msg.get("sources")
-                sources_json = json.dumps(sources, ensure_ascii=False) if sources else None
-                # full_sources stored separately if present
-                full_sources = None
-                if sources:
-                    full_list = []
-                    for s in sources:
-                        if "full_content" in s:
-                            full_list.append({
-                                "full_content": s["full_content"],
-                                "source": s.get("source", ""),
-                                "page": s.get("page", 0),
-                                "display_name": s.get("display_name", ""),
-                                "priority_label": s.get("priority_label", "")
-                            })
-                    if full_list:
-                        full_sources = json.dumps(full_list, ensure_ascii=False)
+                _insert_message(conn, conv_id, msg)
 
+            conn.commit()
+            return conv_id
+        finally:
+            conn.close()
+
+
+def _insert_message(conn: sqlite3.Connection, conv_id: int, msg: Dict):
+    sources = msg.get("sources")
+    sources_json = json.dumps(sources, ensure_ascii=False) if sources else None
+    # full_sources stored separately if present
+    full_sources = None
+    if sources:
+        full_list = []
+        for s in sources:
+            if "full_content" in s:
+                full_list.append({
+                    "full_content": s["full_content"],
+                    "source": s.get("source", ""),
+                    "page": s.get("page", 0),
+                    "display_name": s.get("display_name", ""),
+                    "priority_label": s.get("priority_label", "")
+                })
+        if full_list:
+            full_sources = json.dumps(full_list, ensure_ascii=False)
+
+    conn.execute(
+        """INSERT INTO messages (conversation_id, role, content, sources_json, full_sources_json)
+           VALUES (?, ?, ?, ?, ?)""",
+        (conv_id, msg["role"], msg["content"], sources_json, full_sources)
+    )
+
+
+@_observed
+def append_messages(user_id: int, chat_id: str, messages_list: List[Dict], title: str) -> Optional[int]:
+    """
+    Append messages to a conversation, creating it (with title) if needed.
+    Returns None if the chat_id belongs to another user.
+    """
+    with _write_lock:
+        conn = _get_connection()
+        try:
+            existing = conn.execute(
+                "SELECT id, user_id FROM conversations WHERE chat_id = ?",
+                (chat_id,)
+            ).fetchone()
+
+            if existing:
+                if existing["user_id"] != user_id:
+                    return None
+                conv_id = existing["id"]
                 conn.execute(
-                    """INSERT INTO messages (conversation_id, role, content, sources_json, full_sources_json)
-                       VALUES (?, ?, ?, ?, ?)""",
-                    (conv_id, msg["role"], msg["content"], sources_json, full_sources)
+                    "UPDATE conversations SET updated_at = ? WHERE id = ?",
+                    (datetime.now().isoformat(), conv_id)
                 )
+            else:
+                cursor = conn.execute(
+                    "INSERT INTO conversations (chat_id, user_id, title) VALUES (?, ?, ?)",
+                    (chat_id, user_id, title)
+                )
+                conv_id = cursor.lastrowid
+
+            for msg in messages_list:
+                _insert_message(conn, conv_id, msg)
 
             conn.commit()
             return conv_id
@@ -253,6 +383,40 @@ def save_conversation(user_id: int, chat_id: str, title: str, messages_list: Lis
             conn.close()
 
 
+@_observed
+def count_messages(user_id: int, chat_id: str) -> int:
+    conn = _get_connection()
+    try:
+        row = conn.execute(
+            """SELECT COUNT(*) FROM messages m
+               JOIN conversations c ON c.id = m.conversation_id
+               WHERE c.chat_id = ? AND c.user_id = ?""",
+            (chat_id, user_id)
+        ).fetchone()
+        return row[0]
+    finally:
+        conn.close()
+
+
+@_observed
+def get_messages(user_id: int, chat_id: str, offset: int = 0) -> List[Dict]:
+    """Role and content of a conversation's messages, oldest first, from offset on"""
+    conn = _get_connection()
+    try:
+        rows = conn.execute(
+            """SELECT m.role, m.content FROM messages m
+               JOIN conversations c ON c.id = m.conversation_id
+               WHERE c.chat_id = ? AND c.user_id = ?
+               ORDER BY m.id ASC
+               LIMIT -1 OFFSET ?""",
+            (chat_id, user_id, offset)
+        ).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        conn.close()
+
+
+@_observed
 def get_conversations(user_id: int, limit: int = 20) -> List[Dict]:
     conn = _get_connection()
     try:
@@ -270,6 +434,7 @@ def get_conversations(user_id: int, limit: int = 20) -> List[Dict]:
         conn.close()
 
 
+@_observed
 def get_conversation(user_id: int, chat_id: str) -> Optional[Dict]:
     conn = _get_connection()
     try:
@@ -314,6 +479,7 @@ def get_conversation(user_id: int, chat_id: str) -> Optional[Dict]:
         conn.close()
 
 
+@_observed
 def delete_conversation(user_id: int, chat_id: str) -> bool:
     with _write_lock:
         conn = _get_connection()
@@ -328,10 +494,76 @@ def delete_conversation(user_id: int, chat_id: str) -> bool:
             conn.close()
 
 
+# ============================================================================
+# CONVERSATION MEMORY (ROLLING SUMMARY)
+# ============================================================================
+
+@_observed
+def get_conversation_memory(chat_id: str, owner: str) -> Optional[Dict]:
+    conn = _get_connection()
+    try:
+        row = conn.execute(
+            """SELECT summary, last_question, last_answer, turns FROM conversation_memory
+               WHERE chat_id = ? AND owner = ? AND (owner NOT LIKE 'anon:%' OR updated_at >= ?)""",
+            (chat_id, owner, _anonymous_memory_cutoff())
+        ).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def _anonymous_memory_cutoff() -> str:
+    return (datetime.now() - timedelta(hours=ANONYMOUS_MEMORY_TTL_HOURS)).isoformat()
+
+
+@_observed
+def save_conversation_memory(chat_id: str, owner: str, memory: Dict):
+    """
+    Upsert the chat's memory and purge anonymous memory idle for too long.
+    A state with fewer turns than the stored one is stale (another worker
+    recorded a newer exchange meanwhile) and is dropped.
+    """
+    with _write_lock:
+        conn = _get_connection()
+        try:
+            conn.execute(
+                """INSERT INTO conversation_memory (chat_id, owner, summary, last_question, last_answer, turns, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(chat_id, owner) DO UPDATE SET
+                       summary = excluded.summary,
+                       last_question = excluded.last_question,
+                       last_answer = excluded.last_answer,
+                       turns = excluded.turns,
+                       updated_at = excluded.updated_at
+                   WHERE conversation_memory.turns <= excluded.turns""",
+                (chat_id, owner, memory.get("summary", ""), memory.get("last_question"),
+                 memory.get("last_answer"), memory.get("turns", 0), datetime.now().isoformat())
+            )
+            conn.execute(
+                "DELETE FROM conversation_memory WHERE owner LIKE 'anon:%' AND updated_at < ?",
+                (_anonymous_memory_cutoff(),)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+
+@_observed
+def delete_conversation_memory(chat_id: str, owner: str):
+    with _write_lock:
+        conn = _get_connection()
+        try:
+            conn.execute("DELETE FROM conversation_memory WHERE chat_id = ? AND owner = ?", (chat_id, owner))
+            conn.commit()
+        finally:
+            conn.close()
+
+
 # ============================================================================
 # FEEDBACK OPERATIONS
 # ============================================================================
 
+@_observed
 def save_feedback(user_id: Optional[int], anonymous_name: str, question: str,
                   answer: str, sources_json: Optional[str], rating: str,
                   comment: Optional[str], conversation_id: Optional[int] = None,
@@ -353,6 +585,7 @@ def save_feedback(user_id: Optional[int], anonymous_name: str, question: str,
             conn.close()
 
 
+@_observed
 def get_feedback(limit: int = 50, offset: int = 0,
                  rating_filter: Optional[str] = None) -> List[Dict]:
     conn = _get_connection()
@@ -372,6 +605,7 @@ def get_feedback(limit: int = 50, offset: int = 0,
         conn.close()
 
 
+@_observed
 def get_feedback_stats() -> Dict:
     conn = _get_connection()
     try:
@@ -402,6 +636,7 @@ def get_feedback_stats() -> Dict:
         conn.close()
 
 
+@_observed
 def get_top_rated_feedback(limit: int = 10) -> List[Dict]:
     conn = _get_connection()
     try:
@@ -416,3 +651,294 @@ def get_top_rated_feedback(limit: int = 10) -> List[Dict]:
         return [dict(r) for r in rows]
     finally:
         conn.close()
+
+
+# ============================================================================
+# REQUEST RECORDS (written in batches by ServerStatus)
+# ============================================================================
+
+_REQUEST_COLUMNS = (
+    "task_id", "mode", "status", "stage", "progress", "question_hash", "started_at",
+    "completed_at", "duration_seconds", "error", "trace_id", "coalesced", "degradation_level"
+)
+
+
+def _request_row(task: Dict) -> List:
+    # The question text stays in the process's memory (live status) and is not stored
+    details = {k: v for k, v in task.items() if k not in _REQUEST_COLUMNS and k != "question"}
+    row = [task.get(column) for column in _REQUEST_COLUMNS]
+    row[_REQUEST_COLUMNS.index("coalesced")] = int(bool(task.get("coalesced")))
+    row[_REQUEST_COLUMNS.index("degradation_level")] = task.get("degradation_level") or 0
+    return row + [json.dumps(details, ensure_ascii=False) if details else None]
+
+
+def _request_dict(row: sqlite3.Row) -> Dict:
+    task = {k: v for k, v in dict(row).items() if k not in ("id", "details_json") and v is not None}
+    task["coalesced"] = bool(task.get("coalesced"))
+    task.update(json.loads(row["details_json"] or "{}"))
+    return task
+
+
+@_observed
+def save_requests(tasks: List[Dict]):
+    """
+    Insert or update task records (a task is written when it starts and when
+    it ends) and purge the ones older than REQUEST_LOG_RETENTION_DAYS
+    """
+    columns = _REQUEST_COLUMNS + ("details_json",)
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != "task_id")
+    with _write_lock:
+        conn = _get_connection()
+        try:
+            conn.executemany(
+                f"""INSERT INTO requests ({", ".join(columns)})
+                    VALUES ({", ".join("?" * len(columns))})
+                    ON CONFLICT(task_id) DO UPDATE SET {updates}""",
+                [_request_row(task) for task in tasks]
+            )
+            conn.execute(
+                "DELETE FROM requests WHERE started_at < ?",
+                ((datetime.now() - timedelta(days=REQUEST_LOG_RETENTION_DAYS)).isoformat(),)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+
+@_observed
+def fail_unfinished_requests() -> int:
+    """
+    Mark tasks still 'processing' as failed. Only valid at startup, before
+    any worker serves requests: such tasks died with the previous process.
+    """
+    with _write_lock:
+        conn = _get_connection()
+        try:
+            cursor = conn.execute(
+                """UPDATE requests SET status = 'failed', error = 'Servidor reiniciado', completed_at = ?
+                   WHERE status = 'processing'""",
+                (datetime.now().isoformat(),)
+            )
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+
+@_observed
+def get_request(task_id: str) -> Optional[Dict]:
+    conn = _get_connection()
+    try:
+        row = conn.execute("SELECT * FROM requests WHERE task_id = ?", (task_id,)).fetchone()
+        return _request_dict(row) if row else None
+    finally:
+        conn.close()
+
+
+@_observed
+def get_recent_requests(limit: int = 10) -> List[Dict]:
+    """Most recently started finished requests, oldest first (like the old in-memory history)"""
+    conn = _get_connection()
+    try:
+        rows = conn.execute(
+            """SELECT * FROM requests
+               WHERE status != 'processing'
+               ORDER BY started_at DESC, id DESC
+               LIMIT ?""",
+            (limit,)
+        ).fetchall()
+        return [_request_dict(row) for row in reversed(rows)]
+    finally:
+        conn.close()
+
+
+@_observed
+def get_request_analytics(hours: float = 24) -> Dict:
+    """Volume, failures and duration percentiles of the last `hours`, overall, by mode and by hour"""
+    since = (datetime.now() - timedelta(hours=hours)).isoformat()
+    conn = _get_connection()
+    try:
+        by_mode = conn.execute(
+            """SELECT mode,
+                      COUNT(*) as total,
+                      SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed,
+                      SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed,
+                      SUM(coalesced) as coalesced,
+                      SUM(CASE WHEN degradation_level > 0 THEN 1 ELSE 0 END) as degraded,
+                      AVG(duration_seconds) as avg_seconds
+               FROM requests WHERE started_at >= ?
+               GROUP BY mode""",
+            (since,)
+        ).fetchall()
+
+        by_hour = conn.execute(
+            """SELECT substr(started_at, 1, 13) as hour,
+                      COUNT(*) as total,
+                      SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed,
+                      AVG(duration_seconds) as avg_seconds
+               FROM requests WHERE started_at >= ?
+               GROUP BY hour
+               ORDER BY hour""",
+            (since,)
+        ).fetchall()
+
+        durations = [row["duration_seconds"] for row in conn.execute(
+            """SELECT duration_seconds FROM requests
+               WHERE started_at >= ? AND status = 'completed' AND duration_seconds IS NOT NULL
+               ORDER BY duration_seconds""",
+            (since,)
+        )]
+
+        def percentile(p: float) -> Optional[float]:
+            if not durations:
+                return None
+            return round(durations[min(len(durations) - 1, int(p * len(durations)))], 3)
+
+        errors = conn.execute(
+            """SELECT error, COUNT(*) as count FROM requests
+               WHERE started_at >= ? AND status = 'failed'
+               GROUP BY error ORDER BY count DESC LIMIT 10""",
+            (since,)
+        ).fetchall()
+
+        return {
+            "hours": hours,
+            "total": sum(row["total"] for row in by_mode),
+            "duration_seconds": {"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99)},
+            "by_mode": [dict(row) for row in by_mode],
+            "by_hour": [dict(row) for row in by_hour],
+            "top_errors": [dict(row) for row in errors]
+        }
+    finally:
+        conn.close()
+
+
+# ============================================================================
+# SLOW REQUEST LOG
+# ============================================================================
+
+_SLOW_REQUEST_COLUMNS = (
+    "endpoint", "task_id", "trace_id", "question_hash", "model", "total_seconds",
+    "top_k", "fetch_k", "complexity_level", "num_searches", "prompt_tokens",
+    "output_tokens", "cached", "degradation_level"
+)
+
+
+@_observed
+def save_slow_request(entry: Dict) -> int:
+    """Columns from the entry's top-level fields, the rest (queries, chunk IDs, stages) as JSON"""
+    details = {k: v for k, v in entry.items() if k not in _SLOW_REQUEST_COLUMNS and k != "created_at"}
+    with _write_lock:
+        conn = _get_connection()
+        try:
+            cursor = conn.execute(
+                f"""INSERT INTO slow_requests ({", ".join(_SLOW_REQUEST_COLUMNS)}, details_json)
+                    VALUES ({", ".join("?" * len(_SLOW_REQUEST_COLUMNS))}, ?)""",
+                [entry.get(column) for column in _SLOW_REQUEST_COLUMNS] + [json.dumps(details, ensure_ascii=False)]
+            )
+            conn.commit()
+            return cursor.lastrowid
+        finally:
+            conn.close()
+
+
+@_observed
+def get_slow_requests(hours: float = 24, limit: int = 20,
+                      endpoint: Optional[str] = None) -> List[Dict]:
+    """Slowest logged requests of the last `hours`, slowest first"""
+    conn = _get_connection()
+    try:
+        query = "SELECT * FROM slow_requests WHERE created_at >= datetime('now', ?)"
+        params = [f"-{hours} hours"]
+        if endpoint:
+            query += " AND endpoint = ?"
+            params.append(endpoint)
+        query += " ORDER BY total_seconds DESC LIMIT ?"
+        params.append(limit)
+        rows = conn.execute(query, params).fetchall()
+        results = []
+        for row in rows:
+            entry = dict(row)
+            entry["cached"] = bool(entry["cached"])
+            entry.update(json.loads(entry.pop("details_json") or "{}"))
+            results.append(entry)
+        return results
+    finally:
+        conn.close()
+
+
+# ============================================================================
+# SHARED CACHE (multi-worker)
+# ============================================================================
+
+@_observed
+def save_shared_cache(entries: List[Dict]):
+    """Insert cache values (namespace, cache_key, value, expires_at) and purge expired ones"""
+    with _write_lock:
+        conn = _get_connection()
+        try:
+            conn.executemany(
+                "INSERT INTO shared_cache (namespace, cache_key, value_json, expires_at) VALUES (?, ?, ?, ?)",
+                [(e["namespace"], e["cache_key"], json.dumps(e["value"], ensure_ascii=False), e["expires_at"])
+                 for e in entries]
+            )
+            conn.execute("DELETE FROM shared_cache WHERE expires_at < ?", (time.time(),))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+@_observed
+def get_shared_cache(namespace: str, cache_key: str, limit: int = 20) -> List:
+    """Live values stored under a key, newest first"""
+    conn = _get_connection()
+    try:
+        rows = conn.execute(
+            """SELECT value_json FROM shared_cache
+               WHERE namespace = ? AND cache_key = ? AND expires_at >= ?
+               ORDER BY id DESC LIMIT ?""",
+            (namespace, cache_key, time.time(), limit)
+        ).fetchall()
+        return [json.loads(row["value_json"]) for row in rows]
+    finally:
+        conn.close()
+
+
+# ============================================================================
+# CACHE WARM-UP QUERIES
+# ============================================================================
+
+@_observed
+def get_warmup_questions(limit: int = 20, min_count: int = 1) -> List[Dict]:
+    """
+    Most frequent and best-rated questions, for pre-warming the caches.
+
+    Combines questions asked in saved conversations with questions from
+    the feedback table. Questions rated 'good' come first, then the most
+    frequently asked ones.
+    """
+    conn = _get_connection()
+    try:
+        rows = conn.execute(
+            """SELECT MIN(question) as question,
+                      COUNT(*) as frequency,
+                      SUM(good) as good_count,
+                      SUM(bad) as bad_count
+               FROM (
+                   SELECT content as question, 0 as good, 0 as bad
+                   FROM messages WHERE role = 'user'
+                   UNION ALL
+                   SELECT question,
+                          CASE WHEN rating = 'good' THEN 1 ELSE 0 END,
+                          CASE WHEN rating = 'bad' THEN 1 ELSE 0 END
+                   FROM feedback
+               )
+               GROUP BY LOWER(TRIM(question))
+               HAVING bad_count <= good_count AND (good_count > 0 OR frequency >= ?)
+               ORDER BY good_count DESC, frequency DESC
+               LIMIT ?""",
+            (min_count, limit)
+        ).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        conn.close()
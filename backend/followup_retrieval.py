@@ -0,0 +1,177 @@
+"""
+Follow-up-aware retrieval reuse within a conversation.
+
+Follow-ups ("e o que ele diz sobre isso no Evangelho?") usually stay in the
+neighbourhood the previous turn already retrieved. For every conversation
+turn we remember the query vector and the candidate chunks around the hits
+(the hit pages and their neighbouring pages). The next question of the same
+chat (keyed by chat_id and owner, as in conversation_memory.py) is first scored against that small candidate set only, with its vector
+blended with the previous turn's (follow-ups alone embed poorly); the full
+multi-search runs only when the best candidates score too low.
+
+Stats report how often the fast path served a follow-up.
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from cache import LRUCache, normalize_query
+from structured_log import get_logger
+
+logger = get_logger("followup_retrieval")
+
+
+def _normalize(vector) -> np.ndarray:
+    vec = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+class FollowUpRetriever:
+    """
+    Per-conversation retrieval state and the follow-up fast path.
+
+    Args:
+        vectorstore: Chroma vectorstore (candidates are re-read by ID)
+        embeddings: Embedding model used for the query vectors
+        min_score: Cosine similarity the k-th best candidate needs for the
+            fast path to be used (below it: full search)
+        query_blend: Weight of the previous turn's vector in the blended query
+        page_window: Neighbouring pages (each side) added around every hit
+        max_turns: Turns whose candidates are kept per conversation
+        max_conversations: Conversations (chat_id, owner) kept (LRU)
+        ttl_seconds: Idle time after which a conversation's state expires
+    """
+
+    def __init__(
+        self,
+        vectorstore,
+        embeddings,
+        min_score: float = 0.45,
+        query_blend: float = 0.5,
+        page_window: int = 1,
+        max_turns: int = 2,
+        max_conversations: int = 1000,
+        ttl_seconds: float = 3600
+    ):
+        self.vectorstore = vectorstore
+        self.embeddings = embeddings
+        self.min_score = min_score
+        self.query_blend = query_blend
+        self.page_window = page_window
+        self.max_turns = max_turns
+        self._states = LRUCache(max_conversations, ttl_seconds)
+        self._vectors = LRUCache(256, ttl_seconds)  # question -> embedding (search + record)
+        self._lock = threading.Lock()
+        self._stats = {"attempts": 0, "reused": 0, "weak_scores": 0, "errors": 0}
+
+    def _embed(self, question: str) -> np.ndarray:
+        key = normalize_query(question)
+        vector = self._vectors.get(key)
+        if vector is None:
+            vector = _normalize(self.embeddings.embed_query(question))
+            self._vectors.put(key, vector)
+        return vector
+
+    def _count(self, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def search(self, chat_id: str, owner: str, question: str, k: int, fetch_k: int) -> Optional[Tuple[List, Dict]]:
+        """
+        Rank the chat's previous candidates for a follow-up.
+        Returns (documents, metadata), or None when a full search is needed.
+        """
+        state = self._states.get((chat_id, owner))
+        if not state:
+            return None
+
+        self._count("attempts")
+        try:
+            candidate_ids = list(dict.fromkeys(i for turn in state for i in turn["candidate_ids"]))
+            result = self.vectorstore.get(ids=candidate_ids, include=["documents", "metadatas", "embeddings"])
+            if not result["ids"]:
+                self._count("weak_scores")
+                return None
+
+            query = self._embed(question)
+            blended = _normalize(query + self.query_blend * state[-1]["vector"])
+            matrix = np.asarray(result["embeddings"], dtype=np.float32)
+            matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            scores = matrix @ blended
+        except Exception as e:
+            self._count("errors")
+            logger.warning("Reaproveitamento de busca falhou", extra={"error": str(e)})
+            return None
+
+        order = np.argsort(-scores)[:fetch_k]
+        if len(order) < k or scores[order[k - 1]] < self.min_score:
+            self._count("weak_scores")
+            return None
+
+        from langchain.schema import Document
+        from priority_retriever import rerank_by_priority
+
+        ranked = [
+            Document(page_content=result["documents"][i], metadata=result["metadatas"][i] or {}, id=result["ids"][i])
+            for i in order if scores[i] >= self.min_score
+        ]
+        documents = rerank_by_priority(ranked, top_k=k)
+        self._count("reused")
+        return documents, {
+            "followup_reuse": True,
+            "num_searches": 0,
+            "candidates": len(result["ids"]),
+            "unique_documents": len(documents),
+            "min_score": round(float(scores[order[k - 1]]), 4)
+        }
+
+    def _neighbour_ids(self, documents: List) -> List[str]:
+        """Chunk IDs of the hit pages and their neighbours, per source"""
+        pages_by_source: Dict[str, set] = {}
+        ids = [doc.id for doc in documents if getattr(doc, "id", None)]
+        for doc in documents:
+            source, page = doc.metadata.get("source"), doc.metadata.get("page")
+            if source is None or not isinstance(page, int):
+                continue
+            window = range(page - self.page_window, page + self.page_window + 1)
+            pages_by_source.setdefault(source, set()).update(p for p in window if p >= 0)
+
+        for source, pages in pages_by_source.items():
+            result = self.vectorstore.get(
+                where={"$and": [{"source": {"$eq": source}}, {"page": {"$in": sorted(pages)}}]},
+                include=[]
+            )
+            ids.extend(result["ids"])
+        return list(dict.fromkeys(ids))
+
+    def record(self, chat_id: str, owner: str, question: str, documents: List):
+        """Remember this turn's query vector and candidate neighbourhood"""
+        try:
+            turn = {
+                "vector": self._embed(question),
+                "candidate_ids": self._neighbour_ids(documents)
+            }
+        except Exception as e:
+            self._count("errors")
+            logger.warning("Falha ao registrar busca da conversa", extra={"error": str(e)})
+            return
+        if not turn["candidate_ids"]:
+            return
+        key = (chat_id, owner)
+        state = (self._states.get(key) or []) + [turn]
+        self._states.put(key, state[-self.max_turns:])
+
+    def forget(self, chat_id: str, owner: str):
+        """Drop a conversation's state (e.g. after it's deleted)"""
+        self._states.put((chat_id, owner), [])
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["hit_rate"] = stats["reused"] / stats["attempts"] if stats["attempts"] else 0.0
+        stats["conversations"] = len(self._states)
+        stats["min_score"] = self.min_score
+        return stats
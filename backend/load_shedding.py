@@ -0,0 +1,173 @@
+"""
+Load shedding: degrade answer quality under pressure instead of timing out.
+
+LoadShedder picks a degradation level from the admission queue depth and
+the recent request latency. Each level trades context for speed (no
+multi-search, fewer chunks, shorter history, smaller model); see
+LOAD_SHEDDING_LEVELS in config.py.
+
+Escalation is immediate. Recovery goes down one level at a time, and
+only after the pressure has stayed below the lower level's thresholds
+for cooldown_seconds, so the level doesn't flap on every request.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from structured_log import get_logger
+
+logger = get_logger("load_shedding")
+
+
+class LoadShedder:
+    """
+    Adaptive degradation level (0 = normal).
+
+    Args:
+        levels: Degradation profile per level (index 0 = level 1)
+        queue_thresholds: Queue depth that triggers each level
+        latency_thresholds: Recent average latency (s) that triggers each level
+        latency_window: Number of recent requests in the latency average
+        latency_max_age: Samples older than this (s) are ignored, so an idle
+            server recovers even without new requests finishing
+        cooldown_seconds: Calm time required before recovering one level
+        enabled: When False, always level 0
+    """
+
+    LABELS = ["normal", "leve", "moderado", "severo"]
+
+    def __init__(
+        self,
+        levels: List[Dict],
+        queue_thresholds: List[int],
+        latency_thresholds: List[float],
+        latency_window: int = 20,
+        latency_max_age: float = 300.0,
+        cooldown_seconds: float = 30.0,
+        enabled: bool = True
+    ):
+        self.levels = levels
+        self.queue_thresholds = queue_thresholds
+        self.latency_thresholds = latency_thresholds
+        self.latency_max_age = latency_max_age
+        self.cooldown_seconds = cooldown_seconds
+        self.enabled = enabled
+        self._latencies = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+        self._level = 0
+        self._calm_since: Optional[float] = None
+        self._queue_depth = 0
+        self._escalations = 0
+        self._degraded_requests = [0] * (len(levels) + 1)
+
+    @property
+    def max_level(self) -> int:
+        return len(self.levels)
+
+    def _label(self, level: int) -> str:
+        return self.LABELS[min(level, len(self.LABELS) - 1)]
+
+    def record_latency(self, seconds: float):
+        """Record the end-to-end time of a finished request"""
+        with self._lock:
+            self._latencies.append((time.time(), seconds))
+
+    def recent_latency(self, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        with self._lock:
+            recent = [s for t, s in self._latencies if now - t <= self.latency_max_age]
+        return sum(recent) / len(recent) if recent else 0.0
+
+    @staticmethod
+    def _level_for(value: float, thresholds: List[float]) -> int:
+        level = 0
+        for i, threshold in enumerate(thresholds):
+            if value >= threshold:
+                level = i + 1
+        return level
+
+    def update(self, queue_depth: int, now: Optional[float] = None) -> int:
+        """Re-evaluate the level from the current queue depth"""
+        if not self.enabled:
+            return 0
+        now = time.time() if now is None else now
+        target = min(self.max_level, max(
+            self._level_for(queue_depth, self.queue_thresholds),
+            self._level_for(self.recent_latency(now), self.latency_thresholds)
+        ))
+
+        with self._lock:
+            self._queue_depth = queue_depth
+            if target > self._level:
+                self._level = target
+                self._calm_since = None
+                self._escalations += 1
+                logger.warning("Sobrecarga: modo degradado", extra={"degradation_level": target, "label": self._label(target)})
+            elif target < self._level:
+                if self._calm_since is None:
+                    self._calm_since = now
+                elif now - self._calm_since >= self.cooldown_seconds:
+                    self._level -= 1
+                    self._calm_since = now if target < self._level else None
+                    logger.info("Carga reduzida", extra={"degradation_level": self._level})
+            else:
+                self._calm_since = None
+            return self._level
+
+    def plan(self, queue_depth: int, model_name: str, top_k: int, fetch_k: int,
+             history_len: int, multi_search: bool) -> Dict:
+        """
+        Effective request settings at the current level.
+
+        Returns a dict with level, label, model_name, top_k, fetch_k,
+        max_history, multi_search and the list of applied changes.
+        """
+        level = self.update(queue_depth)
+        plan = {
+            "level": level,
+            "label": self._label(level),
+            "model_name": model_name,
+            "top_k": top_k,
+            "fetch_k": fetch_k,
+            "max_history": history_len,
+            "multi_search": multi_search,
+            "changes": []
+        }
+        with self._lock:
+            self._degraded_requests[level] += 1
+        if level == 0:
+            return plan
+
+        profile = self.levels[level - 1]
+        if multi_search and not profile.get("multi_search", True):
+            plan["multi_search"] = False
+            plan["changes"].append("multi_search_off")
+        if profile.get("top_k") and top_k > profile["top_k"]:
+            plan["top_k"] = profile["top_k"]
+            plan["changes"].append("top_k")
+        if profile.get("fetch_k") and fetch_k > profile["fetch_k"]:
+            plan["fetch_k"] = max(profile["fetch_k"], plan["top_k"])
+            plan["changes"].append("fetch_k")
+        if profile.get("max_history") is not None and history_len > profile["max_history"]:
+            plan["max_history"] = profile["max_history"]
+            plan["changes"].append("history")
+        if profile.get("model") and profile["model"] != model_name:
+            plan["model_name"] = profile["model"]
+            plan["changes"].append("model")
+        return plan
+
+    def get_stats(self) -> Dict:
+        recent_latency = self.recent_latency()
+        with self._lock:
+            level = self._level
+            return {
+                "enabled": self.enabled,
+                "level": level,
+                "label": self._label(level),
+                "queue_depth": self._queue_depth,
+                "recent_latency": round(recent_latency, 2),
+                "escalations": self._escalations,
+                "requests_per_level": list(self._degraded_requests)
+            }
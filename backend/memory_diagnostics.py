@@ -0,0 +1,240 @@
+"""
+Memory diagnostics: process RSS, Python heap, tracemalloc snapshots and
+per-component size estimates.
+
+- process_memory(): RSS and peak RSS (psutil when installed, /proc on
+  Linux, getrusage peak otherwise)
+- python_heap(): allocator blocks, GC generations, tracemalloc totals
+- TracemallocSnapshots: start/stop tracing, keep the last few snapshots,
+  top allocation sites of one and the diff between two
+- deep_sizeof() / torch_module_bytes() / directory_bytes(): estimates for
+  the components the API server holds (model, index, caches)
+"""
+
+import gc
+import itertools
+import os
+import sys
+import threading
+import tracemalloc
+from collections import OrderedDict, deque
+from datetime import datetime
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MB = 1024 * 1024
+
+
+def to_mb(value: Optional[float]) -> Optional[float]:
+    return round(value / MB, 1) if value is not None else None
+
+
+def process_memory() -> Dict:
+    """Resident set size (current and peak) of this process"""
+    rss = peak = None
+    source = None
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        rss, source = info.rss, "psutil"
+        peak = getattr(info, "peak_wset", None)  # Windows only
+    if os.path.exists("/proc/self/status"):
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        if "VmRSS" in fields:
+            rss = rss or int(fields["VmRSS"].split()[0]) * 1024
+            peak = int(fields["VmHWM"].split()[0]) * 1024 if "VmHWM" in fields else peak
+            source = source or "/proc"
+    if peak is None:
+        try:
+            import resource
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            peak = maxrss if sys.platform == "darwin" else maxrss * 1024  # bytes on macOS, KB elsewhere
+            source = source or "getrusage"
+        except ImportError:
+            pass
+    return {"rss_bytes": rss, "rss_mb": to_mb(rss), "peak_rss_mb": to_mb(peak), "source": source}
+
+
+def python_heap() -> Dict:
+    heap = {
+        "allocated_blocks": sys.getallocatedblocks(),
+        "gc_counts": list(gc.get_count()),
+        "gc_tracked_objects": len(gc.get_objects()),
+        "tracemalloc": tracemalloc.is_tracing()
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        heap["traced_mb"] = to_mb(current)
+        heap["traced_peak_mb"] = to_mb(peak)
+        heap["tracemalloc_overhead_mb"] = to_mb(tracemalloc.get_tracemalloc_memory())
+    return heap
+
+
+# Never followed by deep_sizeof: code, shared infrastructure, synchronization
+_OPAQUE_TYPES = (
+    type, ModuleType, FunctionType, BuiltinFunctionType, MethodType,
+    type(threading.Lock()), type(threading.RLock()), threading.Thread, threading.Event
+)
+
+
+def deep_sizeof(obj, exclude: Iterable = (), max_objects: int = 500_000) -> int:
+    """
+    Approximate bytes reachable from obj (containers, instance attributes,
+    numpy buffers). Objects in `exclude` (shared models, the vectorstore...)
+    are not counted or followed; stops after max_objects objects.
+    """
+    seen = {id(item) for item in exclude}
+    stack = [obj]
+    total = 0
+    visited = 0
+    while stack and visited < max_objects:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _OPAQUE_TYPES):
+            continue
+        seen.add(id(item))
+        visited += 1
+
+        if np is not None and isinstance(item, np.ndarray):
+            total += sys.getsizeof(item) + (item.nbytes if item.base is None else 0)
+            continue
+        total += sys.getsizeof(item, 0)
+        if isinstance(item, (str, bytes, bytearray, int, float, bool, complex)):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+        else:
+            if hasattr(item, "__dict__"):
+                stack.append(vars(item))
+            for slot in getattr(type(item), "__slots__", ()):
+                if isinstance(slot, str) and hasattr(item, slot):
+                    stack.append(getattr(item, slot))
+    return total
+
+
+def torch_module_bytes(module) -> Optional[int]:
+    """Parameters + buffers of a torch module (e.g. the SentenceTransformer)"""
+    if module is None or not hasattr(module, "parameters"):
+        return None
+    tensors = itertools.chain(module.parameters(), module.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def directory_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class TracemallocSnapshots:
+    """The last `max_snapshots` tracemalloc snapshots, by ID"""
+
+    # Allocations of tracemalloc itself and of the import system are noise
+    FILTERS = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ]
+
+    def __init__(self, max_snapshots: int = 5):
+        self.max_snapshots = max_snapshots
+        self._snapshots: "OrderedDict[str, Dict]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self, frames: int = 1) -> bool:
+        """Start tracing new allocations (False if it was already on)"""
+        if tracemalloc.is_tracing():
+            return False
+        tracemalloc.start(frames)
+        return True
+
+    def stop(self):
+        """Stop tracing; keeps the snapshots already taken"""
+        tracemalloc.stop()
+
+    def take(self, label: str = "") -> Dict:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc não está ativo")
+        snapshot = tracemalloc.take_snapshot().filter_traces(self.FILTERS)
+        entry = {
+            "snapshot_id": f"snap_{next(self._ids)}",
+            "label": label,
+            "taken_at": datetime.now().isoformat(),
+            "traced_mb": to_mb(sum(stat.size for stat in snapshot.statistics("filename"))),
+            "snapshot": snapshot
+        }
+        with self._lock:
+            self._snapshots[entry["snapshot_id"]] = entry
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return entry
+
+    def get(self, snapshot_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._snapshots.get(snapshot_id)
+
+    @staticmethod
+    def describe(entry: Dict) -> Dict:
+        return {key: value for key, value in entry.items() if key != "snapshot"}
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            entries = list(self._snapshots.values())
+        return [self.describe(entry) for entry in entries]
+
+    @staticmethod
+    def _site(trace) -> str:
+        frame = trace.traceback[0]
+        return f"{frame.filename}:{frame.lineno}"
+
+    def top(self, snapshot_id: str, limit: int = 25, group_by: str = "lineno") -> Optional[List[Dict]]:
+        """Allocation sites holding the most memory in one snapshot"""
+        entry = self.get(snapshot_id)
+        if entry is None:
+            return None
+        return [
+            {"site": self._site(stat), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+            for stat in entry["snapshot"].statistics(group_by)[:limit]
+        ]
+
+    def diff(self, old_id: str, new_id: str, limit: int = 25, group_by: str = "lineno") -> Optional[List[Dict]]:
+        """Allocation sites that grew (or shrank) the most between two snapshots"""
+        old, new = self.get(old_id), self.get(new_id)
+        if old is None or new is None:
+            return None
+        return [
+            {
+                "site": self._site(stat),
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "size_kb": round(stat.size / 1024, 1),
+                "count_diff": stat.count_diff
+            }
+            for stat in new["snapshot"].compare_to(old["snapshot"], group_by)[:limit]
+        ]
+
+    def get_stats(self) -> Dict:
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "frames": tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else None,
+            "max_snapshots": self.max_snapshots,
+            "snapshots": self.list()
+        }
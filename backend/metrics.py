@@ -0,0 +1,358 @@
+"""
+Prometheus-compatible metrics (text exposition format) without extra
+dependencies.
+
+Counters and histograms are sharded per thread: each thread updates its
+own dict with no lock (only the event loop and the threadpool workers
+touch them), and a scrape sums the shards. The shard of a thread that has
+exited is folded into a base shard and dropped, so threadpool churn doesn't
+grow the list. Values that other components
+already count (cache hits, queue depth, admission waits) are read from
+their get_stats() at scrape time, so they cost nothing on the hot path.
+
+    QUERY_OUTCOMES.inc(endpoint="/query", outcome="answered")
+    with SQLITE_OPERATION_SECONDS.time(operation="get_messages"):
+        ...
+    registry.render()  # body of GET /metrics
+"""
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from a cache lookup to a full generation
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _add_counts(base: Dict, shard: Dict):
+    for key, value in shard.items():
+        base[key] = base.get(key, 0) + value
+
+
+def _add_states(base: Dict, shard: Dict):
+    for key, state in shard.items():
+        base[key] = [a + b for a, b in zip(base[key], state)] if key in base else list(state)
+
+
+class _ShardedValues:
+    """
+    One dict per thread; writers never contend, readers sum the shards.
+    merge(base, shard) adds a dead thread's shard into the base shard.
+    """
+
+    def __init__(self, merge: Callable[[Dict, Dict], None]):
+        self.merge = merge
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, Dict]] = []
+        self._base: Dict = {}  # values of threads that have exited
+        self._lock = threading.Lock()  # only taken to create a shard or to scrape
+
+    def shard(self) -> Dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = {}
+            with self._lock:
+                self._fold_dead_shards()
+                self._shards.append((threading.current_thread(), values))
+            self._local.values = values
+            return values
+
+    def _fold_dead_shards(self):
+        """Move the shards of exited threads into the base shard (lock held)"""
+        alive = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                alive.append((thread, values))
+            else:
+                # The thread can't write any more: its dict is final
+                self.merge(self._base, values)
+        self._shards = alive
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            self._fold_dead_shards()
+            base = dict(self._base)
+            shards = [values for _, values in self._shards]
+        # dict() of a dict with str/tuple keys is a single step under the GIL
+        return [base] + [dict(shard) for shard in shards]
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = _ShardedValues(_add_counts)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        shard = self._values.shard()
+        shard[key] = shard.get(key, 0) + amount
+
+    def collect(self) -> Dict[Tuple, float]:
+        totals: Dict[Tuple, float] = {}
+        for shard in self._values.snapshot():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def render(self) -> Iterable[str]:
+        for key, value in sorted(self.collect().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Fixed-bucket histogram with optional labels"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = sorted(buckets)
+        self._values = _ShardedValues(_add_states)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        shard = self._values.shard()
+        state = shard.get(key)
+        if state is None:
+            # per-bucket counts (last = +Inf), then sum
+            state = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def collect(self) -> Dict[Tuple, List[float]]:
+        totals: Dict[Tuple, List[float]] = {}
+        for shard in self._values.snapshot():
+            for key, state in shard.items():
+                state = list(state)
+                if key in totals:
+                    totals[key] = [a + b for a, b in zip(totals[key], state)]
+                else:
+                    totals[key] = state
+        return totals
+
+    def render(self) -> Iterable[str]:
+        for key, state in sorted(self.collect().items()):
+            yield from render_histogram(self.name, self.labelnames, key, self.buckets, state[:-1], state[-1])
+
+
+def render_histogram(name: str, labelnames, key, buckets, counts, total) -> Iterable[str]:
+    """Exposition lines of one histogram series from per-bucket (non-cumulative) counts"""
+    running = 0
+    for bound, count in zip(list(buckets) + [math.inf], counts):
+        running += count
+        le = 'le="' + _format_value(bound) + '"'
+        yield f"{name}_bucket{_format_labels(labelnames, key, le)} {_format_value(running)}"
+    yield f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}"
+    yield f"{name}_count{_format_labels(labelnames, key)} {_format_value(running)}"
+
+
+class CallbackMetric:
+    """
+    Counter or gauge whose samples are read at scrape time.
+    fn returns a number, or {label values tuple: number}.
+    """
+
+    def __init__(self, name: str, documentation: str, type: str, fn: Callable, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def render(self) -> Iterable[str]:
+        samples = self.fn()
+        if samples is None:
+            return
+        if not isinstance(samples, dict):
+            samples = {(): samples}
+        for key, value in sorted(samples.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, type: str, fn: Callable,
+                 labelnames: Sequence[str] = ()) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, type, fn, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = list(metric.render())
+            except Exception as e:
+                # A failing stats callback must not break the whole scrape
+                lines.append(f"# {metric.name}: {_escape(e)}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+# ============================================================================
+# APPLICATION METRICS
+# ============================================================================
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter(
+    "chatbot_http_requests_total",
+    "HTTP requests by endpoint, method and status code",
+    ["endpoint", "method", "status"]
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "chatbot_http_request_duration_seconds",
+    "Time until the response starts (streams: until the first byte)",
+    ["endpoint"]
+)
+QUERY_OUTCOMES = registry.counter(
+    "chatbot_query_outcomes_total",
+    "Questions by endpoint and outcome (answered, cached, off_topic, queue_full, error, disconnected)",
+    ["endpoint", "outcome"]
+)
+STAGE_SECONDS = registry.histogram(
+    "chatbot_stage_duration_seconds",
+    "Per-stage latency of answered questions (see timing.py)",
+    ["stage"]
+)
+TOKENS = registry.counter(
+    "chatbot_tokens_total",
+    "Tokens processed by Ollama, by model and kind (prompt, generated)",
+    ["model", "kind"]
+)
+SQLITE_OPERATION_SECONDS = registry.histogram(
+    "chatbot_sqlite_operation_duration_seconds",
+    "SQLite operation latency by database function",
+    ["operation"],
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1]
+)
+EMBEDDING_BATCH_SIZE = registry.histogram(
+    "chatbot_embedding_batch_size",
+    "Texts per embedding call",
+    buckets=BATCH_SIZE_BUCKETS
+)
+EMBEDDING_SECONDS = registry.histogram(
+    "chatbot_embedding_duration_seconds",
+    "Embedding call latency"
+)
+
+
+def observe_timing(timing: Dict):
+    """Feed one request's RequestTimer.to_dict() into the stage histogram"""
+    for stage, seconds in timing.get("stages", {}).items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    STAGE_SECONDS.observe(timing.get("total", 0.0), stage="total")
+
+
+class InstrumentedEmbeddings:
+    """Wraps an embeddings model to record batch sizes and latency"""
+
+    def __init__(self, embeddings):
+        self.wrapped = embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        EMBEDDING_BATCH_SIZE.observe(1)
+        with EMBEDDING_SECONDS.time():
+            return self.wrapped.embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        EMBEDDING_BATCH_SIZE.observe(len(texts))
+        with EMBEDDING_SECONDS.time():
+            return self.wrapped.embed_documents(texts)
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting HTTP requests by route template and status"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        def endpoint() -> str:
+            # Route template (/conversations/{chat_id}) keeps the label set small
+            route = scope.get("route")
+            return getattr(route, "path", "unmatched")
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            HTTP_REQUESTS.inc(endpoint=endpoint(), method=scope["method"], status=str(status))
@@ -0,0 +1,135 @@
+"""
+Complexity-aware model routing.
+
+Maps the QueryAnalyzer complexity level (1-3) of a question to a model
+and its generation limits (num_predict, num_ctx), so simple definitional
+questions go to a small model and only comparative / multi-concept
+questions pay for the large one. Requests that name a model explicitly
+keep it (reported under the "client" route).
+
+Tracks hit counts and latency per route.
+"""
+
+import threading
+from typing import Dict
+
+from admission import Histogram
+from multi_search import QueryAnalyzer
+
+AUTO_MODEL = "auto"
+
+
+class ModelRouter:
+    """
+    Routing table from complexity level to model settings.
+
+    Args:
+        routes: {level: {"model", "num_predict", "num_ctx"}}
+        default_num_ctx: Context size for requests that aren't routed
+        enabled: When False, "auto" requests go to the level 3 route
+    """
+
+    LATENCY_BUCKETS = [1, 2, 5, 10, 20, 30, 60, 120, 300]
+
+    def __init__(self, routes: Dict[int, Dict], default_num_ctx: int = 8192, enabled: bool = True):
+        self.routes = routes
+        self.default_num_ctx = default_num_ctx
+        self.enabled = enabled
+        self.analyzer = QueryAnalyzer()
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {}
+        self._latency: Dict[str, Histogram] = {}
+
+    def route(self, question: str, requested_model: str, record_stats: bool = True) -> Dict:
+        """
+        Pick the model for a question.
+
+        Returns a dict with name (route key for stats), model,
+        complexity_level, num_predict and num_ctx.
+        """
+        if requested_model and requested_model != AUTO_MODEL:
+            route = {
+                "name": "client",
+                "model": requested_model,
+                "complexity_level": None,
+                "num_predict": None,
+                "num_ctx": self.default_num_ctx
+            }
+        else:
+            if self.enabled:
+                level = self.analyzer.analyze_complexity(question)["complexity_level"]
+            else:
+                level = max(self.routes)
+            settings = self.routes.get(level) or self.routes[max(self.routes)]
+            route = {
+                "name": f"level_{level}",
+                "model": settings["model"],
+                "complexity_level": level,
+                "num_predict": settings.get("num_predict"),
+                "num_ctx": settings.get("num_ctx") or self.default_num_ctx
+            }
+
+        if record_stats:
+            self._record_hit(route["name"])
+        return route
+
+    def route_for_model(self, model: str, record_stats: bool = True) -> Dict:
+        """
+        Route for a model swapped in after routing (load shedding fallback).
+
+        Uses the name and num_predict of the lowest level that runs the
+        model, and the largest num_ctx any level runs it with (the size it
+        is preloaded with, so Ollama doesn't reload it). A model that no
+        level runs gets the "fallback" route.
+        """
+        levels = sorted(level for level, settings in self.routes.items() if settings["model"] == model)
+        if levels:
+            route = {
+                "name": f"level_{levels[0]}",
+                "model": model,
+                "complexity_level": levels[0],
+                "num_predict": self.routes[levels[0]].get("num_predict"),
+                "num_ctx": max(self.routes[level].get("num_ctx") or self.default_num_ctx for level in levels)
+            }
+        else:
+            route = {
+                "name": "fallback",
+                "model": model,
+                "complexity_level": None,
+                "num_predict": None,
+                "num_ctx": self.default_num_ctx
+            }
+
+        if record_stats:
+            self._record_hit(route["name"])
+        return route
+
+    def _record_hit(self, route_name: str):
+        with self._lock:
+            self._hits[route_name] = self._hits.get(route_name, 0) + 1
+
+    def record_latency(self, route_name: str, seconds: float):
+        with self._lock:
+            histogram = self._latency.get(route_name)
+            if histogram is None:
+                histogram = self._latency[route_name] = Histogram(self.LATENCY_BUCKETS)
+            histogram.observe(seconds)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            routes = {}
+            for name, hits in self._hits.items():
+                latency = self._latency[name].to_dict() if name in self._latency else None
+                routes[name] = {
+                    "hits": hits,
+                    "completed": latency["count"] if latency else 0,
+                    "avg_latency": round(latency["avg"], 2) if latency else 0.0,
+                    "latency_histogram": latency
+                }
+            return {
+                "enabled": self.enabled,
+                "table": {
+                    f"level_{level}": dict(settings) for level, settings in sorted(self.routes.items())
+                },
+                "routes": routes
+            }
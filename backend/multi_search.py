@@ -15,6 +15,11 @@ Date: 2025-02-01
 from typing import List, Dict, Tuple
 import re
 from langchain.schema import Document
+from timing import timed
+from tracing import current_span, traced
+from structured_log import get_logger
+
+logger = get_logger("multi_search")
 
 
 class QueryAnalyzer:
@@ -332,18 +337,21 @@ class MultiSearchEngine:
     4. Deduplication and reranking
     """
 
-    def __init__(self, vectorstore, llm=None):
+    def __init__(self, vectorstore, llm=None, retrieval_cache=None):
         """
         Initialize the MultiSearchEngine.
 
         Args:
             vectorstore: ChromaDB vectorstore instance
             llm: Optional LLM instance (for future query expansion)
+            retrieval_cache: Optional RetrievalCache shared by all searches
         """
         self.vectorstore = vectorstore
         self.llm = llm
+        self.retrieval_cache = retrieval_cache
         self.analyzer = QueryAnalyzer()
 
+    @traced("MultiSearchEngine.multi_search")
     def multi_search(
         self,
         question: str,
@@ -367,7 +375,8 @@ class MultiSearchEngine:
         """
 
         # Step 1: Analyze complexity
-        analysis = self.analyzer.analyze_complexity(question)
+        with timed("query_analysis"):
+            analysis = self.analyzer.analyze_complexity(question)
 
         # Limit number of searches
         num_searches = min(
@@ -375,10 +384,6 @@ class MultiSearchEngine:
             max_searches
         )
 
-        print(f"🔍 Análise: Nível {analysis['complexity_level']}, "
-              f"{analysis['num_concepts']} conceitos, "
-              f"{num_searches} buscas recomendadas")
-
         # Step 2: Generate search queries
         search_queries = self._generate_search_queries(
             question,
@@ -386,26 +391,28 @@ class MultiSearchEngine:
             num_searches
         )
 
-        print(f"📝 Queries geradas:")
-        for i, query in enumerate(search_queries, 1):
-            print(f"   {i}. {query}")
+        logger.debug("Queries geradas", extra={
+            "complexity_level": analysis['complexity_level'],
+            "num_concepts": analysis['num_concepts'],
+            "queries": search_queries
+        })
 
         # Step 3: Execute searches
         all_sources = []
         search_results = []
 
         for i, query in enumerate(search_queries):
-            print(f"🔎 Busca {i+1}/{len(search_queries)}: {query[:50]}...")
-
             # Import here to avoid circular dependency
             from priority_retriever import prioritized_search
 
-            sources = prioritized_search(
-                self.vectorstore,
-                query,
-                k=k,
-                fetch_k=fetch_k
-            )
+            with timed(f"search_{i+1}"):
+                sources = prioritized_search(
+                    self.vectorstore,
+                    query,
+                    k=k,
+                    fetch_k=fetch_k,
+                    cache=self.retrieval_cache
+                )
 
             search_results.append({
                 'query': query,
@@ -430,8 +437,15 @@ class MultiSearchEngine:
             k=target_k
         )
 
-        print(f"✅ Total: {len(all_sources)} documentos, "
-              f"{len(unique_sources)} únicos")
+        logger.debug("Multi-search concluída", extra={
+            "num_searches": num_searches,
+            "total_documents": len(all_sources),
+            "unique_documents": len(unique_sources)
+        })
+
+        current_span().set_attribute("search.complexity_level", analysis['complexity_level'])
+        current_span().set_attribute("search.num_searches", num_searches)
+        current_span().set_attribute("search.unique_documents", len(unique_sources))
 
         # Step 5: Build metadata
         metadata = {
@@ -0,0 +1,233 @@
+"""
+Asynchronous Ollama client with pooled keep-alive connections.
+
+Talks to Ollama's /api/generate through its own httpx.AsyncClient, so
+generations don't block the event loop and can be aborted: when the
+consuming task is cancelled, the HTTP stream to Ollama is closed and Ollama
+stops generating. Errors are raised as ollama.ResponseError, like the
+official client does.
+
+Tracks started / completed / cancelled generations, tokens generated and an
+estimate of tokens saved by cancellation (average completed output length
+minus what had already been produced).
+
+Every request passes keep_alive so Ollama keeps the model in memory between
+questions; preload() loads a model (and runs a one-token warm-up) before
+the first real question arrives.
+"""
+
+import json
+import threading
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+from ollama import ResponseError
+
+from tracing import start_span
+
+
+class AsyncOllamaClient:
+    """
+    Shared async Ollama client (one connection pool per process)
+
+    Args:
+        transport: httpx transport to use instead of the network (tests)
+    """
+
+    def __init__(
+        self,
+        host: str = "http://localhost:11434",
+        timeout: float = 600,
+        max_connections: int = 10,
+        max_keepalive_connections: int = 5,
+        keepalive_expiry: float = 300,
+        keep_alive: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.host = host
+        self.keep_alive = keep_alive
+        self._http = httpx.AsyncClient(
+            base_url=host if "://" in host else f"http://{host}",
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            transport=transport
+        )
+        self._lock = threading.Lock()
+        self._stats = {
+            "generations_started": 0,
+            "generations_completed": 0,
+            "generations_cancelled": 0,
+            "generations_failed": 0,
+            "tokens_generated": 0,
+            "tokens_saved_estimate": 0,
+            "completed_output_tokens": 0
+        }
+
+    def _record(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self._stats[key] += value
+
+    def _avg_output_tokens(self) -> float:
+        with self._lock:
+            completed = self._stats["generations_completed"]
+            if not completed:
+                return 0.0
+            return self._stats["completed_output_tokens"] / completed
+
+    def _payload(self, model: str, prompt: str, stream: bool, options: Dict, system: Optional[str]) -> Dict:
+        payload = {"model": model, "prompt": prompt, "stream": stream, "options": options}
+        if system is not None:
+            payload["system"] = system
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    async def _post(self, payload: Dict) -> Dict:
+        response = await self._http.post("/api/generate", json=payload)
+        if response.is_error:
+            raise ResponseError(response.text, response.status_code)
+        return response.json()
+
+    async def _post_stream(self, payload: Dict) -> AsyncIterator[Dict]:
+        """NDJSON chunks of a streamed generation; closing the generator closes the HTTP stream"""
+        async with self._http.stream("POST", "/api/generate", json=payload) as response:
+            if response.is_error:
+                await response.aread()
+                raise ResponseError(response.text, response.status_code)
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise ResponseError(chunk["error"])
+                yield chunk
+
+    @staticmethod
+    def _options(temperature: float, num_ctx: int, num_predict: Optional[int]) -> Dict:
+        options = {"temperature": temperature, "num_ctx": num_ctx}
+        if num_predict:
+            options["num_predict"] = num_predict
+        return options
+
+    async def stream(
+        self,
+        model: str,
+        prompt: str,
+        temperature: float,
+        num_ctx: int,
+        num_predict: Optional[int] = None,
+        stats: Optional[Dict] = None,
+        system: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream response fragments. Cancelling the consumer (or closing the
+        generator) closes the HTTP stream, which aborts the generation.
+
+        If a dict is passed as stats, it's filled with Ollama's token counts
+        (prompt_tokens, output_tokens) and durations (prompt_eval_seconds,
+        eval_seconds) when the generation finishes.
+        prompt_tokens only counts tokens Ollama had to evaluate: a prefix
+        reused from its prompt cache isn't included.
+        """
+        self._record(generations_started=1)
+        # Not made current: an async generator can't safely set context variables
+        span = start_span("ollama.generate", **{"llm.model": model})
+        produced = 0
+        finished = False
+        try:
+            payload = self._payload(model, prompt, True, self._options(temperature, num_ctx, num_predict), system)
+            # aclosing() makes sure the HTTP stream is closed as soon as we stop
+            async with aclosing(self._post_stream(payload)) as chunks:
+                async for chunk in chunks:
+                    if chunk.get("response"):
+                        produced += 1
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        output_tokens = chunk.get("eval_count") or produced
+                        if stats is not None:
+                            stats["prompt_tokens"] = chunk.get("prompt_eval_count") or 0
+                            stats["output_tokens"] = output_tokens
+                            stats["prompt_eval_seconds"] = (chunk.get("prompt_eval_duration") or 0) / 1e9
+                            stats["eval_seconds"] = (chunk.get("eval_duration") or 0) / 1e9
+                        self._record(
+                            generations_completed=1,
+                            tokens_generated=output_tokens,
+                            completed_output_tokens=output_tokens
+                        )
+                        span.set_attribute("llm.prompt_tokens", chunk.get("prompt_eval_count") or 0)
+                        span.set_attribute("llm.output_tokens", output_tokens)
+                        finished = True
+        except Exception as e:
+            self._record(generations_failed=1, tokens_generated=produced)
+            span.record_error(e)
+            finished = True
+            raise
+        finally:
+            if not finished:
+                # Task cancelled or consumer closed the generator mid-answer
+                saved = max(0, int(self._avg_output_tokens()) - produced)
+                self._record(
+                    generations_cancelled=1,
+                    tokens_generated=produced,
+                    tokens_saved_estimate=saved
+                )
+                span.set_attribute("llm.cancelled", True)
+            span.end()
+
+    async def generate(
+        self,
+        model: str,
+        prompt: str,
+        temperature: float,
+        num_ctx: int,
+        num_predict: Optional[int] = None,
+        stats: Optional[Dict] = None,
+        system: Optional[str] = None
+    ) -> str:
+        """Generate a full response (streamed internally so it stays cancellable)"""
+        parts = []
+        async for fragment in self.stream(model, prompt, temperature, num_ctx, num_predict, stats, system):
+            parts.append(fragment)
+        return "".join(parts)
+
+    async def preload(self, model: str, num_ctx: int, warm_up_prompt: Optional[str] = None,
+                      system: Optional[str] = None) -> Dict:
+        """
+        Load a model into Ollama's memory (kept for keep_alive) and optionally
+        run a one-token generation to warm it up - with the system prompt, so
+        its prefix is already in the prompt cache. Not counted in the stats.
+
+        num_ctx must match what requests use: a different context size makes
+        Ollama reload the model.
+        """
+        started = time.time()
+        await self._post(self._payload(model, "", False, {"num_ctx": num_ctx}, None))
+        timings = {"load_seconds": round(time.time() - started, 3)}
+
+        if warm_up_prompt:
+            started = time.time()
+            options = {"num_ctx": num_ctx, "num_predict": 1}
+            await self._post(self._payload(model, warm_up_prompt, False, options, system))
+            timings["warmup_seconds"] = round(time.time() - started, 3)
+        return timings
+
+    async def close(self):
+        await self._http.aclose()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        completed = stats.pop("completed_output_tokens")
+        stats["avg_output_tokens"] = (
+            completed / stats["generations_completed"] if stats["generations_completed"] else 0.0
+        )
+        stats["host"] = self.host
+        stats["keep_alive"] = self.keep_alive
+        return stats
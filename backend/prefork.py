@@ -0,0 +1,127 @@
+"""
+Pre-fork multi-worker server.
+
+uvicorn's own --workers mode spawns fresh interpreters, so every worker
+imports torch and loads the embedding model again (N times the memory and
+the startup time). Here a supervisor process loads them once, opens the
+listening socket and then forks the workers: the model weights are shared
+copy-on-write, and the kernel spreads connections over the workers
+accepting on the same socket.
+
+Only what is safe to inherit is created before the fork: the preload
+hook must not start threads, open SQLite/HTTP connections or run
+inference (torch's OpenMP thread pool does not survive a fork). Each
+worker opens its own connections and threads in the app's startup event.
+
+The supervisor restarts workers that die (after calling on_worker_exit,
+which frees their shared admission slots) and forwards SIGTERM/SIGINT to
+all of them on shutdown; a second signal kills them.
+"""
+
+import os
+import signal
+import sys
+import time
+from typing import Callable, Dict, Optional
+
+import uvicorn
+
+
+class PreforkServer:
+    """
+    Args:
+        app: ASGI application served by every worker
+        host / port: Listening address (one socket shared by all workers)
+        workers: Number of worker processes
+        preload: Called in the supervisor with the number of workers, before forking
+        post_fork: Called in each worker with its index (0..workers-1)
+        on_worker_exit: Called in the supervisor with the index of a worker that exited
+        restart_delay: Seconds before a dead worker is replaced
+    """
+
+    def __init__(
+        self,
+        app,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: int = 2,
+        preload: Optional[Callable[[int], None]] = None,
+        post_fork: Optional[Callable[[int], None]] = None,
+        on_worker_exit: Optional[Callable[[int], None]] = None,
+        restart_delay: float = 1.0,
+        log_level: str = "info"
+    ):
+        self.config = uvicorn.Config(app, host=host, port=port, log_level=log_level)
+        self.workers = workers
+        self.preload = preload
+        self.post_fork = post_fork
+        self.on_worker_exit = on_worker_exit
+        self.restart_delay = restart_delay
+        self._children: Dict[int, int] = {}  # pid -> worker index
+        self._stopping = False
+        self._socket = None
+
+    def _spawn(self, index: int):
+        pid = os.fork()
+        if pid:
+            self._children[pid] = index
+            return
+
+        # Worker: uvicorn installs its own SIGINT/SIGTERM handlers
+        exit_code = 0
+        try:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, signal.SIG_DFL)
+            if self.post_fork is not None:
+                self.post_fork(index)
+            uvicorn.Server(self.config).run(sockets=[self._socket])
+        except BaseException as e:
+            print(f"❌ Worker {index} (pid {os.getpid()}) falhou: {e}", file=sys.stderr)
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+
+    def _handle_signal(self, signum, frame):
+        # First signal: graceful shutdown of every worker; second: kill them
+        forward = signal.SIGKILL if self._stopping else signal.SIGTERM
+        self._stopping = True
+        for pid in list(self._children):
+            try:
+                os.kill(pid, forward)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        if self.preload is not None:
+            self.preload(self.workers)
+        self._socket = self.config.bind_socket()
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+
+        print(f"👷 Supervisor (pid {os.getpid()}) iniciando {self.workers} workers em "
+              f"http://{self.config.host}:{self.config.port}")
+        for index in range(self.workers):
+            self._spawn(index)
+
+        while self._children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index = self._children.pop(pid, None)
+            if index is None:
+                continue
+            if self.on_worker_exit is not None:
+                self.on_worker_exit(index)
+            if self._stopping:
+                continue
+            print(f"⚠️  Worker {index} (pid {pid}) saiu com código {os.waitstatus_to_exitcode(status)}; "
+                  f"recriando em {self.restart_delay:g}s")
+            time.sleep(self.restart_delay)
+            if not self._stopping:
+                self._spawn(index)
+
+        self._socket.close()
+        print("👋 Supervisor encerrado")
@@ -1,6 +1,12 @@
+import logging
 from langchain.schema import Document
-from typing import List, Tuple
+from typing import List, Tuple, Dict, Optional
 from config import get_book_priority
+from timing import timed
+from tracing import current_span, traced
+from structured_log import get_logger
+
+logger = get_logger("priority_retriever")
 
 def remove_duplicate_chunks(documents: List[Document], similarity_threshold: float = 0.85) -> List[Document]:
     """
@@ -61,6 +67,10 @@ def remove_duplicate_chunks(documents: List[Document], similarity_threshold: flo
 #     return unique_docs
 
 def rerank_by_priority(documents: List[Document], top_k: int = 8) -> List[Document]:
+    with timed("dedup_rerank"):
+        return _rerank_by_priority(documents, top_k)
+
+def _rerank_by_priority(documents: List[Document], top_k: int = 8) -> List[Document]:
     """
     Rerank documents giving priority to fundamental spiritist works.
     
@@ -96,32 +106,60 @@ def rerank_by_priority(documents: List[Document], top_k: int = 8) -> List[Docume
     # Sort by total score (descending)
     scored_docs.sort(reverse=True, key=lambda x: x[0])
     
-    # Debug info
-    print("\n📚 RERANKING DOS DOCUMENTOS (após deduplicação):")
-    for score, doc, source in scored_docs[:top_k]:
-        book_name = source.split('/')[-1] if '/' in source else source.split('\\')[-1]
-        priority = get_book_priority(source)
-        page = doc.metadata.get('page', 'N/A')
-        print(f"  Score: {score:3.0f} | Prioridade: {priority:3d} | Pág: {page} | {book_name[:40]}")
-    print()
+    # Debug info (sampled; the list is only built when it will be written)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Reranking dos documentos", extra={"ranking": [
+            {
+                "score": score,
+                "priority": get_book_priority(source),
+                "page": doc.metadata.get('page'),
+                "book": source.replace('\\', '/').split('/')[-1]
+            }
+            for score, doc, source in scored_docs[:top_k]
+        ]})
     
     # Return top K documents after reranking
     return [doc for _, doc, _ in scored_docs[:top_k]]
 
-def prioritized_search(vectorstore, question: str, k: int = 8, fetch_k: int = 20) -> List[Document]:
+@traced("priority_retriever.prioritized_search")
+def prioritized_search(vectorstore, question: str, k: int = 8, fetch_k: int = 20,
+                       filters: Optional[Dict] = None, cache=None) -> List[Document]:
     """
     Search with priority-based reranking and deduplication.
     
-    1. Fetch more documents than needed (fetch_k)
-    2. Remove duplicates
-    3. Rerank them by book priority
-    4. Return top k
+    1. Return cached ranking if available (cache = RetrievalCache)
+    2. Fetch more documents than needed (fetch_k)
+    3. Remove duplicates
+    4. Rerank them by book priority
+    5. Return top k
     """
     
+    span = current_span()
+    span.set_attribute("search.k", k)
+    span.set_attribute("search.fetch_k", fetch_k)
+    
+    if cache is not None:
+        cached_docs = cache.get(question, k, fetch_k, filters)
+        span.set_attribute("cache.hit", cached_docs is not None)
+        if cached_docs is not None:
+            return cached_docs
+    
     # Fetch more documents initially for filtering
-    initial_docs = vectorstore.similarity_search(question, k=fetch_k)
+    # (embedding and vector search timed separately when possible)
+    embedding_function = getattr(vectorstore, "embeddings", None)
+    if embedding_function is not None:
+        with timed("embedding"):
+            query_vector = embedding_function.embed_query(question)
+        with timed("vector_search"):
+            initial_docs = vectorstore.similarity_search_by_vector(query_vector, k=fetch_k, filter=filters)
+    else:
+        with timed("vector_search"):
+            initial_docs = vectorstore.similarity_search(question, k=fetch_k, filter=filters)
     
     # Rerank by priority (includes deduplication)
     prioritized_docs = rerank_by_priority(initial_docs, top_k=k)
     
+    if cache is not None:
+        cache.put(question, k, fetch_k, prioritized_docs, filters)
+    
     return prioritized_docs
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+Opt-in per-request profiling (cProfile).
+
+An admin request with the header `X-Profile: 1` gets a ProfileSession in a
+context variable. The synchronous hot sections of the pipeline (question
+validation, retrieval with reranking, prompt building, answer-cache
+embedding) run under `with profiled():`, which enables a cProfile.Profile
+for that block in whatever thread it runs in (event loop or threadpool
+worker). Awaits are never profiled, so other requests interleaved on the
+event loop don't leak into the profile. When the request finishes the
+blocks are merged into one pstats report and kept in a bounded ring
+(ProfileStore), listed on the admin endpoints.
+"""
+
+import contextvars
+import cProfile
+import functools
+import io
+import itertools
+import marshal
+import pstats
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+_current_session: contextvars.ContextVar = contextvars.ContextVar("profile_session", default=None)
+_thread_state = threading.local()  # a thread runs at most one profiler at a time
+_ids = itertools.count(1)
+
+
+class ProfileSession:
+    """cProfile blocks of one request, merged when the request finishes"""
+
+    def __init__(self, profile_id: str, label: str):
+        self.profile_id = profile_id
+        self.label = label
+        self.started = time.perf_counter()
+        self.created_at = datetime.now().isoformat()
+        self.blocks: List[Dict] = []
+        self._lock = threading.Lock()
+        self.finished = False
+
+    def add(self, name: str, profile: cProfile.Profile, seconds: float):
+        with self._lock:
+            if not self.finished:
+                self.blocks.append({"name": name, "profile": profile, "seconds": seconds})
+
+    def finish(self) -> Optional[Dict]:
+        """Merge the blocks into a stored profile (None when nothing was profiled)"""
+        with self._lock:
+            self.finished = True
+            blocks = list(self.blocks)
+        if not blocks:
+            return None
+
+        stats = pstats.Stats(blocks[0]["profile"])
+        for block in blocks[1:]:
+            stats.add(block["profile"])
+
+        sections: Dict[str, float] = {}
+        for block in blocks:
+            sections[block["name"]] = sections.get(block["name"], 0.0) + block["seconds"]
+
+        return {
+            "profile_id": self.profile_id,
+            "label": self.label,
+            "created_at": self.created_at,
+            "request_seconds": round(time.perf_counter() - self.started, 4),
+            "profiled_seconds": round(sum(sections.values()), 4),
+            "sections": {name: round(seconds, 4) for name, seconds in sections.items()},
+            "stats": stats
+        }
+
+
+@contextmanager
+def profiled(name: str):
+    """Profile a synchronous block when the current request asked for it"""
+    session = _current_session.get()
+    if session is None or getattr(_thread_state, "active", False):
+        yield
+        return
+
+    profile = cProfile.Profile()
+    _thread_state.active = True
+    started = time.perf_counter()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        _thread_state.active = False
+        session.add(name, profile, time.perf_counter() - started)
+
+
+def profiled_function(name: str):
+    """Decorator form of profiled()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profiled(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_session(label: str) -> ProfileSession:
+    """Profile the rest of this request (and tasks/threads it starts)"""
+    session = ProfileSession(f"prof_{next(_ids)}", label)
+    _current_session.set(session)
+    return session
+
+
+def format_stats(stats: pstats.Stats, sort: str = "cumulative", limit: int = 40) -> str:
+    """pstats text report (on a copy: sorting mutates the Stats object)"""
+    output = io.StringIO()
+    report = pstats.Stats(stream=output)
+    report.add(stats)
+    report.sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+def top_functions(stats: pstats.Stats, limit: int = 10) -> List[Dict]:
+    """Functions with the most own time (where the CPU actually went)"""
+    rows = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({
+            "function": f"{function} ({filename.rsplit('/', 1)[-1]}:{line})",
+            "calls": calls,
+            "own_seconds": round(own, 4),
+            "cumulative_seconds": round(cumulative, 4)
+        })
+    rows.sort(key=lambda row: row["own_seconds"], reverse=True)
+    return rows[:limit]
+
+
+class ProfileStore:
+    """The last `max_profiles` request profiles"""
+
+    def __init__(self, max_profiles: int = 20):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: Dict):
+        with self._lock:
+            self._profiles[profile["profile_id"]] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def summary(self, profile: Dict) -> Dict:
+        return {key: value for key, value in profile.items() if key != "stats"} | {
+            "top_functions": top_functions(profile["stats"], 5)
+        }
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [self.summary(profile) for profile in reversed(profiles)]
+
+    def dump(self, profile_id: str) -> Optional[bytes]:
+        """pstats file contents (open with snakeviz / python -m pstats)"""
+        profile = self.get(profile_id)
+        if profile is None:
+            return None
+        return marshal.dumps(profile["stats"].stats)
@@ -0,0 +1,102 @@
+"""
+Readiness tracking, reported separately from liveness.
+
+/health answers as soon as the process is up (liveness). /ready only
+returns 200 once every startup component - vectorstore, embeddings,
+preloaded Ollama models, warm-up - is hot, so a load balancer doesn't send
+the first questions to a cold backend.
+
+Components move pending -> loading -> ready | failed. Optional components
+that fail (e.g. a model that isn't pulled) are reported but don't block
+readiness; required ones do.
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+
+class ReadinessTracker:
+    """Thread-safe state of the startup components"""
+
+    PENDING = "pending"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._components: Dict[str, Dict] = {}
+
+    def register(self, name: str, required: bool = True):
+        with self._lock:
+            self._components[name] = self._new_component(required)
+
+    def _new_component(self, required: bool) -> Dict:
+        return {"state": self.PENDING, "required": required, "started_at": None, "seconds": None, "detail": None}
+
+    def _component(self, name: str) -> Dict:
+        if name not in self._components:
+            self._components[name] = self._new_component(True)
+        return self._components[name]
+
+    def start(self, name: str):
+        with self._lock:
+            component = self._component(name)
+            component["state"] = self.LOADING
+            component["started_at"] = time.time()
+
+    def _finish(self, name: str, state: str, detail: Optional[str]):
+        with self._lock:
+            component = self._component(name)
+            component["state"] = state
+            component["detail"] = detail
+            if component["started_at"] is not None:
+                component["seconds"] = round(time.time() - component["started_at"], 3)
+
+    def ready(self, name: str, detail: Optional[str] = None):
+        self._finish(name, self.READY, detail)
+
+    def fail(self, name: str, error: str):
+        self._finish(name, self.FAILED, error)
+
+    def elapsed(self, name: str) -> float:
+        """Seconds the component took to load (or has been loading)"""
+        with self._lock:
+            component = self._component(name)
+            if component["seconds"] is not None:
+                return component["seconds"]
+            if component["started_at"] is not None:
+                return time.time() - component["started_at"]
+            return 0.0
+
+    def has_failed(self) -> bool:
+        """Whether a required component failed (it will never become ready)"""
+        with self._lock:
+            return any(
+                c["state"] == self.FAILED and c["required"] for c in self._components.values()
+            )
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            for component in self._components.values():
+                if component["state"] == self.READY:
+                    continue
+                if component["state"] == self.FAILED and not component["required"]:
+                    continue
+                return False
+            return True
+
+    def to_dict(self) -> Dict:
+        ready = self.is_ready()
+        with self._lock:
+            components = {
+                name: {key: value for key, value in component.items() if key != "started_at"}
+                for name, component in self._components.items()
+            }
+        finished = sum(1 for c in components.values() if c["state"] in (self.READY, self.FAILED))
+        return {
+            "ready": ready,
+            "progress": round(finished / len(components), 2) if components else 1.0,
+            "components": components
+        }
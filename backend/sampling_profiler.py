@@ -0,0 +1,156 @@
+"""
+Continuous low-overhead sampling profiler.
+
+A daemon thread wakes up `hz` times per second, reads every thread's
+current Python stack with sys._current_frames() (event loop, threadpool
+workers, span exporter, ...) and counts it as a folded stack:
+
+    MainThread;base_events.py:run_forever;...;priority_retriever.py:_rerank_by_priority 12
+
+Counts are kept in time buckets (bucket_seconds each, retention_seconds in
+total), so a flamegraph can be built for "the last N seconds". The output
+is the folded format read by flamegraph.pl, speedscope and inferno.
+
+Cost per sample is one dict walk per thread (no tracing hooks, nothing
+runs in the profiled threads); the sampler measures its own CPU time and
+reports it as overhead_percent.
+"""
+
+import re
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Leaf frames of threads that are only waiting (dropped unless include_idle)
+IDLE_LEAVES = {
+    "selectors.py:select",
+    "threading.py:wait",
+    "queue.py:get",
+    "thread.py:_worker",
+    "_base.py:wait",
+}
+
+
+def _thread_group(name: str) -> str:
+    """ThreadPoolExecutor-0_3 -> ThreadPoolExecutor (one root per pool)"""
+    return re.sub(r"(?:[-_]\d+)+$", "", name) or name
+
+
+class SamplingProfiler:
+    """
+    Args:
+        hz: Samples per second
+        bucket_seconds: Time resolution of the stored counts
+        retention_seconds: How far back flamegraphs can go
+        max_depth: Frames kept per stack (innermost ones)
+    """
+
+    def __init__(self, hz: float = 10, bucket_seconds: int = 10, retention_seconds: int = 900, max_depth: int = 64):
+        self.hz = hz
+        self.bucket_seconds = bucket_seconds
+        self.retention_seconds = retention_seconds
+        self.max_depth = max_depth
+        self._buckets: "OrderedDict[int, Counter]" = OrderedDict()
+        self._labels: Dict = {}  # code object -> "file.py:function"
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._samples = 0
+        self._sampler_cpu = 0.0
+        self._started_at = None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename.replace("\\", "/").rsplit("/", 1)[-1]
+            label = self._labels[code] = f"{filename}:{code.co_name}"
+        return label
+
+    def sample(self):
+        """Record the current stack of every thread (except the sampler)"""
+        own = threading.get_ident()
+        names = {thread.ident: _thread_group(thread.name) for thread in threading.enumerate()}
+        stacks: List[Tuple[str, ...]] = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            labels = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(self._label(frame.f_code))
+                frame = frame.f_back
+            labels.append(names.get(ident, "thread"))
+            stacks.append(tuple(reversed(labels)))
+
+        bucket = int(time.time() // self.bucket_seconds)
+        with self._lock:
+            counts = self._buckets.get(bucket)
+            if counts is None:
+                counts = self._buckets[bucket] = Counter()
+                oldest = bucket - self.retention_seconds // self.bucket_seconds
+                while self._buckets and next(iter(self._buckets)) < oldest:
+                    self._buckets.popitem(last=False)
+            counts.update(stacks)
+            self._samples += 1
+
+    def _run(self):
+        interval = 1.0 / self.hz
+        next_sample = time.monotonic()
+        while not self._stop.is_set():
+            started = time.thread_time()
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"⚠️  Falha na amostragem do profiler: {e}")
+            self._sampler_cpu += time.thread_time() - started
+            next_sample += interval
+            # Don't try to catch up after a stall (e.g. laptop sleep)
+            next_sample = max(next_sample, time.monotonic())
+            self._stop.wait(next_sample - time.monotonic())
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def folded(self, seconds: float = 60, include_idle: bool = False, thread: Optional[str] = None) -> str:
+        """Folded stacks of the last `seconds` (one "frame;frame;... count" per line)"""
+        first_bucket = int((time.time() - seconds) // self.bucket_seconds)
+        total: Counter = Counter()
+        with self._lock:
+            for bucket, counts in self._buckets.items():
+                if bucket >= first_bucket:
+                    total.update(counts)
+
+        lines = []
+        for stack, count in total.most_common():
+            if not include_idle and stack[-1] in IDLE_LEAVES:
+                continue
+            if thread and stack[0] != thread:
+                continue
+            lines.append(f"{';'.join(stack)} {count}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def get_stats(self) -> Dict:
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        with self._lock:
+            buckets = len(self._buckets)
+            distinct = sum(len(counts) for counts in self._buckets.values())
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "hz": self.hz,
+            "samples": self._samples,
+            "bucket_seconds": self.bucket_seconds,
+            "retention_seconds": self.retention_seconds,
+            "buckets": buckets,
+            "distinct_stacks": distinct,
+            "overhead_percent": round(100 * self._sampler_cpu / elapsed, 3) if elapsed else 0.0
+        }
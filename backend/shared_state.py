@@ -0,0 +1,102 @@
+"""
+State shared by the workers of a multi-worker deployment (see prefork.py).
+
+- SharedSlots: generation slots per model in shared memory, allocated by
+  the supervisor before forking. Each worker keeps its own fair queue
+  (admission.py) but takes a global slot before admitting a ticket, so
+  the per-model limits hold for the whole deployment. Counts are kept per
+  worker, so the supervisor can free the slots of a worker that died.
+- SharedCacheStore: second level for the per-worker retrieval and answer
+  caches, in the SQLite database every worker already uses. Reads are one
+  indexed query on a local miss; writes go through a BatchWriter.
+"""
+
+import multiprocessing
+import time
+import zlib
+from typing import Any, Dict, List
+
+import database
+from batch_writer import BatchWriter
+
+
+class SharedSlots:
+    """
+    Per-model generation slots across forked workers.
+
+    Models are hashed into `buckets` counters (models sharing a bucket
+    share their counts, which can only make the limit stricter).
+    """
+
+    def __init__(self, workers: int, buckets: int = 64):
+        context = multiprocessing.get_context("fork")
+        self.workers = workers
+        self.buckets = buckets
+        self.worker = 0  # set in each child after the fork
+        self._lock = context.Lock()
+        self._counts = context.RawArray("i", workers * buckets)
+
+    def _bucket(self, model: str) -> int:
+        return zlib.crc32(model.encode("utf-8")) % self.buckets
+
+    def _total(self, bucket: int) -> int:
+        return sum(self._counts[w * self.buckets + bucket] for w in range(self.workers))
+
+    def try_acquire(self, model: str, limit: int) -> bool:
+        """Take a slot for this worker if fewer than `limit` are in use overall"""
+        bucket = self._bucket(model)
+        with self._lock:
+            if self._total(bucket) >= limit:
+                return False
+            self._counts[self.worker * self.buckets + bucket] += 1
+            return True
+
+    def release(self, model: str):
+        index = self.worker * self.buckets + self._bucket(model)
+        with self._lock:
+            self._counts[index] = max(0, self._counts[index] - 1)
+
+    def active(self, model: str) -> int:
+        with self._lock:
+            return self._total(self._bucket(model))
+
+    def clear_worker(self, worker: int):
+        """Free every slot held by a worker (called by the supervisor when it exits)"""
+        with self._lock:
+            for bucket in range(self.buckets):
+                self._counts[worker * self.buckets + bucket] = 0
+
+
+class SharedCacheStore:
+    """
+    SQLite second level for RetrievalCache / SemanticAnswerCache.
+
+    Values must be JSON-serializable; several values may share a key
+    (answer cache buckets), get() returns the live ones, newest first.
+    """
+
+    def __init__(self, writer: BatchWriter, max_values_per_key: int = 20):
+        self.writer = writer
+        self.max_values_per_key = max_values_per_key
+        self._stats = {"hits": 0, "misses": 0, "errors": 0, "writes": 0}
+
+    def get(self, namespace: str, key: str) -> List[Any]:
+        try:
+            values = database.get_shared_cache(namespace, key, self.max_values_per_key)
+        except Exception:
+            self._stats["errors"] += 1
+            return []
+        self._stats["hits" if values else "misses"] += 1
+        return values
+
+    def put(self, namespace: str, key: str, value: Any, ttl_seconds: float):
+        if self.writer.submit({
+            "namespace": namespace,
+            "cache_key": key,
+            "value": value,
+            "expires_at": time.time() + ttl_seconds
+        }):
+            self._stats["writes"] += 1
+
+    def get_stats(self) -> Dict:
+        return {**self._stats, "writer": self.writer.get_stats()}
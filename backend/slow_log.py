@@ -0,0 +1,115 @@
+"""
+Slow request log.
+
+A question whose total time (RequestTimer) exceeds the threshold is kept
+with everything needed to explain it: model, top_k/fetch_k, complexity
+level, number of searches and the generated queries, the chunk IDs that
+were retrieved, token counts and the per-stage timings. The question text
+itself is not stored, only a hash (identical questions share it).
+
+Entries go to the slow_requests table (queried by the admin endpoint) and
+to a size-rotated JSONL file that can be shipped or grepped offline.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import database
+from cache import get_chunk_id
+from structured_log import get_logger
+from tracing import append_line
+
+logger = get_logger("slow_log")
+
+
+def question_hash(question: str) -> str:
+    return hashlib.sha256(question.strip().lower().encode("utf-8")).hexdigest()[:16]
+
+
+def build_entry(
+    endpoint: str,
+    question: str,
+    model: str,
+    top_k: int,
+    fetch_k: int,
+    timing: Dict,
+    sources: List = (),
+    search_metadata: Optional[Dict] = None,
+    route: Optional[Dict] = None,
+    cached: bool = False,
+    degradation_level: int = 0,
+    task_id: Optional[str] = None,
+    trace_id: Optional[str] = None
+) -> Dict:
+    """Slow-log entry of one answered question"""
+    search_metadata = search_metadata or {}
+    analysis = search_metadata.get("complexity_analysis") or {}
+    complexity_level = analysis.get("complexity_level")
+    if complexity_level is None and route:
+        complexity_level = route.get("complexity_level")
+
+    return {
+        "created_at": datetime.now().isoformat(),
+        "endpoint": endpoint,
+        "task_id": task_id,
+        "trace_id": trace_id,
+        "question_hash": question_hash(question),
+        "model": model,
+        "total_seconds": timing.get("total", 0.0),
+        "top_k": top_k,
+        "fetch_k": fetch_k,
+        "complexity_level": complexity_level,
+        "num_searches": search_metadata.get("num_searches", 1 if sources else 0),
+        "followup_reuse": bool(search_metadata.get("followup_reuse")),
+        "search_queries": search_metadata.get("search_queries", []),
+        "chunk_ids": [get_chunk_id(doc) for doc in sources],
+        "prompt_tokens": timing.get("prompt_tokens"),
+        "output_tokens": timing.get("output_tokens"),
+        "tokens_per_second": timing.get("tokens_per_second"),
+        "cached": cached,
+        "degradation_level": degradation_level,
+        "stages": timing.get("stages", {})
+    }
+
+
+class SlowRequestLog:
+    """
+    Args:
+        threshold_seconds: Minimum total time to be logged
+        path: JSONL file (None = SQLite only)
+        max_bytes / backup_count: Rotation of the JSONL file
+    """
+
+    def __init__(self, threshold_seconds: float, path: Optional[str] = None,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 3):
+        self.threshold_seconds = threshold_seconds
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._lock = threading.Lock()  # one writer of the JSONL file at a time
+        self._stats = {"logged": 0, "errors": 0}
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def is_slow(self, timing: Dict) -> bool:
+        return timing.get("total", 0.0) >= self.threshold_seconds
+
+    def record(self, entry: Dict):
+        """Write one entry (blocking: call from a worker thread)"""
+        try:
+            database.save_slow_request(entry)
+            if self.path:
+                line = json.dumps(entry, ensure_ascii=False)
+                with self._lock:
+                    append_line(self.path, line, self.max_bytes, self.backup_count)
+            self._stats["logged"] += 1
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning("Falha ao gravar requisição lenta", extra={"error": str(e)})
+
+    def get_stats(self) -> Dict:
+        return {"threshold_seconds": self.threshold_seconds, "path": self.path, **self._stats}
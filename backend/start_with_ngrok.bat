@@ -5,7 +5,7 @@ echo ========================================
 echo.
 
 echo [1/2] Iniciando API...
-start "API Backend" cmd /k "cd /d %~dp0 && start_backend.bat"
+start "API Backend" cmd /k "cd /d %~dp0 && set ADMISSION_TRUST_PROXY_HEADERS=true&& start_backend.bat"
 
 timeout /t 10 /nobreak
 
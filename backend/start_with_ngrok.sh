@@ -33,7 +33,8 @@ ngrok config add-authtoken "$NGROK_AUTHTOKEN"
 # Start backend in background
 echo "[2/3] Iniciando API..."
 source venv/bin/activate
-python api_server.py &
+# ngrok connects from localhost: take the client IP from X-Forwarded-For
+ADMISSION_TRUST_PROXY_HEADERS=true python api_server.py &
 API_PID=$!
 
 echo "Aguardando backend iniciar..."
@@ -0,0 +1,182 @@
+"""
+Structured, non-blocking logging.
+
+Request-path code logs through the standard `logging` module:
+
+    logger = get_logger("multi_search")
+    logger.info("Multi-search concluída", extra={"num_searches": 3, "unique_documents": 9})
+
+A QueueHandler on the "chatbot" logger only enqueues the record (it never
+blocks: when the bounded queue is full the record is dropped and counted);
+a QueueListener thread formats each record as one JSON line and writes it
+to stdout and/or a size-rotated file.
+
+Every record carries the request ID (the trace ID of tracing.py, i.e. the
+X-Request-ID header) when logged inside a traced request, plus the `extra`
+fields.
+DEBUG records are sampled per request (LOG_DEBUG_SAMPLE_RATE), so the
+verbose output of a sampled request is complete and the others are
+dropped before they reach the queue.
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from tracing import current_trace_id
+
+ROOT_LOGGER = "chatbot"
+
+# Attributes every LogRecord has; anything else came from `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the "chatbot" hierarchy (chatbot.multi_search, ...)"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, request_id, extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text  # rendered before queueing
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Adds the request ID and samples DEBUG records. Runs in the calling
+    thread (before the record is queued), where the request's context
+    variables are visible.
+    """
+
+    def __init__(self, debug_sample_rate: float = 1.0):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+        self.sampled_out = 0
+
+    def _sampled(self, request_id: Optional[str]) -> bool:
+        if self.debug_sample_rate >= 1:
+            return True
+        if request_id:
+            # Same decision for every record of a request (trace IDs are random hex)
+            return int(request_id[:8], 16) / 0xFFFFFFFF < self.debug_sample_rate
+        return random.random() < self.debug_sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_trace_id()
+        if record.levelno <= logging.DEBUG and not self._sampled(record.request_id):
+            self.sampled_out += 1
+            return False
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking on a full queue"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens in the writer thread; only resolve the message
+        # and traceback here, since args/exc_info may not survive the queue
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure(
+    level: str = "INFO",
+    path: Optional[str] = None,
+    console: bool = True,
+    debug_sample_rate: float = 1.0,
+    queue_size: int = 10000,
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5
+):
+    """Install the queue handler on the "chatbot" logger and start the writer thread"""
+    global _listener, _queue_handler
+    shutdown()
+
+    formatter = JsonFormatter()
+    handlers: List[logging.Handler] = []
+    if console:
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(formatter)
+        handlers.append(stream)
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        rotating = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        rotating.setFormatter(formatter)
+        handlers.append(rotating)
+
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+    _queue_handler.addFilter(RequestContextFilter(debug_sample_rate))
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(level.upper())
+    logger.propagate = False
+    logger.addHandler(_queue_handler)
+
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown():
+    """Flush the queued records and stop the writer thread"""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger(ROOT_LOGGER).removeHandler(_queue_handler)
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    _listener = None
+
+
+def get_stats() -> Dict:
+    if _queue_handler is None:
+        return {"configured": False}
+    context_filter = _queue_handler.filters[0]
+    return {
+        "configured": _listener is not None,
+        "level": logging.getLevelName(logging.getLogger(ROOT_LOGGER).level),
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "debug_sample_rate": context_filter.debug_sample_rate,
+        "debug_sampled_out": context_filter.sampled_out
+    }
@@ -0,0 +1,156 @@
+"""
+Test script for admission control
+
+Tests per-model concurrency limits, queueing with position updates,
+rejection when the queue is full, release/cancellation bookkeeping and
+weighted fair scheduling between clients.
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+from admission import AdmissionController, QueueFullError, Histogram
+
+
+def test_histogram_cumulative_buckets():
+    hist = Histogram([1, 5])
+    for value in [0.5, 2, 3, 10]:
+        hist.observe(value)
+    data = hist.to_dict()
+    assert [b["count"] for b in data["buckets"]] == [1, 3, 4]
+    assert data["count"] == 4 and data["sum"] == 15.5
+
+
+def test_limit_queue_and_reject():
+    async def scenario():
+        controller = AdmissionController(default_limit=1, max_queue=1, initial_service_time=10)
+        first = controller.enqueue("qwen2.5:7b")
+        second = controller.enqueue("qwen2.5:7b")
+        assert controller.position(first) == 0
+        assert controller.position(second) == 1
+
+        try:
+            controller.enqueue("qwen2.5:7b")
+            assert False, "expected QueueFullError"
+        except QueueFullError as e:
+            assert e.retry_after >= 10
+
+        # Other models have their own slots
+        other = controller.enqueue("llama3.2:3b")
+        assert controller.position(other) == 0
+
+        positions = []
+
+        async def waiter():
+            async for position, eta in controller.wait(second):
+                positions.append((position, eta))
+
+        task = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        controller.release(first)
+        await asyncio.wait_for(task, 1)
+        return controller, positions
+
+    controller, positions = asyncio.run(scenario())
+    assert positions == [(1, 10.0)]
+    stats = controller.get_stats()
+    assert stats["rejected"] == 1
+    assert stats["models"]["qwen2.5:7b"]["active"] == 1
+    assert stats["wait_time_histogram"]["count"] == 3
+
+
+def test_release_queued_ticket_and_idempotence():
+    async def scenario():
+        controller = AdmissionController(default_limit=1, max_queue=5)
+        first = controller.enqueue("m")
+        second = controller.enqueue("m")
+        third = controller.enqueue("m")
+        controller.release(second)  # cancelled while queued
+        assert controller.position(third) == 1
+        controller.release(first)
+        controller.release(first)
+        return controller, third
+
+    controller, third = asyncio.run(scenario())
+    assert controller.position(third) == 0
+    assert controller.get_stats()["models"]["m"]["active"] == 1
+
+
+def drain(controller, tickets):
+    """Release admitted tickets one by one, returning the service order"""
+    order = []
+    pending = list(tickets)
+    while pending:
+        running = [t for t in pending if t.admitted_at is not None]
+        ticket = min(running, key=lambda t: t.admitted_at)
+        order.append(ticket.client_id)
+        pending.remove(ticket)
+        controller.release(ticket)
+    return order
+
+
+def test_fair_queuing_between_clients():
+    async def scenario():
+        controller = AdmissionController(default_limit=1, max_queue=20)
+        heavy = [controller.enqueue("m", "ip:heavy") for _ in range(4)]
+        light = controller.enqueue("m", "ip:light")
+        # The late light client jumps ahead of the heavy client's backlog
+        assert controller.position(light) == 1
+        return drain(controller, heavy + [light])
+
+    order = asyncio.run(scenario())
+    assert order == ["ip:heavy", "ip:light", "ip:heavy", "ip:heavy", "ip:heavy"]
+
+
+def test_weights_and_client_caps():
+    async def scenario():
+        controller = AdmissionController(
+            default_limit=1, max_queue=20, max_inflight_per_client=1, max_queued_per_client=3
+        )
+        first = controller.enqueue("m", "ip:anon", weight=1.0)
+
+        # In-flight cap spans models: the anonymous client can't take the other model's slot
+        other = controller.enqueue("other", "ip:anon")
+        assert controller.position(other) == 1
+        controller.release(other)
+
+        anon = [controller.enqueue("m", "ip:anon", weight=1.0) for _ in range(3)]
+        user = [controller.enqueue("m", "user:1", weight=2.0) for _ in range(3)]
+
+        try:
+            controller.enqueue("m", "ip:anon")
+            assert False, "expected QueueFullError"
+        except QueueFullError:
+            pass
+
+        order = drain(controller, [first] + anon + user)
+        return order, controller.get_stats()
+
+    order, stats = asyncio.run(scenario())
+    # Weight 2: the user's tags advance half as fast, so its backlog is served first
+    assert order == ["ip:anon", "user:1", "user:1", "user:1", "ip:anon", "ip:anon", "ip:anon"]
+    assert stats["rejected_client_quota"] == 1
+    assert stats["clients"]["active"] == 0
+
+
+if __name__ == "__main__":
+    tests = [
+        test_histogram_cumulative_buckets,
+        test_limit_queue_and_reject,
+        test_release_queued_ticket_and_idempotence,
+        test_fair_queuing_between_clients,
+        test_weights_and_client_caps,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
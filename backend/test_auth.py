@@ -0,0 +1,76 @@
+"""
+Test script for admin access
+
+Tests that the diagnostic endpoints' admin check fails closed: with no
+ADMIN_EMAILS configured nobody is an admin, and otherwise only the
+listed emails are (case-insensitive).
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import auth
+import database
+
+
+def make_request(token=None):
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({"type": "http", "method": "GET", "path": "/admin/memory", "headers": headers})
+
+
+def status_of(request) -> int:
+    try:
+        auth.require_admin(request)
+        return 200
+    except HTTPException as e:
+        return e.status_code
+
+
+def test_no_admin_emails_means_no_admin():
+    original = auth.ADMIN_EMAILS
+    auth.ADMIN_EMAILS = []
+    try:
+        assert not auth.is_admin({"email": "qualquer@exemplo.com"})
+        assert not auth.is_admin(None)
+    finally:
+        auth.ADMIN_EMAILS = original
+
+
+def test_only_listed_emails_are_admins():
+    original = auth.ADMIN_EMAILS
+    auth.ADMIN_EMAILS = ["admin@exemplo.com"]
+    with tempfile.TemporaryDirectory() as tmp:
+        database.SQLITE_DB_PATH = os.path.join(tmp, "test.db")
+        database.init_db()
+        try:
+            _, admin = auth.register_user("Admin@Exemplo.com", "123456", "Admin")
+            _, user = auth.register_user("user@exemplo.com", "123456", "User")
+            assert status_of(make_request()) == 401
+            assert status_of(make_request(user["token"])) == 403
+            assert status_of(make_request(admin["token"])) == 200
+        finally:
+            auth.ADMIN_EMAILS = original
+
+
+if __name__ == "__main__":
+    tests = [
+        test_no_admin_emails_means_no_admin,
+        test_only_listed_emails_are_admins,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,124 @@
+"""
+Test script for batched task records
+
+Tests that the writer groups records into few write calls and never
+blocks on a full queue, and that task records round-trip through the
+SQLite requests table (upsert on completion, lookup, history, analytics)
+without the question text, old records are purged and tasks left
+processing by a previous run are failed at startup.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+import database
+from batch_writer import BatchWriter
+
+
+def test_batches_and_drops():
+    batches = []
+    entered = threading.Event()
+    release = threading.Event()
+
+    def write_batch(records):
+        entered.set()
+        release.wait(2)
+        batches.append(list(records))
+
+    writer = BatchWriter(write_batch, batch_size=50, flush_interval=0.05, max_queue=200)
+    for i in range(120):
+        assert writer.submit(i)
+    writer.start()
+    release.set()
+    assert writer.flush(2)
+    assert [len(batch) for batch in batches] == [50, 50, 20]
+    assert sum(batches, []) == list(range(120))
+
+    # Writer stuck inside a write: the queue fills up and submit() returns at once
+    entered.clear()
+    release.clear()
+    writer.submit("lento")
+    assert entered.wait(2)
+    accepted = [writer.submit(i) for i in range(250)]
+    assert accepted.count(True) == 200 and accepted.count(False) == 50
+    release.set()
+    writer.shutdown()
+    stats = writer.get_stats()
+    assert stats["written"] == 321 and stats["dropped"] == 50 and not stats["running"]
+
+
+def test_requests_table_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.SQLITE_DB_PATH = os.path.join(tmp, "test.db")
+        database.init_db()
+
+        started = {
+            "task_id": "task_a", "question": "O que é perispírito?", "question_hash": "5f1e2d", "mode": "streaming",
+            "status": "processing", "started_at": datetime.now().isoformat(), "stage": "initialized", "progress": 0
+        }
+        database.save_requests([started, dict(started, task_id="task_b", mode="normal")])
+        assert database.get_request("task_a")["status"] == "processing"
+
+        # Completion updates the same row; extra fields land in details_json
+        database.save_requests([
+            dict(started, status="completed", progress=100, completed_at=datetime.now().isoformat(),
+                 duration_seconds=12.0, coalesced=True, trace_id="ab" * 16, timing={"total": 12.0}),
+            dict(started, task_id="task_b", mode="normal", status="failed", duration_seconds=3.0,
+                 error="Cliente desconectado")
+        ])
+        task = database.get_request("task_a")
+        assert task["status"] == "completed" and task["coalesced"] is True
+        assert task["timing"] == {"total": 12.0} and task["trace_id"] == "ab" * 16
+        assert task["question_hash"] == "5f1e2d" and "question" not in task
+        assert database.get_request("task_x") is None
+        assert [t["task_id"] for t in database.get_recent_requests(10)] == ["task_a", "task_b"]
+
+        analytics = database.get_request_analytics(hours=24 * 365 * 100)
+        assert analytics["total"] == 2
+        modes = {row["mode"]: row for row in analytics["by_mode"]}
+        assert modes["streaming"]["completed"] == 1 and modes["normal"]["failed"] == 1
+        assert analytics["duration_seconds"]["p50"] == 12.0
+        assert analytics["top_errors"] == [{"error": "Cliente desconectado", "count": 1}]
+
+
+def test_requests_retention_and_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.SQLITE_DB_PATH = os.path.join(tmp, "test.db")
+        database.init_db()
+
+        old = (datetime.now() - timedelta(days=database.REQUEST_LOG_RETENTION_DAYS + 1)).isoformat()
+        database.save_requests([{"task_id": "task_old", "mode": "normal", "status": "completed", "progress": 100, "started_at": old}])
+        database.save_requests([{"task_id": "task_live", "mode": "streaming", "status": "processing", "progress": 0,
+                                 "started_at": datetime.now().isoformat()}])
+        assert database.get_request("task_old") is None
+        assert database.get_request("task_live")["status"] == "processing"
+
+        # Next startup: the previous process can't finish it anymore
+        assert database.fail_unfinished_requests() == 1
+        task = database.get_request("task_live")
+        assert task["status"] == "failed" and task["error"] == "Servidor reiniciado"
+        assert database.fail_unfinished_requests() == 0
+
+
+if __name__ == "__main__":
+    tests = [
+        test_batches_and_drops,
+        test_requests_table_round_trip,
+        test_requests_retention_and_restart,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
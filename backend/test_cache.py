@@ -0,0 +1,217 @@
+"""
+Test script for the retrieval cache
+
+Tests LRU eviction, TTL expiry, query normalization, automatic
+invalidation when the vector index version changes and the semantic
+answer cache (dropped, local and shared entries, on a new index version).
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+from cache import IndexVersion, LRUCache, RetrievalCache, SemanticAnswerCache, get_chunk_id, normalize_query
+from priority_retriever import prioritized_search
+from langchain.schema import Document
+
+
+class FakeCollection:
+    def __init__(self, store):
+        self.store = store
+
+    def count(self):
+        return len(self.store.docs)
+
+
+class FakeVectorStore:
+    """Minimal stand-in for the Chroma vectorstore"""
+
+    def __init__(self):
+        self.docs = {
+            f"id{i}": (f"Trecho {i}", {"source": "livro-dos-espiritos.pdf", "page": i})
+            for i in range(10)
+        }
+        self._collection = FakeCollection(self)
+        self._persist_directory = None
+        self.get_calls = 0
+        self.search_calls = 0
+
+    def get(self, ids=None, include=None):
+        self.get_calls += 1
+        found = [i for i in ids if i in self.docs]
+        return {
+            "ids": found,
+            "documents": [self.docs[i][0] for i in found],
+            "metadatas": [self.docs[i][1] for i in found]
+        }
+
+    def similarity_search(self, query, k=4, filter=None):
+        # Like langchain_community's Chroma: documents come back without IDs
+        self.search_calls += 1
+        return [Document(page_content=content, metadata=dict(metadata))
+                for content, metadata in list(self.docs.values())[:k]]
+
+
+def test_lru_eviction():
+    cache = LRUCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "a" becomes most recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3 and stats["misses"] == 1
+
+
+def test_ttl_expiry():
+    cache = LRUCache(max_entries=10, ttl_seconds=0.05)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.get_stats()["expirations"] == 1
+
+
+def test_normalize_query():
+    assert normalize_query("  O que é   Reencarnação? ") == "o que é reencarnação"
+    assert normalize_query("reencarnação definição características") == \
+        "reencarnação definição características"
+
+
+def test_retrieval_cache_roundtrip():
+    store = FakeVectorStore()
+    cache = RetrievalCache(store, max_entries=10, ttl_seconds=60)
+    docs = [Document(page_content=store.docs[i][0], metadata=store.docs[i][1], id=i)
+            for i in ["id3", "id1", "id7"]]
+
+    assert cache.get("O que é perispírito?", 3, 15) is None
+    cache.put("O que é perispírito?", 3, 15, docs)
+
+    cached = cache.get("o que é perispírito", 3, 15)
+    assert [d.id for d in cached] == ["id3", "id1", "id7"]
+    assert cached[0].page_content == "Trecho 3"
+
+    # Different k / fetch_k / filters are different keys
+    assert cache.get("o que é perispírito", 5, 15) is None
+    assert cache.get("o que é perispírito", 3, 15, {"source": "x"}) is None
+
+
+def test_retrieval_cache_index_invalidation():
+    store = FakeVectorStore()
+    cache = RetrievalCache(store, max_entries=10, ttl_seconds=60, version_check_interval=0)
+    docs = [Document(page_content="Trecho 1", metadata={}, id="id1")]
+    cache.put("mediunidade", 3, 15, docs)
+    assert cache.get("mediunidade", 3, 15) is not None
+
+    # Simulate re-indexing (process_books.py)
+    store.docs["id99"] = ("Novo trecho", {})
+    assert cache.get("mediunidade", 3, 15) is None
+    assert cache.get_stats()["invalidations"] == 1
+
+
+def test_retrieval_cache_documents_without_ids():
+    store = FakeVectorStore()
+    cache = RetrievalCache(store, max_entries=10, ttl_seconds=60)
+    results = [prioritized_search(store, "O que é caridade?", k=3, fetch_k=5, cache=cache) for _ in range(3)]
+
+    assert store.search_calls == 1 and store.get_calls == 0
+    assert cache.get_stats()["entries"] == 1 and cache.get_stats()["hits"] == 2
+    assert [get_chunk_id(d) for d in results[2]] == [get_chunk_id(d) for d in results[0]]
+
+    # Callers tag the returned documents; the cached copy stays untouched
+    results[1][0].metadata["priority"] = 99
+    assert "priority" not in cache.get("o que é caridade", 3, 5)[0].metadata
+
+
+def test_semantic_cache_near_duplicate_hit():
+    cache = SemanticAnswerCache(max_entries=10, similarity_threshold=0.95)
+    sources = ["id1", "id2"]
+    cache.store([1.0, 0.0, 0.0], "qwen2.5:7b", 0.3, sources,
+                "o que é reencarnação?", "Resposta sobre reencarnação")
+
+    hit = cache.lookup([0.99, 0.05, 0.0], "qwen2.5:7b", 0.35, list(reversed(sources)))
+    assert hit is not None
+    assert hit["answer"] == "Resposta sobre reencarnação"
+    assert hit["similarity"] > 0.95
+
+
+def test_semantic_cache_requires_same_model_band_and_sources():
+    cache = SemanticAnswerCache(max_entries=10, similarity_threshold=0.95)
+    cache.store([1.0, 0.0], "qwen2.5:7b", 0.3, ["id1"], "q", "a")
+
+    assert cache.lookup([1.0, 0.0], "llama3.2:3b", 0.3, ["id1"]) is None
+    assert cache.lookup([1.0, 0.0], "qwen2.5:7b", 0.9, ["id1"]) is None
+    assert cache.lookup([1.0, 0.0], "qwen2.5:7b", 0.3, ["id2"]) is None
+    assert cache.lookup([0.0, 1.0], "qwen2.5:7b", 0.3, ["id1"]) is None
+    assert cache.get_stats()["misses"] == 4
+
+
+def test_semantic_cache_eviction():
+    cache = SemanticAnswerCache(max_entries=2, similarity_threshold=0.9)
+    for i in range(3):
+        cache.store([1.0, float(i)], "m", 0.3, [f"id{i}"], f"q{i}", f"a{i}")
+    assert len(cache) == 2
+    assert cache.lookup([1.0, 0.0], "m", 0.3, ["id0"]) is None
+    assert cache.lookup([1.0, 2.0], "m", 0.3, ["id2"])["answer"] == "a2"
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_semantic_cache_index_invalidation():
+    class FakeShared:
+        """SharedCacheStore stand-in: every value put under a key"""
+
+        def __init__(self):
+            self.values = {}
+
+        def get(self, namespace, key):
+            return list(self.values.get((namespace, key), []))
+
+        def put(self, namespace, key, value, ttl_seconds):
+            self.values.setdefault((namespace, key), []).append(value)
+
+    store, shared = FakeVectorStore(), FakeShared()
+    retrieval = RetrievalCache(store, version_check_interval=0)
+    cache = SemanticAnswerCache(max_entries=10, shared=shared, index_version=retrieval.index_version)
+    other_worker = SemanticAnswerCache(max_entries=10, shared=shared, index_version=IndexVersion(store, 0))
+    cache.store([1.0, 0.0], "m", 0.3, ["id1"], "q", "a")
+    assert cache.lookup([1.0, 0.0], "m", 0.3, ["id1"])["answer"] == "a"
+
+    # Simulate re-indexing: same chunk IDs, new index
+    store.docs["id99"] = ("Novo trecho", {})
+    assert cache.lookup([1.0, 0.0], "m", 0.3, ["id1"]) is None
+    assert other_worker.lookup([1.0, 0.0], "m", 0.3, ["id1"]) is None  # nor from the shared store
+    assert len(cache) == 0 and cache.get_stats()["invalidations"] == 1
+
+    # The retrieval cache still notices the change through the shared IndexVersion
+    retrieval.get("q", 3, 15)
+    assert retrieval.get_stats()["invalidations"] == 1
+
+
+if __name__ == "__main__":
+    tests = [
+        test_lru_eviction,
+        test_ttl_expiry,
+        test_normalize_query,
+        test_retrieval_cache_roundtrip,
+        test_retrieval_cache_index_invalidation,
+        test_retrieval_cache_documents_without_ids,
+        test_semantic_cache_near_duplicate_hit,
+        test_semantic_cache_requires_same_model_band_and_sources,
+        test_semantic_cache_eviction,
+        test_semantic_cache_index_invalidation,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
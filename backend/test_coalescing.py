@@ -0,0 +1,95 @@
+"""
+Test script for single-flight request coalescing
+
+Tests that identical in-flight questions share one generation, that late
+joiners replay the buffered prefix, and that the generation is cancelled
+only when every subscriber has left.
+"""
+
+import sys
+import asyncio
+from contextlib import aclosing
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+from coalescing import SingleFlight, make_flight_key
+
+
+def test_flight_key_normalization():
+    history = [{"role": "user", "content": "Olá"}]
+    a = make_flight_key("O que é reencarnação?", "qwen2.5:7b", 0.3, history)
+    b = make_flight_key("  o que é   reencarnação ", "qwen2.5:7b", 0.3, history)
+    assert a == b
+    assert a != make_flight_key("O que é reencarnação?", "llama3.2:3b", 0.3, history)
+    assert a != make_flight_key("O que é reencarnação?", "qwen2.5:7b", 0.7, history)
+    assert a != make_flight_key("O que é reencarnação?", "qwen2.5:7b", 0.3, [])
+
+
+def test_followers_share_one_generation():
+    async def scenario():
+        flights = SingleFlight()
+        runs = []
+
+        async def producer(flight):
+            runs.append(1)
+            for token in ["a", "b", "c"]:
+                flight.publish({"type": "token", "content": token})
+                await asyncio.sleep(0.02)
+            flight.publish({"type": "done"})
+
+        async def consume(delay):
+            await asyncio.sleep(delay)
+            flight, is_leader = flights.join("k", producer)
+            tokens = [e["content"] async for e in flights.subscribe(flight) if e["type"] == "token"]
+            return is_leader, "".join(tokens)
+
+        results = await asyncio.gather(consume(0), consume(0.01), consume(0.03))
+        return runs, results, flights.get_stats()
+
+    runs, results, stats = asyncio.run(scenario())
+    assert len(runs) == 1
+    assert [r[0] for r in results] == [True, False, False]
+    # Late joiners replay the buffered prefix
+    assert all(text == "abc" for _, text in results)
+    assert stats["followers"] == 2 and stats["in_flight"] == 0
+
+
+def test_cancelled_when_all_subscribers_leave():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def producer(flight):
+            for i in range(100):
+                flight.publish({"type": "token", "content": str(i)})
+                await asyncio.sleep(0.01)
+
+        flight, _ = flights.join("k", producer)
+        async with aclosing(flights.subscribe(flight)) as events:
+            async for event in events:
+                if event["content"] == "2":
+                    break
+        await asyncio.sleep(0.05)
+        return flight, flights.get_stats()
+
+    flight, stats = asyncio.run(scenario())
+    assert flight.done
+    assert stats["cancelled"] == 1
+
+
+if __name__ == "__main__":
+    tests = [
+        test_flight_key_normalization,
+        test_followers_share_one_generation,
+        test_cancelled_when_all_subscribers_leave,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,164 @@
+"""
+Test script for the rolling conversation memory
+
+Tests that the prompt history stays within its token budget as a
+conversation grows, that the previous exchange is folded into the summary,
+the extractive fallback while the LLM is busy, and that memory is scoped
+to its owner (another client's chat_id gives nothing), anonymous memory
+expires, and workers sharing the store see each other's exchanges.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+import database
+from conversation_memory import ConversationMemory, estimate_tokens
+
+OWNER = "user:1"
+
+
+def make_memory(store, summarize=None, is_busy=lambda: False):
+    return ConversationMemory(
+        load=lambda chat_id, owner: store.get((chat_id, owner)),
+        save=lambda chat_id, owner, state: store.__setitem__((chat_id, owner), state),
+        summarize=summarize,
+        is_busy=is_busy,
+        max_summary_tokens=50,
+        max_exchange_tokens=80
+    )
+
+
+def test_prompt_history_stays_flat():
+    store = {}
+    calls = []
+
+    async def summarize(summary, question, answer, max_tokens):
+        calls.append(question)
+        return (summary + " " + question + " " + answer[:100]).strip()
+
+    memory = make_memory(store, summarize)
+
+    async def run():
+        sizes = []
+        for turn in range(10):
+            question = f"Pergunta {turn} sobre o perispírito?"
+            answer = f"Resposta {turn}. " + "O perispírito é o envoltório semimaterial do Espírito. " * 50
+            await memory.update("chat-1", OWNER, question, answer)
+            sizes.append(estimate_tokens(memory.context("chat-1", OWNER)))
+        return sizes
+
+    sizes = asyncio.run(run())
+    assert max(sizes) <= 50 + 80 + 20, sizes
+    # The first exchange has nothing to fold; each later one folds the previous
+    assert calls == [f"Pergunta {turn} sobre o perispírito?" for turn in range(9)]
+    assert store[("chat-1", OWNER)]["last_question"] == "Pergunta 9 sobre o perispírito?"
+    assert store[("chat-1", OWNER)]["turns"] == 10
+
+    # A fresh instance (e.g. after a restart) reads the stored state
+    assert make_memory(store).context("chat-1", OWNER) == memory.context("chat-1", OWNER)
+    assert not memory.has_memory("chat-2", OWNER)
+
+
+def test_fallback_summary_when_busy():
+    store = {}
+    calls = []
+
+    async def summarize(summary, question, answer, max_tokens):
+        calls.append(question)
+        return "resumo"
+
+    memory = make_memory(store, summarize, is_busy=lambda: True)
+
+    async def run():
+        for turn in range(30):
+            await memory.update("chat-1", OWNER, f"Pergunta número {turn}?", "Resposta.")
+
+    asyncio.run(run())
+    summary = store[("chat-1", OWNER)]["summary"]
+    assert not calls
+    assert estimate_tokens(summary) <= 50
+    # Newest questions are kept, oldest dropped
+    assert "Pergunta número 28?" in summary and "Pergunta número 0?" not in summary
+    assert memory.get_stats()["fallback_summaries"] == 29
+
+
+def test_memory_scoped_to_owner_and_anonymous_expiry():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.SQLITE_DB_PATH = os.path.join(tmp, "test.db")
+        database.init_db()
+        memory = ConversationMemory(load=database.get_conversation_memory, save=database.save_conversation_memory)
+
+        async def run():
+            await memory.update("chat-1", "user:1", "Minha pergunta pessoal?", "Resposta.")
+            await memory.update("chat-1", "anon:abc", "Outra pergunta?", "Outra resposta.")
+
+        asyncio.run(run())
+        assert "Minha pergunta pessoal?" in memory.context("chat-1", "user:1")
+        # Same chat_id, other owner (or none): nothing leaks
+        assert memory.context("chat-1", "user:2") == "" and not memory.has_memory("chat-1", "user:2")
+        assert memory.context("chat-1", None) == ""
+        assert "Minha" not in ConversationMemory(database.get_conversation_memory,
+                                                 database.save_conversation_memory).context("chat-1", "anon:abc")
+
+        # Anonymous memory idle for longer than the TTL is neither served nor kept
+        conn = database._get_connection()
+        conn.execute("UPDATE conversation_memory SET updated_at = '2000-01-01T00:00:00'")
+        conn.commit()
+        assert database.get_conversation_memory("chat-1", "anon:abc") is None
+        database.save_conversation_memory("chat-2", "user:1", {"summary": ""})
+        owners = [row[0] for row in conn.execute("SELECT owner FROM conversation_memory ORDER BY owner")]
+        conn.close()
+        assert owners == ["user:1", "user:1"]
+
+
+def test_memory_shared_between_workers():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.SQLITE_DB_PATH = os.path.join(tmp, "test.db")
+        database.init_db()
+        # Two workers: separate in-process LRUs over the same SQLite table
+        worker_a, worker_b = (
+            ConversationMemory(database.get_conversation_memory, database.save_conversation_memory, read_through=True)
+            for _ in range(2)
+        )
+
+        async def run():
+            await worker_a.update("chat-1", OWNER, "Primeira pergunta?", "Primeira resposta.")
+            assert "Primeira pergunta?" in worker_b.context("chat-1", OWNER)
+            await worker_b.update("chat-1", OWNER, "Segunda pergunta?", "Segunda resposta.")
+            # Worker A cached the first exchange but reads the second one
+            context = worker_a.context("chat-1", OWNER)
+            assert "Segunda pergunta?" in context and "Primeira pergunta?" in context
+            await worker_a.update("chat-1", OWNER, "Terceira pergunta?", "Terceira resposta.")
+
+        asyncio.run(run())
+        assert database.get_conversation_memory("chat-1", OWNER)["turns"] == 3
+
+        # A late save of an older state (a slow fold on another worker) is dropped
+        database.save_conversation_memory("chat-1", OWNER, {"summary": "velho", "last_question": "Segunda pergunta?",
+                                                            "turns": 2})
+        stored = database.get_conversation_memory("chat-1", OWNER)
+        assert stored["turns"] == 3 and stored["last_question"] == "Terceira pergunta?"
+
+
+if __name__ == "__main__":
+    tests = [
+        test_prompt_history_stays_flat,
+        test_fallback_summary_when_busy,
+        test_memory_scoped_to_owner_and_anonymous_expiry,
+        test_memory_shared_between_workers,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
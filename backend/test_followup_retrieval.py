@@ -0,0 +1,127 @@
+"""
+Test script for follow-up retrieval reuse
+
+Tests that a follow-up is ranked among the previous turn's hits and their
+neighbouring pages, that weak scores fall back to a full search, and that
+a conversation's state is only visible to (and cleared by) its owner.
+"""
+
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+from followup_retrieval import FollowUpRetriever
+from langchain.schema import Document
+
+# Toy embedding space: perispírito / evangelho / astronomia
+TOPICS = {
+    "perispírito": [1.0, 0.0, 0.0],
+    "evangelho": [0.6, 0.8, 0.0],
+    "astronomia": [0.0, 0.0, 1.0],
+}
+
+
+class FakeEmbeddings:
+    def embed_query(self, text):
+        vector = [0.0, 0.0, 0.0]
+        for topic, topic_vector in TOPICS.items():
+            if topic in text.lower():
+                vector = [a + b for a, b in zip(vector, topic_vector)]
+        return vector if any(vector) else [0.0, 0.0, 1.0]
+
+
+class FakeVectorStore:
+    """Minimal stand-in for Chroma's get(ids=...) / get(where=...)"""
+
+    def __init__(self):
+        self.docs = {}
+        for page in range(6):
+            vector = TOPICS["perispírito"] if page < 3 else TOPICS["evangelho"]
+            self.docs[f"le-{page}"] = (f"O Livro dos Espíritos, página {page}", "livro-dos-espiritos.pdf", page, vector)
+        self.get_calls = []
+
+    def get(self, ids=None, where=None, include=None):
+        self.get_calls.append(where or ids)
+        if where is not None:
+            source = where["$and"][0]["source"]["$eq"]
+            pages = where["$and"][1]["page"]["$in"]
+            ids = [i for i, d in self.docs.items() if d[1] == source and d[2] in pages]
+        found = [i for i in ids if i in self.docs]
+        return {
+            "ids": found,
+            "documents": [self.docs[i][0] for i in found],
+            "metadatas": [{"source": self.docs[i][1], "page": self.docs[i][2]} for i in found],
+            "embeddings": [self.docs[i][3] for i in found],
+        }
+
+
+def hits(store, pages):
+    # Search results from langchain's Chroma carry no id, only metadata
+    return [
+        Document(page_content=store.docs[f"le-{p}"][0], metadata={"source": "livro-dos-espiritos.pdf", "page": p})
+        for p in pages
+    ]
+
+
+def test_followup_reuses_previous_neighbourhood():
+    store = FakeVectorStore()
+    retriever = FollowUpRetriever(store, FakeEmbeddings(), min_score=0.5, page_window=1)
+
+    # No state yet: full search needed
+    assert retriever.search("chat-1", "user:1", "O que é o perispírito?", k=2, fetch_k=10) is None
+
+    retriever.record("chat-1", "user:1", "O que é o perispírito?", hits(store, [1, 2]))
+    # Candidates: the hit pages plus one neighbour on each side
+    assert retriever._states.get(("chat-1", "user:1"))[0]["candidate_ids"] == ["le-0", "le-1", "le-2", "le-3"]
+
+    result = retriever.search("chat-1", "user:1", "E o que o Evangelho diz sobre isso?", k=2, fetch_k=10)
+    assert result is not None
+    documents, metadata = result
+    assert metadata["followup_reuse"] and metadata["candidates"] == 4
+    assert len(documents) == 2 and all(doc.id for doc in documents)
+    assert retriever.get_stats()["hit_rate"] == 1.0
+
+
+def test_weak_scores_fall_back_to_full_search():
+    store = FakeVectorStore()
+    retriever = FollowUpRetriever(store, FakeEmbeddings(), min_score=0.8, query_blend=0.0)
+    retriever.record("chat-1", "user:1", "O que é o perispírito?", hits(store, [0]))
+
+    assert retriever.search("chat-1", "user:1", "Fale sobre astronomia", k=2, fetch_k=10) is None
+    assert retriever.search("chat-2", "user:1", "O que é o perispírito?", k=2, fetch_k=10) is None
+    stats = retriever.get_stats()
+    assert stats["attempts"] == 1 and stats["weak_scores"] == 1 and stats["hit_rate"] == 0.0
+
+
+def test_state_is_scoped_to_owner():
+    store = FakeVectorStore()
+    retriever = FollowUpRetriever(store, FakeEmbeddings(), min_score=0.5)
+    retriever.record("chat-1", "user:1", "O que é o perispírito?", hits(store, [1, 2]))
+
+    # Same chat_id from another owner: no reuse of the first owner's candidates
+    assert retriever.search("chat-1", "anon:outro", "E o perispírito?", k=2, fetch_k=10) is None
+    retriever.forget("chat-1", "anon:outro")
+    assert retriever.search("chat-1", "user:1", "E o perispírito?", k=2, fetch_k=10) is not None
+
+    retriever.forget("chat-1", "user:1")
+    assert retriever.search("chat-1", "user:1", "E o perispírito?", k=2, fetch_k=10) is None
+    assert retriever.get_stats()["attempts"] == 1
+
+
+if __name__ == "__main__":
+    tests = [
+        test_followup_reuses_previous_neighbourhood,
+        test_weak_scores_fall_back_to_full_search,
+        test_state_is_scoped_to_owner,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
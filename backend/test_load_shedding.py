@@ -0,0 +1,88 @@
+"""
+Test script for load shedding
+
+Tests escalation from queue depth and latency, the degraded request plan
+at each level and the step-by-step recovery after the cooldown.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+from load_shedding import LoadShedder
+
+LEVELS = [
+    {"multi_search": False, "top_k": None, "fetch_k": 10, "max_history": 4, "model": None},
+    {"multi_search": False, "top_k": 2, "fetch_k": 6, "max_history": 2, "model": None},
+    {"multi_search": False, "top_k": 2, "fetch_k": 4, "max_history": 0, "model": "llama3.2:3b"},
+]
+
+
+def make_shedder(**kwargs):
+    return LoadShedder(LEVELS, [2, 5, 10], [45.0, 90.0, 180.0], cooldown_seconds=30, **kwargs)
+
+
+def test_plan_per_level():
+    shedder = make_shedder()
+    normal = shedder.plan(0, "qwen2.5:7b", 3, 15, 6, True)
+    assert normal["level"] == 0 and normal["changes"] == []
+    assert normal["multi_search"] and normal["fetch_k"] == 15
+
+    moderate = shedder.plan(5, "qwen2.5:7b", 3, 15, 6, True)
+    assert moderate["level"] == 2
+    assert (moderate["top_k"], moderate["fetch_k"], moderate["max_history"]) == (2, 6, 2)
+    assert not moderate["multi_search"] and moderate["model_name"] == "qwen2.5:7b"
+
+    severe = shedder.plan(50, "qwen2.5:7b", 3, 15, 6, True)
+    assert severe["level"] == 3 and severe["model_name"] == "llama3.2:3b"
+    assert "model" in severe["changes"] and severe["max_history"] == 0
+
+    # Never raises a setting the user already asked to be lower
+    small = shedder.plan(50, "llama3.2:3b", 1, 3, 0, False)
+    assert small["changes"] == [] and small["top_k"] == 1
+
+
+def test_recovers_one_level_after_cooldown():
+    shedder = make_shedder()
+    now = time.time()
+    assert shedder.update(12, now) == 3
+    assert shedder.update(0, now + 1) == 3   # calm period starts
+    assert shedder.update(0, now + 20) == 3
+    assert shedder.update(0, now + 31) == 2
+    assert shedder.update(0, now + 62) == 1
+    # Pressure coming back resets the calm period
+    assert shedder.update(2, now + 70) == 1
+    assert shedder.update(0, now + 71) == 1
+    assert shedder.update(0, now + 102) == 0
+    assert shedder.get_stats()["escalations"] == 1
+
+
+def test_latency_trigger_and_expiry():
+    shedder = make_shedder(latency_max_age=60)
+    for _ in range(3):
+        shedder.record_latency(100.0)
+    now = time.time()
+    assert shedder.update(0, now) == 2
+    # Old samples stop counting once they age out
+    assert shedder.recent_latency(now + 120) == 0.0
+    assert make_shedder(enabled=False).update(50) == 0
+
+
+if __name__ == "__main__":
+    tests = [
+        test_plan_per_level,
+        test_recovers_one_level_after_cooldown,
+        test_latency_trigger_and_expiry,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
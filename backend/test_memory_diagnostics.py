@@ -0,0 +1,92 @@
+"""
+Test script for memory diagnostics
+
+Tests the size estimate of cache-like structures (shared objects excluded,
+numpy buffers counted) and the tracemalloc snapshot ring with top/diff.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+from memory_diagnostics import TracemallocSnapshots, deep_sizeof, process_memory
+
+
+class FakeModel:
+    def __init__(self):
+        self.weights = np.zeros(1_000_000, dtype=np.float32)  # 4 MB
+
+
+class FakeCache:
+    def __init__(self, model):
+        self.model = model  # shared, must not be counted
+        self.entries = {f"pergunta {i}": np.zeros(768, dtype=np.float32) for i in range(100)}
+
+
+def test_deep_sizeof_counts_buffers_and_skips_shared():
+    model = FakeModel()
+    cache = FakeCache(model)
+
+    with_model = deep_sizeof(cache)
+    without_model = deep_sizeof(cache, exclude=[model])
+    assert with_model - without_model >= 4_000_000
+    assert without_model >= 100 * 768 * 4  # the cached embeddings themselves
+
+    # Views don't own their buffer
+    base = np.zeros(10_000, dtype=np.float64)
+    assert deep_sizeof([base[:5000]]) < 80_000 <= deep_sizeof([base])
+
+    memory = process_memory()
+    assert memory["rss_mb"] is None or memory["rss_mb"] > 0
+
+
+def test_snapshots_top_diff_and_ring():
+    snapshots = TracemallocSnapshots(max_snapshots=2)
+    try:
+        snapshots.take()
+        assert False, "take() sem tracemalloc deveria falhar"
+    except RuntimeError:
+        pass
+
+    assert snapshots.start(1)
+    assert not snapshots.start(1)  # already tracing
+    try:
+        first = snapshots.take("antes")
+        leak = [bytearray(1024) for _ in range(2000)]  # ~2 MB from one line
+        second = snapshots.take("depois")
+
+        top = snapshots.top(second["snapshot_id"], limit=5)
+        assert any("test_memory_diagnostics.py" in row["site"] for row in top)
+
+        diff = snapshots.diff(first["snapshot_id"], second["snapshot_id"], limit=3)
+        assert "test_memory_diagnostics.py" in diff[0]["site"]
+        assert diff[0]["size_diff_kb"] >= 2000 and diff[0]["count_diff"] >= 2000
+
+        third = snapshots.take("terceiro")
+        assert [s["snapshot_id"] for s in snapshots.list()] == [second["snapshot_id"], third["snapshot_id"]]
+        assert snapshots.top(first["snapshot_id"]) is None
+        assert "snapshot" not in snapshots.list()[0]
+        del leak
+    finally:
+        snapshots.stop()
+    assert snapshots.get_stats()["tracing"] is False
+
+
+if __name__ == "__main__":
+    tests = [
+        test_deep_sizeof_counts_buffers_and_skips_shared,
+        test_snapshots_top_diff_and_ring,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
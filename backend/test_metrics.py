@@ -0,0 +1,87 @@
+"""
+Test script for the Prometheus metrics
+
+Tests that per-thread counter shards add up (and that the shards of
+exited threads are folded away without losing values), and the text
+exposition of histograms and scrape-time callbacks.
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+from metrics import Registry
+
+
+def test_sharded_counter_sums_threads():
+    registry = Registry()
+    counter = registry.counter("test_requests_total", "Requests", ["outcome"])
+    histogram = registry.histogram("test_seconds", "Latency", buckets=[1, 10])
+
+    def work():
+        for _ in range(10000):
+            counter.inc(outcome="answered")
+        counter.inc(5, outcome="cached")
+        histogram.observe(2.0)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.collect() == {("answered",): 80000, ("cached",): 40}
+    assert histogram.collect() == {(): [0, 8, 0, 16.0]}
+
+    # The 8 exited threads' shards were folded into the base shard
+    assert counter._values._shards == [] and histogram._values._shards == []
+    text = registry.render()
+    assert '# TYPE test_requests_total counter' in text
+    assert 'test_requests_total{outcome="answered"} 80000' in text
+
+    # A new thread (here the main one) gets its own shard on top of the base
+    counter.inc(outcome="answered")
+    assert counter.collect()[("answered",)] == 80001
+
+
+def test_histogram_and_callback_exposition():
+    registry = Registry()
+    histogram = registry.histogram("test_seconds", "Latency", ["stage"], buckets=[0.1, 1])
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, stage="retrieval")
+    registry.callback("test_queue_depth", "Queue", "gauge", lambda: {("llama",): 2}, ["model"])
+
+    def broken():
+        raise RuntimeError("indisponível")
+
+    registry.callback("test_broken", "Broken", "gauge", broken)
+
+    lines = registry.render().splitlines()
+    # Cumulative buckets: le is inclusive
+    assert 'test_seconds_bucket{stage="retrieval",le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{stage="retrieval",le="1"} 3' in lines
+    assert 'test_seconds_bucket{stage="retrieval",le="+Inf"} 4' in lines
+    assert 'test_seconds_sum{stage="retrieval"} 3.65' in lines
+    assert 'test_seconds_count{stage="retrieval"} 4' in lines
+    assert 'test_queue_depth{model="llama"} 2' in lines
+    # A failing callback doesn't break the scrape
+    assert "# test_broken: indisponível" in lines
+
+
+if __name__ == "__main__":
+    tests = [
+        test_sharded_counter_sums_threads,
+        test_histogram_and_callback_exposition,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,85 @@
+"""
+Test script for complexity-aware model routing
+
+Tests that "auto" requests are routed by complexity level, that explicit
+models are kept, that hits and latency are tracked per route, and the
+route a model swapped in by load shedding gets.
+"""
+
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+from model_router import ModelRouter
+
+ROUTES = {
+    1: {"model": "llama3.2:3b", "num_predict": 512, "num_ctx": 4096},
+    2: {"model": "llama3.2:3b", "num_predict": 768, "num_ctx": 6144},
+    3: {"model": "llama3.1:8b", "num_predict": 1024, "num_ctx": 8192},
+}
+
+
+def test_routes_by_complexity():
+    router = ModelRouter(ROUTES, default_num_ctx=8192)
+
+    simple = router.route("O que é perispírito?", "auto")
+    assert simple["complexity_level"] == 1
+    assert (simple["model"], simple["num_predict"], simple["num_ctx"]) == ("llama3.2:3b", 512, 4096)
+
+    comparative = router.route(
+        "Qual a diferença entre reencarnação, carma, livre-arbítrio e evolução espiritual, e como se relacionam com a caridade?",
+        "auto"
+    )
+    assert comparative["complexity_level"] == 3
+    assert comparative["model"] == "llama3.1:8b"
+
+
+def test_explicit_model_and_stats():
+    router = ModelRouter(ROUTES, default_num_ctx=8192)
+    explicit = router.route("O que é perispírito?", "qwen2.5:7b")
+    assert explicit["name"] == "client" and explicit["model"] == "qwen2.5:7b"
+    assert explicit["num_predict"] is None and explicit["num_ctx"] == 8192
+
+    router.route("O que é caridade?", "auto")
+    router.route("O que é prece?", "auto", record_stats=False)
+    router.record_latency("level_1", 4.0)
+    router.record_latency("level_1", 6.0)
+
+    stats = router.get_stats()
+    assert stats["routes"]["client"]["hits"] == 1
+    assert stats["routes"]["level_1"]["hits"] == 1
+    assert stats["routes"]["level_1"]["avg_latency"] == 5.0
+
+    # Disabled routing sends "auto" to the largest route
+    assert ModelRouter(ROUTES, enabled=False).route("O que é prece?", "auto")["model"] == "llama3.1:8b"
+
+
+def test_route_for_fallback_model():
+    router = ModelRouter(ROUTES, default_num_ctx=8192)
+
+    # Lowest level's name and num_predict, largest num_ctx the model runs with
+    fallback = router.route_for_model("llama3.2:3b")
+    assert (fallback["name"], fallback["num_predict"], fallback["num_ctx"]) == ("level_1", 512, 6144)
+    assert router.route_for_model("qwen2.5:7b", record_stats=False)["name"] == "fallback"
+
+    stats = router.get_stats()["routes"]
+    assert stats["level_1"]["hits"] == 1 and "fallback" not in stats
+
+
+if __name__ == "__main__":
+    tests = [
+        test_routes_by_complexity,
+        test_explicit_model_and_stats,
+        test_route_for_fallback_model,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
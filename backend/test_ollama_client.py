@@ -0,0 +1,141 @@
+"""
+Test script for the async Ollama client
+
+Runs the client against an httpx.MockTransport standing in for Ollama:
+streamed fragments and token stats, the request payload (system prompt,
+options, keep_alive), preload, errors raised as ollama.ResponseError, and
+that stopping mid-answer closes the HTTP stream and counts as cancelled.
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import httpx
+from ollama import ResponseError
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+from ollama_client import AsyncOllamaClient
+
+
+class ChunkStream(httpx.AsyncByteStream):
+    """NDJSON body that records whether the client closed it"""
+
+    def __init__(self, chunks, endless: bool = False):
+        self.chunks = chunks
+        self.endless = endless
+        self.closed = False
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield (json.dumps(chunk) + "\n").encode()
+        while self.endless:
+            await asyncio.sleep(0.01)
+            yield (json.dumps({"response": " mais", "done": False}) + "\n").encode()
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_stream_stats_and_preload():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        requests.append(payload)
+        if not payload["stream"]:
+            return httpx.Response(200, json={"response": "", "done": True})
+        return httpx.Response(200, stream=ChunkStream([
+            {"response": "O perispírito", "done": False},
+            {"response": " é o envoltório", "done": False},
+            {"response": "", "done": True, "prompt_eval_count": 120, "eval_count": 2,
+             "prompt_eval_duration": 5e8, "eval_duration": 2e8},
+        ]))
+
+    async def scenario():
+        client = AsyncOllamaClient(host="localhost:11434", keep_alive="30m", transport=httpx.MockTransport(handler))
+        stats = {}
+        fragments = [f async for f in client.stream("llama3.2:3b", "Pergunta", 0.3, 2048, 100, stats, "Sistema")]
+        answer = await client.generate("llama3.2:3b", "Pergunta", 0.3, 2048)
+        timings = await client.preload("llama3.2:3b", 2048, "Olá", "Sistema")
+        await client.close()
+        return client, fragments, answer, stats, timings
+
+    client, fragments, answer, stats, timings = asyncio.run(scenario())
+    assert fragments == ["O perispírito", " é o envoltório"] and answer == "O perispírito é o envoltório"
+    assert stats == {"prompt_tokens": 120, "output_tokens": 2, "prompt_eval_seconds": 0.5, "eval_seconds": 0.2}
+    assert requests[0] == {
+        "model": "llama3.2:3b", "prompt": "Pergunta", "stream": True, "system": "Sistema", "keep_alive": "30m",
+        "options": {"temperature": 0.3, "num_ctx": 2048, "num_predict": 100}
+    }
+    assert "system" not in requests[1] and "num_predict" not in requests[1]["options"]
+
+    # Preload: load with an empty prompt, then a one-token warm-up with the system prompt
+    assert [r["prompt"] for r in requests[2:]] == ["", "Olá"]
+    assert requests[3]["options"] == {"num_ctx": 2048, "num_predict": 1} and requests[3]["system"] == "Sistema"
+    assert set(timings) == {"load_seconds", "warmup_seconds"}
+
+    result = client.get_stats()
+    assert result["generations_started"] == 2 and result["generations_completed"] == 2
+    assert result["tokens_generated"] == 4 and result["avg_output_tokens"] == 2.0
+    assert client._http.is_closed
+
+
+def test_cancel_closes_stream_and_errors():
+    streams = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        prompt = json.loads(request.content)["prompt"]
+        if prompt == "modelo ausente":
+            return httpx.Response(404, json={"error": "model 'x' not found"})
+        if prompt == "falha no meio":
+            chunks = [{"response": "a", "done": False}, {"error": "out of memory"}]
+            return httpx.Response(200, stream=ChunkStream(chunks))
+        streams.append(ChunkStream([{"response": "Um", "done": False}], endless=True))
+        return httpx.Response(200, stream=streams[-1])
+
+    async def scenario():
+        client = AsyncOllamaClient(transport=httpx.MockTransport(handler))
+        # The consumer stops after two fragments: the HTTP stream must be closed
+        fragments = []
+        async with client._http:
+            generator = client.stream("llama3.2:3b", "longa", 0.3, 2048)
+            async for fragment in generator:
+                fragments.append(fragment)
+                if len(fragments) == 2:
+                    break
+            await generator.aclose()
+
+            errors = []
+            for prompt in ["modelo ausente", "falha no meio"]:
+                try:
+                    await client.generate("llama3.2:3b", prompt, 0.3, 2048)
+                except ResponseError as e:
+                    errors.append((e.error, e.status_code))
+        return client, fragments, errors
+
+    client, fragments, errors = asyncio.run(scenario())
+    assert fragments == ["Um", " mais"] and streams[0].closed
+    assert errors == [("model 'x' not found", 404), ("out of memory", -1)]
+    stats = client.get_stats()
+    assert stats["generations_cancelled"] == 1 and stats["generations_failed"] == 2
+    assert stats["tokens_generated"] == 3  # 2 before the cancellation + 1 before the mid-stream error
+
+
+if __name__ == "__main__":
+    tests = [
+        test_stream_stats_and_preload,
+        test_cancel_closes_stream_and_errors,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
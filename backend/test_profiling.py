@@ -0,0 +1,84 @@
+"""
+Test script for opt-in request profiling
+
+Tests that profiled blocks run in the request's threads are merged into
+one report, that nothing is profiled without a session, and the bounded
+profile ring.
+"""
+
+import asyncio
+import marshal
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+from profiling import ProfileStore, format_stats, profiled, profiled_function, start_session
+
+
+def rerank(n):
+    return sorted(range(n), key=lambda i: -i)
+
+
+@profiled_function("retrieval")
+def search():
+    # Nested block in the same thread: already covered by the outer profiler
+    with profiled("nested"):
+        return rerank(20000)
+
+
+def test_blocks_merge_across_threads():
+    async def handle():
+        session = start_session("/query: teste")
+        await asyncio.to_thread(search)  # worker thread, like run_in_threadpool
+        with profiled("prompt_build"):
+            "\n".join(str(i) for i in range(1000))
+        return session.finish()
+
+    profile = asyncio.run(handle())
+    assert profile["label"] == "/query: teste"
+    assert set(profile["sections"]) == {"retrieval", "prompt_build"}
+    functions = {name for (_, _, name) in profile["stats"].stats}
+    assert "rerank" in functions and "<genexpr>" in functions
+    assert "rerank" in format_stats(profile["stats"], "tottime", 10)
+
+    # No session in this context: profiled() does nothing
+    with profiled("retrieval"):
+        pass
+    assert asyncio.run(asyncio.to_thread(search)) is not None
+
+
+def test_store_keeps_last_profiles():
+    store = ProfileStore(max_profiles=3)
+
+    async def make(i):
+        session = start_session(f"pergunta {i}")
+        with profiled("retrieval"):
+            rerank(100)
+        return session.finish()
+
+    for i in range(5):
+        store.add(asyncio.run(make(i)))
+
+    listed = store.list()
+    assert [p["label"] for p in listed] == ["pergunta 4", "pergunta 3", "pergunta 2"]
+    assert "stats" not in listed[0] and listed[0]["top_functions"]
+    assert isinstance(marshal.loads(store.dump(listed[0]["profile_id"])), dict)
+    assert store.dump("prof_inexistente") is None
+
+
+if __name__ == "__main__":
+    tests = [
+        test_blocks_merge_across_threads,
+        test_store_keeps_last_profiles,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
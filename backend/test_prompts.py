@@ -0,0 +1,82 @@
+"""
+Test script for the prompt layout
+
+Tests that the history window keeps a stable prefix across consecutive
+turns (and that server-loaded history reads exactly that window, at most
+9 messages), and that the static instructions stay out of the per-turn
+template.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+from prompts import SYSTEM_PROMPT, TURN_TEMPLATE, stable_history_window
+
+
+def test_history_window_prefix_is_stable():
+    sizes = [len(stable_history_window(list(range(n)), 5)) for n in range(1, 16)]
+    assert max(sizes) == 9 and sizes[:5] == [1, 2, 3, 4, 5]
+
+    # Adding one exchange keeps the previous window as a prefix (until a block boundary)
+    history = list(range(6))
+    before = stable_history_window(history, 5)
+    after = stable_history_window(history + [6, 7], 5)
+    assert after[:len(before)] == before
+
+
+def test_server_history_loads_only_the_window():
+    import api_server
+    import database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.SQLITE_DB_PATH = os.path.join(tmp, "test.db")
+        database.init_db()
+        user = {"id": database.create_user("leitor@example.com", "x")}
+        request = api_server.QueryRequest(question="E depois?", chat_id="chat-1")
+
+        loaded, previous = [], None
+        for turn in range(8):
+            history = api_server.load_server_history(request, user).conversation_history or []
+            contents = [msg.content for msg in history]
+            # Exactly the window the prompt uses: nothing read only to be dropped
+            assert contents == [msg.content for msg in stable_history_window(history, 5)]
+            if previous and contents[:1] == previous[:1]:
+                assert contents[:len(previous)] == previous
+            loaded.append(len(contents))
+            previous = contents
+            database.append_messages(user["id"], "chat-1", [
+                {"role": "user", "content": f"Pergunta {turn}"},
+                {"role": "assistant", "content": f"Resposta {turn}"}
+            ], title="Conversa")
+
+        # Trade-off: up to 9 messages (vs. the last 5) for a prefix that holds across turns
+        assert loaded == [0, 2, 4, 6, 8, 5, 7, 9]
+
+
+def test_static_instructions_are_not_templated():
+    assert "{" not in SYSTEM_PROMPT
+    assert "REGRA FUNDAMENTAL" not in TURN_TEMPLATE
+    # Per-turn order: history, retrieved context, question
+    assert TURN_TEMPLATE.index("{conversation_context}") < TURN_TEMPLATE.index("{context}") < TURN_TEMPLATE.index("{question}")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_history_window_prefix_is_stable,
+        test_server_history_loads_only_the_window,
+        test_static_instructions_are_not_templated,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
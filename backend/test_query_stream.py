@@ -0,0 +1,124 @@
+"""
+Test script for /query_stream admission around coalesced generations
+
+Tests that a request which found an identical generation in flight (so
+took no admission slot), but whose body starts after that generation
+finished, takes a slot before leading the new generation, and gets an
+error event instead of an unadmitted generation when the queue is full.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+import api_server
+import database
+from admission import AdmissionController
+from starlette.requests import Request
+
+
+def make_http_request() -> Request:
+    return Request({
+        "type": "http", "method": "POST", "path": "/query_stream", "query_string": b"",
+        "headers": [], "client": ("10.0.0.1", 5000), "server": ("test", 80), "scheme": "http"
+    })
+
+
+def install_fake_producer(tickets, gate):
+    """Stands in for the answer pipeline: records the ticket it got, waits for the gate"""
+
+    async def produce(request, flight, ticket=None, degradation=None, route=None):
+        tickets.append(ticket)
+        try:
+            if ticket is not None:
+                async for _ in api_server.admission_controller.wait(ticket):
+                    pass
+            await gate.wait()
+            flight.publish({"type": "token", "content": "Resposta"})
+            flight.publish({"type": "done"})
+        finally:
+            if ticket is not None:
+                api_server.admission_controller.release(ticket)
+
+    api_server.produce_stream_events = produce
+
+
+async def read_events(response):
+    return [json.loads(chunk[6:]) async for chunk in response.body_iterator]
+
+
+def run_race(controller: AdmissionController, hold_slot: bool):
+    """A leads a generation; B is accepted while it's in flight, but its body starts after it ended"""
+    with tempfile.TemporaryDirectory() as tmp:
+        database.SQLITE_DB_PATH = os.path.join(tmp, "test.db")
+        database.init_db()
+        api_server.admission_controller = controller
+        for component in api_server.readiness.to_dict()["components"]:
+            api_server.readiness.ready(component)
+        tickets = []
+
+        async def scenario():
+            gate = asyncio.Event()
+            install_fake_producer(tickets, gate)
+            question = {"question": "O que é o perispírito?", "use_cache": False}
+
+            first = await api_server.query_stream(api_server.QueryRequest(**question), make_http_request())
+            first_events = asyncio.create_task(read_events(first))
+            await asyncio.sleep(0.05)
+
+            second = await api_server.query_stream(api_server.QueryRequest(**question), make_http_request())
+            gate.set()
+            await first_events
+            assert not api_server.single_flight.in_flight()
+
+            if hold_slot:
+                # Another client holds the only slot and the queue takes nobody else
+                controller.enqueue(tickets[0].model, "ip:10.9.9.9")
+            return await read_events(second)
+
+        return tickets, asyncio.run(scenario())
+
+
+def test_late_leader_takes_a_slot():
+    controller = AdmissionController(default_limit=2, max_queue=5)
+    tickets, events = run_race(controller, hold_slot=False)
+
+    # Both generations ran with a slot (B's was taken when its body started)
+    assert len(tickets) == 2 and all(ticket is not None for ticket in tickets)
+    assert [e["type"] for e in events][:2] == ["task_id", "coalescing"] and events[1]["coalesced"] is False
+    assert events[-1]["type"] == "done"
+    model = tickets[0].model
+    assert controller.get_stats()["models"][model]["active"] == 0
+
+
+def test_late_leader_rejected_when_queue_full():
+    controller = AdmissionController(default_limit=1, max_queue=0)
+    tickets, events = run_race(controller, hold_slot=True)
+
+    # No generation without a slot: B gets an error event instead
+    assert len(tickets) == 1
+    assert [e["type"] for e in events] == ["task_id", "error"]
+    model = tickets[0].model
+    assert controller.get_stats()["models"][model]["active"] == 1  # only the other client's slot
+
+
+if __name__ == "__main__":
+    tests = [
+        test_late_leader_takes_a_slot,
+        test_late_leader_rejected_when_queue_full,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
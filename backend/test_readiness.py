@@ -0,0 +1,59 @@
+"""
+Test script for readiness tracking
+
+Tests component state transitions and that only required components
+block readiness when they fail.
+"""
+
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+from readiness import ReadinessTracker
+
+
+def test_ready_only_when_components_are_hot():
+    readiness = ReadinessTracker()
+    readiness.register("vectorstore")
+    readiness.register("model:llama3.1:8b", required=False)
+    assert not readiness.is_ready()
+
+    readiness.start("vectorstore")
+    assert readiness.to_dict()["components"]["vectorstore"]["state"] == "loading"
+    readiness.ready("vectorstore")
+    assert not readiness.is_ready()  # optional model still pending
+
+    readiness.start("model:llama3.1:8b")
+    readiness.fail("model:llama3.1:8b", "model not found")
+    report = readiness.to_dict()
+    assert report["ready"]
+    assert report["components"]["model:llama3.1:8b"]["detail"] == "model not found"
+    assert report["components"]["vectorstore"]["seconds"] is not None
+
+
+def test_required_failure_blocks_readiness():
+    readiness = ReadinessTracker()
+    readiness.register("vectorstore")
+    readiness.register("embeddings")
+    readiness.fail("vectorstore", "Banco de dados não encontrado")
+    assert not readiness.is_ready()
+    assert readiness.has_failed()
+    assert readiness.to_dict()["progress"] == 0.5
+
+
+if __name__ == "__main__":
+    tests = [
+        test_ready_only_when_components_are_hot,
+        test_required_failure_blocks_readiness,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,94 @@
+"""
+Test script for the continuous sampling profiler
+
+Tests that a busy thread's stack shows up in the folded output (grouped by
+thread name, idle threads left out) and that old time buckets expire.
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+import sampling_profiler
+from sampling_profiler import SamplingProfiler, _thread_group
+
+
+def busy_rerank(stop):
+    while not stop.is_set():
+        sorted(range(2000), key=lambda i: -i)
+
+
+def test_busy_thread_in_folded_stacks():
+    assert _thread_group("ThreadPoolExecutor-0_3") == "ThreadPoolExecutor"
+    assert _thread_group("MainThread") == "MainThread"
+
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_rerank, args=(stop,), name="Worker-7")
+    idle = threading.Thread(target=stop.wait, name="Idle")
+    worker.start()
+    idle.start()
+    profiler = SamplingProfiler(hz=200)
+    profiler.start()
+    time.sleep(0.5)
+    profiler.stop()
+    stop.set()
+    worker.join()
+    idle.join()
+
+    lines = profiler.folded(seconds=60).splitlines()
+    worker_lines = [line for line in lines if line.startswith("Worker;")]
+    assert worker_lines and all("test_sampling_profiler.py:busy_rerank" in line for line in worker_lines)
+    assert not any(line.startswith("Idle;") for line in lines)
+    assert any(line.startswith("Idle;") for line in profiler.folded(seconds=60, include_idle=True).splitlines())
+    assert profiler.folded(seconds=60, thread="Worker").splitlines() == worker_lines
+
+    stats = profiler.get_stats()
+    assert stats["samples"] >= 20 and not stats["running"]
+
+
+def test_old_buckets_expire():
+    now = [1000.0]
+    original_time = sampling_profiler.time.time
+    sampling_profiler.time.time = lambda: now[0]
+    # sample() skips the calling thread: keep one other thread around
+    stop = threading.Event()
+    idle = threading.Thread(target=stop.wait)
+    idle.start()
+    try:
+        profiler = SamplingProfiler(bucket_seconds=10, retention_seconds=30)
+        profiler.sample()
+        now[0] += 25
+        profiler.sample()
+        assert profiler.get_stats()["buckets"] == 2
+        # Only the last bucket is within a 10s window
+        recent = sum(int(line.rsplit(" ", 1)[1]) for line in profiler.folded(seconds=10, include_idle=True).splitlines())
+        everything = sum(int(line.rsplit(" ", 1)[1]) for line in profiler.folded(seconds=60, include_idle=True).splitlines())
+        assert 0 < recent < everything
+
+        now[0] += 40
+        profiler.sample()
+        assert profiler.get_stats()["buckets"] == 1
+    finally:
+        sampling_profiler.time.time = original_time
+        stop.set()
+        idle.join()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_busy_thread_in_folded_stacks,
+        test_old_buckets_expire,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
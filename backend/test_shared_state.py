@@ -0,0 +1,122 @@
+"""
+Test script for the multi-worker shared state
+
+Tests that admission slots taken in one forked worker count against the
+limit in another (and are freed when the supervisor clears a dead
+worker), and that answers and search results cached by one worker are
+served by another through the SQLite shared cache.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+import database
+from admission import AdmissionController
+from batch_writer import BatchWriter
+from cache import RetrievalCache, SemanticAnswerCache
+from langchain.schema import Document
+from shared_state import SharedCacheStore, SharedSlots
+from test_cache import FakeVectorStore
+
+
+def test_slots_across_forked_workers():
+    slots = SharedSlots(workers=2)
+    result_r, result_w = os.pipe()
+    exit_r, exit_w = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        # Worker 1 takes both slots of the model and holds them until told to exit
+        slots.worker = 1
+        taken = slots.try_acquire("qwen2.5:7b", 2) and slots.try_acquire("qwen2.5:7b", 2)
+        os.write(result_w, b"1" if taken else b"0")
+        os.read(exit_r, 1)
+        os._exit(0)
+
+    assert os.read(result_r, 1) == b"1"
+    assert slots.active("qwen2.5:7b") == 2
+    assert not slots.try_acquire("qwen2.5:7b", 2)
+    assert slots.try_acquire("llama3.2:3b", 2)  # other models are not affected
+    slots.release("llama3.2:3b")
+
+    async def scenario():
+        controller = AdmissionController(default_limit=2, slots=slots, shared_poll_interval=0.01)
+        ticket = controller.enqueue("qwen2.5:7b")
+        assert ticket.admitted_at is None  # no local request running, but no global slot either
+
+        async def waiter():
+            async for _ in controller.wait(ticket):
+                pass
+
+        task = asyncio.create_task(waiter())
+        await asyncio.sleep(0.05)
+        assert not task.done()
+
+        # Worker 1 dies; the supervisor frees its slots and the queue moves on its next poll
+        os.write(exit_w, b"x")
+        os.waitpid(pid, 0)
+        slots.clear_worker(1)
+        await asyncio.wait_for(task, 1)
+        assert slots.active("qwen2.5:7b") == 1
+        controller.release(ticket)
+        return controller.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert slots.active("qwen2.5:7b") == 0
+    assert stats["models"]["qwen2.5:7b"]["active_all_workers"] == 0
+
+
+def test_caches_shared_between_workers():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.SQLITE_DB_PATH = os.path.join(tmp, "test.db")
+        database.init_db()
+        writer = BatchWriter(database.save_shared_cache, flush_interval=0.05)
+        writer.start()
+        try:
+            store = SharedCacheStore(writer)
+            # Two workers: separate in-memory caches, one shared store
+            answers_a = SemanticAnswerCache(similarity_threshold=0.9, shared=store)
+            answers_b = SemanticAnswerCache(similarity_threshold=0.9, shared=store)
+            vectorstore = FakeVectorStore()
+            searches_a = RetrievalCache(vectorstore, shared=store)
+            searches_b = RetrievalCache(vectorstore, shared=store)
+
+            context = {"model_name": "qwen2.5:7b", "temperature": 0.3, "source_ids": ["id1", "id2"]}
+            answers_a.store([1.0, 0.0, 0.0], **context, question="O que é o perispírito?", answer="O envoltório...")
+            docs = [Document(page_content="Trecho 3", metadata={}, id="id3")]
+            searches_a.put("O que é o perispírito?", 4, 20, docs)
+            assert writer.flush(2)
+
+            hit = answers_b.lookup([0.99, 0.05, 0.0], **context)
+            assert hit["answer"] == "O envoltório..." and hit["similarity"] > 0.9
+            assert len(answers_b) == 1  # copied locally: the next lookup skips SQLite
+            assert answers_b.lookup([0.0, 1.0, 0.0], **context) is None
+            assert answers_b.lookup([1.0, 0.0, 0.0], **dict(context, model_name="llama3.2:3b")) is None
+
+            assert [doc.id for doc in searches_b.get("o que é o perispírito", 4, 20)] == ["id3"]
+            assert searches_b.get("O que é o perispírito?", 8, 20) is None
+            assert store.get_stats()["writes"] == 2
+        finally:
+            writer.shutdown()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_slots_across_forked_workers,
+        test_caches_shared_between_workers,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
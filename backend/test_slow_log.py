@@ -0,0 +1,101 @@
+"""
+Test script for the slow request log
+
+Tests the entry built from a request's retrieval/timing details and that
+entries land in SQLite (queried slowest first) and in the rotated JSONL.
+"""
+
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+import database
+from langchain.schema import Document
+from slow_log import SlowRequestLog, build_entry, question_hash
+
+TIMING = {
+    "stages": {"retrieval": 1.2, "ttft": 8.5, "generation": 31.0},
+    "total": 41.3,
+    "prompt_tokens": 1800,
+    "output_tokens": 420,
+    "tokens_per_second": 13.5
+}
+
+
+def make_sources():
+    return [
+        Document(page_content="Trecho", metadata={"source": "livro-dos-espiritos.pdf", "page": i}, id=f"chunk{i}")
+        for i in range(3)
+    ]
+
+
+def test_entry_has_request_details():
+    metadata = {
+        "complexity_analysis": {"complexity_level": 3},
+        "num_searches": 3,
+        "search_queries": ["o que é perispírito", "perispírito função", "corpo fluídico"]
+    }
+    entry = build_entry("/query", "O que é o perispírito?", "qwen2.5:7b", 4, 15, TIMING,
+                        make_sources(), metadata, cached=False, task_id="task_1")
+    assert entry["question_hash"] == question_hash("  o que é o PERISPÍRITO?")
+    assert "O que é o perispírito?" not in json.dumps(entry, ensure_ascii=False)  # only the hash is kept
+    assert entry["complexity_level"] == 3 and entry["num_searches"] == 3
+    assert entry["search_queries"] == metadata["search_queries"]
+    assert len(entry["chunk_ids"]) == 3 and entry["chunk_ids"][0] == "chunk0"
+    assert entry["prompt_tokens"] == 1800 and entry["stages"]["generation"] == 31.0
+
+    # Legacy single search: complexity from the router, one search
+    legacy = build_entry("/query_stream", "Pergunta", "qwen2.5:3b", 3, 10, TIMING, make_sources(),
+                         None, route={"complexity_level": 1})
+    assert legacy["complexity_level"] == 1 and legacy["num_searches"] == 1
+    assert legacy["search_queries"] == []
+
+
+def test_record_to_sqlite_and_jsonl():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.SQLITE_DB_PATH = os.path.join(tmp, "test.db")
+        database.init_db()
+        path = os.path.join(tmp, "logs", "slow.jsonl")
+        log = SlowRequestLog(threshold_seconds=30, path=path, max_bytes=1500, backup_count=2)
+
+        assert log.is_slow(TIMING) and not log.is_slow({"total": 2.0})
+        for total in (35.0, 90.5, 41.3):
+            log.record(build_entry("/query", f"pergunta {total}", "qwen2.5:7b", 4, 15,
+                                   dict(TIMING, total=total), make_sources()))
+
+        slowest = database.get_slow_requests(hours=1, limit=2)
+        assert [r["total_seconds"] for r in slowest] == [90.5, 41.3]
+        assert slowest[0]["chunk_ids"] == ["chunk0", "chunk1", "chunk2"]
+        assert slowest[0]["stages"]["ttft"] == 8.5 and slowest[0]["cached"] is False
+        assert database.get_slow_requests(hours=1, endpoint="/query_stream") == []
+
+        # Rotated at ~1.5 KB: each entry is on exactly one line across the files
+        lines = []
+        for name in (path, path + ".1", path + ".2"):
+            if os.path.exists(name):
+                with open(name, encoding="utf-8") as f:
+                    lines.extend(json.loads(line) for line in f)
+        assert os.path.exists(path + ".1")
+        assert sorted(entry["total_seconds"] for entry in lines) == [35.0, 41.3, 90.5]
+        assert log.get_stats()["logged"] == 3 and log.get_stats()["errors"] == 0
+
+
+if __name__ == "__main__":
+    tests = [
+        test_entry_has_request_details,
+        test_record_to_sqlite_and_jsonl,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,106 @@
+"""
+Test script for structured logging
+
+Tests that records written through the queue come out as JSON lines with
+the request ID, extra fields and tracebacks, that DEBUG output is sampled
+per request, and that a full queue drops records instead of blocking.
+"""
+
+import json
+import logging
+import os
+import queue
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+import structured_log
+import tracing
+from tracing import Span
+
+logger = structured_log.get_logger("test")
+
+
+@contextmanager
+def in_request(trace_id: str):
+    """Make trace_id the current request (the middleware does this for HTTP)"""
+    token = tracing._current_span.set(Span("POST /query", trace_id))
+    try:
+        yield
+    finally:
+        tracing._current_span.reset(token)
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_json_lines_with_request_id():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "logs", "app.jsonl")
+        structured_log.configure("INFO", path, console=False)
+        try:
+            with in_request("ab" * 16):
+                logger.info("Nova pergunta", extra={"task_id": "task_7", "model": "qwen2.5:7b"})
+                logger.debug("Invisível no nível INFO")
+                try:
+                    raise ValueError("falhou")
+                except ValueError:
+                    logger.exception("Erro ao processar pergunta")
+        finally:
+            structured_log.shutdown()
+
+        lines = read_lines(path)
+        assert [line["message"] for line in lines] == ["Nova pergunta", "Erro ao processar pergunta"]
+        assert lines[0]["request_id"] == "ab" * 16 and lines[0]["task_id"] == "task_7"
+        assert lines[0]["level"] == "INFO" and lines[0]["logger"] == "chatbot.test"
+        assert "ValueError: falhou" in lines[1]["exception"]
+
+
+def test_debug_sampling_and_full_queue():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "app.jsonl")
+        structured_log.configure("DEBUG", path, console=False, debug_sample_rate=0.5)
+        try:
+            with in_request("00000000" + "0" * 24):  # below the rate: every DEBUG record kept
+                for i in range(3):
+                    logger.debug("Reranking", extra={"i": i})
+            with in_request("ffffffff" + "0" * 24):  # above: DEBUG dropped, INFO kept
+                for i in range(3):
+                    logger.debug("Reranking", extra={"i": i})
+                logger.info("Resposta gerada")
+            stats = structured_log.get_stats()
+        finally:
+            structured_log.shutdown()
+
+        lines = read_lines(path)
+        assert [line["request_id"][:8] for line in lines] == ["00000000"] * 3 + ["ffffffff"]
+        assert stats["debug_sampled_out"] == 3
+
+    # Writer stopped and queue full: logging returns immediately
+    handler = structured_log.NonBlockingQueueHandler(queue.Queue(2))
+    for i in range(5):
+        handler.emit(logging.LogRecord("chatbot.test", logging.INFO, "", 0, "linha %d", (i,), None))
+    assert handler.queue.qsize() == 2 and handler.dropped == 3
+    assert handler.queue.get().msg == "linha 0"
+
+
+if __name__ == "__main__":
+    tests = [
+        test_json_lines_with_request_id,
+        test_debug_sampling_and_full_queue,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
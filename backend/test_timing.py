@@ -0,0 +1,78 @@
+"""
+Test script for per-request stage timings
+
+Tests that stages recorded deep in the call stack (and in worker threads)
+land in the request's timer, and the rolling percentile stats.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+from timing import TimingStats, current_timer, percentile, start_request_timer, timed
+
+
+def test_stages_follow_the_request_context():
+    def search():
+        # Called from a worker thread, as search_sources is
+        with timed("embedding"):
+            pass
+        with timed("embedding"):
+            pass
+
+    async def handle():
+        timer = start_request_timer()
+        with timer.stage("retrieval"):
+            await asyncio.to_thread(search)
+        timer.set("output_tokens", 42)
+        return timer
+
+    first, second = asyncio.run(handle()), asyncio.run(handle())
+    assert first is not second
+    timing = first.to_dict()
+    assert set(timing["stages"]) == {"retrieval", "embedding"}
+    assert timing["stages"]["retrieval"] >= timing["stages"]["embedding"]
+    assert timing["output_tokens"] == 42 and timing["total"] >= 0
+
+    # Outside a request timed() is a no-op
+    assert current_timer() is None
+    with timed("embedding"):
+        pass
+
+
+def test_rolling_percentiles():
+    values = list(range(1, 101))
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.5) == 0.0
+
+    stats = TimingStats(window=100)
+    for i in range(1, 201):
+        stats.record({"stages": {"retrieval": i / 1000}, "total": i / 100, "output_tokens": i})
+    result = stats.get_stats()
+    assert result["requests"] == 200
+    # Only the last 100 requests are kept
+    assert result["stages"]["retrieval"]["count"] == 100
+    assert result["stages"]["retrieval"]["p50"] == 0.15
+    assert result["stages"]["total"]["p99"] == 1.99
+    assert result["stages"]["output_tokens"]["p95"] == 195
+
+
+if __name__ == "__main__":
+    tests = [
+        test_stages_follow_the_request_context,
+        test_rolling_percentiles,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,96 @@
+"""
+Test script for request tracing
+
+Tests span nesting across the request context (including worker threads),
+the OTLP/JSON lines written by the exporter, and file rotation.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+import tracing
+from tracing import Span, SpanExporter, current_span, span, traced
+
+
+def read_spans(path):
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            request = json.loads(line)
+            spans.extend(request["resourceSpans"][0]["scopeSpans"][0]["spans"])
+    return spans
+
+
+def test_spans_nest_within_a_request():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "spans.jsonl")
+        exporter = SpanExporter(path, flush_interval=0.05)
+        tracing.configure(exporter)
+        try:
+            @traced("prioritized_search")
+            def search():
+                current_span().set_attribute("search.k", 3)
+
+            async def handle():
+                root = Span("POST /query", "0" * 32)
+                token = tracing._current_span.set(root)
+                with span("retrieval"):
+                    await asyncio.to_thread(search)
+                tracing._current_span.reset(token)
+                root.end()
+
+            asyncio.run(handle())
+            # Outside a trace spans are no-ops
+            with span("orphan") as orphan:
+                orphan.set_attribute("ignored", True)
+        finally:
+            tracing.configure(None)
+            exporter.shutdown()
+
+        spans = {s["name"]: s for s in read_spans(path)}
+        assert set(spans) == {"POST /query", "retrieval", "prioritized_search"}
+        assert {s["traceId"] for s in spans.values()} == {"0" * 32}
+        assert "parentSpanId" not in spans["POST /query"]
+        assert spans["retrieval"]["parentSpanId"] == spans["POST /query"]["spanId"]
+        assert spans["prioritized_search"]["parentSpanId"] == spans["retrieval"]["spanId"]
+        assert spans["prioritized_search"]["attributes"] == [{"key": "search.k", "value": {"intValue": "3"}}]
+
+
+def test_exporter_rotates_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "spans.jsonl")
+        exporter = SpanExporter(path, max_bytes=2000, backup_count=2, batch_size=1, flush_interval=0.05)
+        for i in range(30):
+            s = Span(f"span-{i}", "1" * 32)
+            s.end_ns = s.start_ns
+            exporter.export(s)
+        exporter.shutdown()
+
+        assert sorted(os.listdir(tmp)) == ["spans.jsonl", "spans.jsonl.1", "spans.jsonl.2"]
+        assert all(os.path.getsize(os.path.join(tmp, name)) <= 2000 for name in os.listdir(tmp))
+        # The newest spans are in the current file
+        assert read_spans(path)[-1]["name"] == "span-29"
+        assert exporter.get_stats()["exported"] == 30
+
+
+if __name__ == "__main__":
+    tests = [
+        test_spans_nest_within_a_request,
+        test_exporter_rotates_files,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__} - PASSED")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {test.__name__} - FAILED: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,142 @@
+"""
+Per-request stage timings.
+
+A RequestTimer collects how long each stage of one request took
+(validation, embedding, each search, dedup/rerank, prompt build, time to
+first token, generation) plus token counts. The active timer lives in a
+context variable, so retrieval code deep inside multi_search and
+priority_retriever records its stages with timed(...) without the timer
+being passed around; the context is copied into run_in_threadpool workers
+and into tasks created while it is set.
+
+Stages with the same name add up (e.g. "embedding" over several searches),
+and stages nest: "search_2" includes its own embedding and rerank. Every
+stage is also a tracing span (see tracing.py).
+
+TimingStats aggregates finished requests into rolling p50/p95/p99.
+"""
+
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from tracing import span
+
+_current_timer: contextvars.ContextVar = contextvars.ContextVar("request_timer", default=None)
+
+
+class RequestTimer:
+    """Stage durations (seconds) and counters of one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()  # searches may run in worker threads
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def set(self, counter: str, value: float):
+        with self._lock:
+            self.counters[counter] = value
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            with span(name):
+                yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                "total": round(self.elapsed(), 4),
+                **{name: round(value, 2) for name, value in self.counters.items()}
+            }
+
+
+def start_request_timer() -> RequestTimer:
+    """Create a timer and make it the current one for this context"""
+    timer = RequestTimer()
+    _current_timer.set(timer)
+    return timer
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return _current_timer.get()
+
+
+@contextmanager
+def timed(stage: str):
+    """Time a block into the current request's timer (only a span outside a request)"""
+    timer = _current_timer.get()
+    if timer is None:
+        with span(stage):
+            yield
+        return
+    with timer.stage(stage):
+        yield
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class TimingStats:
+    """Rolling p50/p95/p99 per stage over the last `window` requests"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+        self._requests = 0
+
+    def _add(self, name: str, value: float):
+        if name not in self._samples:
+            self._samples[name] = deque(maxlen=self.window)
+        self._samples[name].append(value)
+
+    def record(self, timing: Dict):
+        """Add one request's RequestTimer.to_dict()"""
+        with self._lock:
+            self._requests += 1
+            for stage, seconds in timing.get("stages", {}).items():
+                self._add(stage, seconds)
+            for name, value in timing.items():
+                if name != "stages" and isinstance(value, (int, float)):
+                    self._add(name, value)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            requests = self._requests
+        return {
+            "requests": requests,
+            "window": self.window,
+            "stages": {
+                name: {
+                    "count": len(values),
+                    "mean": round(sum(values) / len(values), 4),
+                    "p50": round(percentile(values, 0.50), 4),
+                    "p95": round(percentile(values, 0.95), 4),
+                    "p99": round(percentile(values, 0.99), 4)
+                }
+                for name, values in sorted(samples.items())
+            }
+        }
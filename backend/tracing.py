@@ -0,0 +1,321 @@
+"""
+Lightweight request tracing.
+
+Every HTTP request gets a trace: a root span opened by TracingMiddleware
+and child spans for the pipeline stages (RequestTimer stages and timed()
+blocks open spans too), MultiSearchEngine, priority_retriever,
+ContextValidator, database operations and the Ollama generation. The
+current span lives in a context variable, so it follows the request into
+run_in_threadpool workers and coalesced flight tasks.
+
+The trace ID comes from the X-Request-ID header when it is a 32-hex-digit
+ID (any other value is kept as the request.id attribute) and is returned
+in the X-Request-ID response header, so a slow answer reported by the
+frontend can be looked up in the trace file.
+
+Finished spans go through a bounded queue to a writer thread, which
+appends them in batches to a size-rotated JSONL file. Each line is an
+OTLP/JSON ExportTraceServiceRequest (resourceSpans -> scopeSpans -> spans),
+the format of the OpenTelemetry collector's file exporter, so the files
+can be loaded into Jaeger/Tempo/otel-desktop-viewer offline.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+SERVICE_NAME = "chatbot-comeerj"
+_TRACE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_exporter = None  # SpanExporter once configured (None = tracing off)
+
+
+def _new_trace_id() -> str:
+    return secrets.token_hex(16)
+
+
+def _new_span_id() -> str:
+    return secrets.token_hex(8)
+
+
+def _attribute_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}  # OTLP/JSON encodes int64 as a string
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """One timed operation of a trace"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, attributes: Optional[Dict] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_span_id()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if _exporter is not None:
+            _exporter.export(self)
+
+    def to_otlp(self) -> Dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 2 if self.parent_id is None else 1,  # SERVER for the root, INTERNAL below
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _attribute_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 0}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    """Returned outside a trace so callers can set attributes unconditionally"""
+
+    trace_id = None
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def record_error(self, error: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+
+def start_span(name: str, **attributes):
+    """
+    Child span of the current one that is NOT made current (for async
+    generators, which can't safely set context variables). Call end().
+    """
+    parent = _current_span.get()
+    if parent is None or _exporter is None:
+        return NOOP_SPAN
+    return Span(name, parent.trace_id, parent.span_id, attributes)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child span of the current one for the duration of the block (no-op outside a trace)"""
+    parent = _current_span.get()
+    if parent is None or _exporter is None:
+        yield NOOP_SPAN
+        return
+    child = Span(name, parent.trace_id, parent.span_id, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def traced(name: str):
+    """Decorator form of span()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def append_line(path: str, line: str, max_bytes: int, backup_count: int):
+    """Append to a JSONL file, rotating it first (path.1 ... path.N) when it would exceed max_bytes"""
+    if os.path.exists(path) and os.path.getsize(path) + len(line) > max_bytes:
+        for i in range(backup_count - 1, 0, -1):
+            source = f"{path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{path}.{i + 1}")
+        if backup_count > 0:
+            os.replace(path, f"{path}.1")
+        else:
+            os.remove(path)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+class SpanExporter:
+    """
+    Bounded queue + writer thread appending OTLP/JSON lines to a file
+    rotated by size (spans.jsonl, spans.jsonl.1, ... spans.jsonl.N).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+        max_queue: int = 10000,
+        batch_size: int = 256,
+        flush_interval: float = 1.0
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(max_queue)
+        self._stats = {"exported": 0, "dropped": 0, "errors": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            # Never block a request on tracing
+            self._stats["dropped"] += 1
+
+    def _write(self, spans: List[Span]):
+        line = json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": SERVICE_NAME}}
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "tracing"},
+                    "spans": [s.to_otlp() for s in spans]
+                }]
+            }]
+        }, ensure_ascii=False)
+        append_line(self.path, line, self.max_bytes, self.backup_count)
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            stop = None in batch
+            batch = [s for s in batch if s is not None]
+            if batch:
+                try:
+                    self._write(batch)
+                    self._stats["exported"] += len(batch)
+                except Exception as e:
+                    self._stats["errors"] += 1
+                    print(f"⚠️  Falha ao gravar spans: {e}")
+            if stop:
+                return
+
+    def shutdown(self, timeout: float = 5.0):
+        """Flush what's queued and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def get_stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        stats["path"] = self.path
+        return stats
+
+
+def configure(exporter: Optional[SpanExporter]):
+    """Install the exporter (None disables tracing)"""
+    global _exporter
+    _exporter = exporter
+
+
+def get_exporter() -> Optional[SpanExporter]:
+    return _exporter
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of every HTTP request"""
+
+    HEADER = b"x-request-id"
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _exporter is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for key, value in scope.get("headers", []):
+            if key == self.HEADER:
+                request_id = value.decode("latin-1").strip()
+                break
+
+        trace_id = request_id.lower() if request_id and _TRACE_ID_PATTERN.match(request_id.lower()) else _new_trace_id()
+        root = Span(f"{scope['method']} {scope['path']}", trace_id, attributes={
+            "http.method": scope["method"],
+            "http.target": scope["path"]
+        })
+        if request_id and request_id.lower() != trace_id:
+            root.set_attribute("request.id", request_id)
+        response_id = (request_id or trace_id).encode("latin-1")
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                message["headers"] = list(message.get("headers", [])) + [(self.HEADER, response_id)]
+            await send(message)
+
+        token = _current_span.set(root)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        except BaseException as e:
+            root.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                # Template (/conversations/{chat_id}) groups requests in viewers
+                root.name = f"{scope['method']} {route.path}"
+            root.end()
@@ -0,0 +1,128 @@
+"""
+Cache warm-up from query logs and "good" feedback.
+
+Pre-computes retrieval (and optionally answers) for the most frequent and
+best-rated questions so the retrieval and answer caches are hot before
+users ask them. Runs at startup and then on a schedule, with a concurrency
+cap, and yields to live traffic: work only starts while the server is idle.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from slow_log import question_hash
+from structured_log import get_logger
+
+logger = get_logger("warmup")
+
+
+class CacheWarmer:
+    """
+    Runs warm-up passes over a list of questions.
+
+    Args:
+        load_questions: Returns the questions to warm (most important first)
+        warm_question: Async function that warms the caches for one question
+            (blocking work and LLM generations are its own to schedule)
+        is_busy: Returns True while live requests are being served
+        executor: Executor where load_questions runs (keeps the event loop free)
+        concurrency: Maximum number of questions warmed at the same time
+    """
+
+    def __init__(
+        self,
+        load_questions: Callable[[], List[str]],
+        warm_question: Callable[[str], Awaitable[None]],
+        is_busy: Callable[[], bool],
+        executor=None,
+        concurrency: int = 1,
+        idle_poll_seconds: float = 2.0
+    ):
+        self.load_questions = load_questions
+        self.warm_question = warm_question
+        self.is_busy = is_busy
+        self.executor = executor
+        self.concurrency = max(1, concurrency)
+        self.idle_poll_seconds = idle_poll_seconds
+        self._semaphore = None
+        self._task = None
+        self._running = False
+        self._stats = {
+            "runs": 0,
+            "questions_warmed": 0,
+            "errors": 0,
+            "last_run_started": None,
+            "last_run_duration": None,
+            "last_run_questions": 0
+        }
+
+    async def _wait_until_idle(self):
+        while self.is_busy():
+            await asyncio.sleep(self.idle_poll_seconds)
+
+    async def _warm_one(self, question: str):
+        async with self._semaphore:
+            await self._wait_until_idle()
+            try:
+                await self.warm_question(question)
+                self._stats["questions_warmed"] += 1
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.warning("Falha no aquecimento de pergunta", extra={
+                    "question_hash": question_hash(question), "error": str(e)
+                })
+
+    async def run_once(self) -> int:
+        """Warm every question returned by load_questions; returns how many"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        loop = asyncio.get_running_loop()
+        questions = await loop.run_in_executor(self.executor, self.load_questions)
+
+        started = time.time()
+        self._stats["runs"] += 1
+        self._stats["last_run_started"] = started
+
+        await asyncio.gather(*(self._warm_one(q) for q in questions))
+
+        self._stats["last_run_duration"] = time.time() - started
+        self._stats["last_run_questions"] = len(questions)
+        return len(questions)
+
+    async def _loop(self, interval_seconds: float, initial_delay: float):
+        await asyncio.sleep(initial_delay)
+        while self._running:
+            try:
+                count = await self.run_once()
+                logger.info("Aquecimento de cache concluído", extra={
+                    "questions": count,
+                    "errors": self._stats["errors"],
+                    "duration_seconds": round(self._stats["last_run_duration"], 3)
+                })
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.warning("Erro no aquecimento de cache", extra={"error": str(e)})
+            if interval_seconds <= 0:
+                break
+            await asyncio.sleep(interval_seconds)
+
+    def start(self, interval_seconds: float, initial_delay: float = 0):
+        """Schedule warm-up passes in the background (interval 0 = run once)"""
+        if self._task is not None:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._loop(interval_seconds, initial_delay))
+
+    def stop(self):
+        self._running = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def get_stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats["scheduled"] = self._task is not None
+        stats["concurrency"] = self.concurrency
+        return stats
@@ -550,9 +550,19 @@ def _auth_headers() -> dict:
     token = st.session_state.get("auth_token")
     if token:
         headers["Authorization"] = f"Bearer {token}"
+    elif st.session_state.get("anonymous_session"):
+        # Anonymous users: the backend scopes the conversation memory to this session
+        headers["X-Anonymous-Session"] = st.session_state.anonymous_session
     return headers
 
 
+def _remember_anonymous_session(response):
+    """Keep the anonymous session the backend issued (sent back by _auth_headers)"""
+    session = response.headers.get("X-Anonymous-Session")
+    if session:
+        st.session_state.anonymous_session = session
+
+
 def auth_register(email: str, password: str, display_name: str) -> dict:
     """Register a new user"""
     try:
@@ -619,19 +629,6 @@ def auth_check_session():
 # BACKEND CONVERSATION HELPERS (for logged-in users)
 # ============================================================================
 
-def backend_save_conversation(chat_id: str, messages: list, title: str = "Conversa sem título"):
-    """Save conversation to backend for logged-in user"""
-    try:
-        requests.post(
-            f"{API_URL}/conversations/{chat_id}",
-            headers=_auth_headers(),
-            json={"title": title, "messages": messages},
-            timeout=10
-        )
-    except:
-        pass
-
-
 def backend_get_conversations(limit: int = 20) -> list:
     """Get conversations from backend for logged-in user"""
     try:
@@ -687,8 +684,8 @@ def check_api_status():
         return None
 
 
-def query_api(question: str, model_name: str, temperature: float, top_k: int, fetch_k: int, conversation_history: list = None):
-    """Send query to API with conversation history"""
+def query_api(question: str, model_name: str, temperature: float, top_k: int, fetch_k: int, conversation_history: list = None, chat_id: str = None):
+    """Send query to API (history only for anonymous users; see history_for_request)"""
     try:
         api_history = []
         if conversation_history:
@@ -706,12 +703,19 @@ def query_api(question: str, model_name: str, temperature: float, top_k: int, fe
                 "temperature": temperature,
                 "top_k": top_k,
                 "fetch_k": fetch_k,
-                "conversation_history": api_history
+                "conversation_history": api_history or None,
+                "chat_id": chat_id
             },
             headers=_auth_headers(),
             timeout=600
         )
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After", "alguns")
+            raise Exception(f"Servidor ocupado: muitas perguntas na fila. Tente novamente em {retry_after} segundos.")
+        if response.status_code == 503 and "Retry-After" in response.headers:
+            raise Exception(f"Servidor iniciando: carregando modelos. Tente novamente em {response.headers['Retry-After']} segundos.")
         response.raise_for_status()
+        _remember_anonymous_session(response)
         return response.json()
     except requests.exceptions.Timeout:
         raise Exception("Timeout: A resposta demorou muito. Tente novamente ou reduza o numero de trechos.")
@@ -721,7 +725,7 @@ def query_api(question: str, model_name: str, temperature: float, top_k: int, fe
         raise Exception(f"Erro: {str(e)}")
 
 
-def stream_api_response(question: str, model_name: str, temperature: float, top_k: int, fetch_k: int, conversation_history: list = None):
+def stream_api_response(question: str, model_name: str, temperature: float, top_k: int, fetch_k: int, conversation_history: list = None, chat_id: str = None):
     """Stream response from API with status updates"""
     try:
         api_history = []
@@ -740,13 +744,20 @@ def stream_api_response(question: str, model_name: str, temperature: float, top_
                 "temperature": temperature,
                 "top_k": top_k,
                 "fetch_k": fetch_k,
-                "conversation_history": api_history
+                "conversation_history": api_history or None,
+                "chat_id": chat_id
             },
             headers=_auth_headers(),
             stream=True,
             timeout=600
         )
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After", "alguns")
+            raise Exception(f"Servidor ocupado: muitas perguntas na fila. Tente novamente em {retry_after} segundos.")
+        if response.status_code == 503 and "Retry-After" in response.headers:
+            raise Exception(f"Servidor iniciando: carregando modelos. Tente novamente em {response.headers['Retry-After']} segundos.")
         response.raise_for_status()
+        _remember_anonymous_session(response)
 
         full_text = ""
         sources = None
@@ -769,6 +780,14 @@ def stream_api_response(question: str, model_name: str, temperature: float, top_
                         }
                         yield None, None, current_status
 
+                    elif data['type'] == 'queue':
+                        current_status = {
+                            'stage': 'queued',
+                            'progress': 0,
+                            'description': f"Aguardando na fila: posição {data['position']} (~{int(data['estimated_wait'])}s)"
+                        }
+                        yield None, None, current_status
+
                     elif data['type'] == 'token':
                         char_buffer += data['content']
                         full_text += data['content']
@@ -872,21 +891,14 @@ def is_logged_in() -> bool:
     return st.session_state.get("auth_token") is not None and st.session_state.get("logged_user") is not None
 
 
-def do_save_conversation():
-    """Save conversation ONLY for logged-in users."""
-    if not is_logged_in():
-        return  # Anonymous users: session-only, no persistence
-
-    title = "Conversa sem titulo"
-    for msg in st.session_state.messages:
-        if msg["role"] == "user":
-            title = msg["content"][:50]
-            break
-    backend_save_conversation(
-        st.session_state.current_chat_id,
-        st.session_state.messages,
-        title
-    )
+def history_for_request() -> list:
+    """
+    History sent with a question. Logged-in users: none, the backend loads
+    it (and saves each turn) by chat_id. Anonymous users: session-only.
+    """
+    if is_logged_in():
+        return None
+    return st.session_state.messages[:-1]
 
 
 def do_get_recent_conversations(limit: int = 10):
@@ -927,8 +939,6 @@ def main():
         st.session_state.auth_token = None
     if "logged_user" not in st.session_state:
         st.session_state.logged_user = None
-    if "llm_cached" not in st.session_state:
-        st.session_state.llm_cached = False
 
     # Apply theme CSS
     st.markdown(get_theme_css(st.session_state.theme), unsafe_allow_html=True)
@@ -1039,16 +1049,19 @@ def main():
         system = platform.system().lower()
 
         if system == "darwin":
-            available_models = ["llama3.2:3b", "llama3.2:1b"]
+            available_models = ["auto", "llama3.2:3b", "llama3.2:1b"]
             default_help = "llama3.2:3b otimizado para Mac M4 16GB"
         elif system == "windows":
-            available_models = ["llama3.1:8b", "llama3.2:3b", "llama3.2:1b"]
+            available_models = ["auto", "llama3.1:8b", "llama3.2:3b", "llama3.2:1b"]
             default_help = "llama3.1:8b otimizado para RTX 3070 8GB"
         else:
-            available_models = ["llama3.2:3b", "llama3.1:8b", "llama3.2:1b"]
+            available_models = ["auto", "llama3.2:3b", "llama3.1:8b", "llama3.2:1b"]
             default_help = "Selecione o modelo adequado ao seu hardware"
 
-        model_name = st.selectbox("Modelo:", available_models, help=default_help)
+        model_name = st.selectbox(
+            "Modelo:", available_models, help=default_help + " | Automático: o servidor escolhe pela complexidade da pergunta",
+            format_func=lambda m: "Automático" if m == "auto" else m
+        )
 
         temperature = st.slider(
             "Temperatura:", min_value=0.0, max_value=1.0, value=0.3, step=0.05,
@@ -1077,8 +1090,6 @@ def main():
         st.header("💬 Conversas")
 
         if st.button("🆕 Nova Conversa", use_container_width=True):
-            if len(st.session_state.messages) > 0 and is_logged_in():
-                do_save_conversation()
             st.session_state.messages = []
             st.session_state.current_chat_id = generate_chat_id()
             st.rerun()
@@ -1249,30 +1260,15 @@ def main():
                 progress_cleared = False
 
                 # Show initial progress immediately before backend responds
-                # On subsequent questions, LLM is cached so skip that stage
-                is_first_query = not st.session_state.llm_cached
-
-                if is_first_query:
-                    stages_info = [
-                        ('creating_llm', '⚙️', 'Criando modelo LLM', 10),
-                        ('searching_books', '🔍', 'Buscando nos livros espíritas', 30),
-                        ('building_context', '📚', 'Construindo contexto', 50),
-                        ('generating_answer', '🤖', 'Gerando resposta', 70),
-                    ]
-                    initial_active = 'creating_llm'
-                    initial_emoji = '⚙️'
-                    initial_desc = 'Criando modelo LLM'
-                    initial_target = 0.10
-                else:
-                    stages_info = [
-                        ('searching_books', '🔍', 'Buscando nos livros espíritas', 30),
-                        ('building_context', '📚', 'Construindo contexto', 50),
-                        ('generating_answer', '🤖', 'Gerando resposta', 70),
-                    ]
-                    initial_active = 'searching_books'
-                    initial_emoji = '🔍'
-                    initial_desc = 'Buscando nos livros espíritas'
-                    initial_target = 0.30
+                stages_info = [
+                    ('searching_books', '🔍', 'Buscando nos livros espíritas', 30),
+                    ('building_context', '📚', 'Construindo contexto', 50),
+                    ('generating_answer', '🤖', 'Gerando resposta', 70),
+                ]
+                initial_active = 'searching_books'
+                initial_emoji = '🔍'
+                initial_desc = 'Buscando nos livros espíritas'
+                initial_target = 0.30
 
                 initial_html = '<div class="progress-container">'
                 initial_html += '<div style="margin-bottom:0.75rem;font-weight:600;">🔍 Consultando os livros...</div>'
@@ -1281,7 +1277,7 @@ def main():
                     <span class="progress-icon">{initial_emoji}</span>
                     {initial_desc}
                 </div>'''
-                for stage_key, stage_emoji, stage_desc, stage_pct in stages_info[1:] if is_first_query else stages_info[1:]:
+                for stage_key, stage_emoji, stage_desc, stage_pct in stages_info[1:]:
                     initial_html += f'''
                 <div class="progress-stage">
                     <span class="progress-icon">⏳</span>
@@ -1301,7 +1297,8 @@ def main():
                 try:
                     for chunk, chunk_sources, status_update in stream_api_response(
                         prompt, model_name, temperature, top_k, fetch_k,
-                        st.session_state.messages[:-1]
+                        history_for_request(),
+                        st.session_state.current_chat_id
                     ):
                         if status_update:
                             current_stage = status_update
@@ -1319,6 +1316,13 @@ def main():
                             progress_html = '<div class="progress-container">'
                             progress_html += '<div style="margin-bottom:0.75rem;font-weight:600;">🔍 Consultando os livros...</div>'
 
+                            if current_stage_name == 'queued':
+                                progress_html += f'''
+                                <div class="progress-stage active">
+                                    <span class="progress-icon">⏳</span>
+                                    {status_update['description']}
+                                </div>'''
+
                             for stage_key, stage_emoji, stage_desc, stage_pct in stages_info:
                                 if stage_pct < progress:
                                     css_class = "progress-stage completed"
@@ -1367,9 +1371,6 @@ def main():
                         # Full quotations
                         display_quotations(sources)
 
-                    # Mark LLM as cached for subsequent queries
-                    st.session_state.llm_cached = True
-
                     # Add to messages
                     st.session_state.messages.append({
                         "role": "assistant",
@@ -1377,9 +1378,6 @@ def main():
                         "sources": sources
                     })
 
-                    # Auto-save
-                    do_save_conversation()
-
                     st.rerun()
 
                 except Exception as e:
@@ -1390,7 +1388,8 @@ def main():
                     try:
                         result = query_api(
                             prompt, model_name, temperature, top_k, fetch_k,
-                            st.session_state.messages[:-1]
+                            history_for_request(),
+                            st.session_state.current_chat_id
                         )
 
                         answer = result['answer']
@@ -1412,9 +1411,6 @@ def main():
                             "sources": sources
                         })
 
-                        # Auto-save
-                        do_save_conversation()
-
                         st.rerun()
 
                     except Exception as e:
@@ -1,5 +1,6 @@
 import json
 import os
+import uuid
 from datetime import datetime
 from typing import List, Dict, Optional
 from pathlib import Path
@@ -13,8 +14,8 @@ def ensure_chats_dir():
         os.makedirs(CHATS_DIR)
 
 def generate_chat_id() -> str:
-    """Generate a unique chat ID"""
-    return datetime.now().strftime("%Y%m%d_%H%M%S")
+    """Generate a unique chat ID (the backend keys history and memory by it)"""
+    return datetime.now().strftime("%Y%m%d_%H%M%S") + "_" + uuid.uuid4().hex[:12]
 
 def save_conversation(
     chat_id: str,